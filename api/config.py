@@ -47,3 +47,94 @@ ACCESS_TOKEN_EXPIRE_MINUTES: int = int(_access_default)
 
 _refresh_default = str = require_env("REFRESH_TOKEN_EXPIRE_DAYS", "30")
 REFRESH_TOKEN_EXPIRE_DAYS = int(_refresh_default)
+
+# Comma separated user ids allowed to use administrative endpoints such as
+# the user directory export
+ADMIN_USER_IDS: list[str] = [value.strip() for value in require_env("ADMIN_USER_IDS", "").split(",") if value.strip()]
+
+# Connection pool settings
+# ``DB_POOL_SIZE`` connections are kept open; up to ``DB_MAX_OVERFLOW`` extra
+# connections may be opened under burst load. Callers wait at most
+# ``DB_POOL_TIMEOUT`` seconds for a free connection before failing.
+DB_POOL_SIZE: int = int(require_env("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW: int = int(require_env("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT: float = float(require_env("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE: int = int(require_env("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING: bool = require_env("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# Read replicas
+# ``DB_REPLICA_URLS`` is a comma separated list of connection URLs for
+# streaming replicas of the primary; read-only requests are routed to them.
+# After a write, a user's reads only go to replicas that have replayed it,
+# for at most ``REPLICA_READ_YOUR_WRITES_SECONDS`` seconds.
+DB_REPLICA_URLS: list[str] = [url.strip() for url in require_env("DB_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_READ_YOUR_WRITES_SECONDS: float = float(require_env("REPLICA_READ_YOUR_WRITES_SECONDS", "300"))
+
+# Read receipts are buffered in memory and written in one batched UPDATE
+# every ``READ_RECEIPT_FLUSH_SECONDS`` seconds.
+READ_RECEIPT_FLUSH_SECONDS: float = float(require_env("READ_RECEIPT_FLUSH_SECONDS", "2"))
+
+# Message partitioning
+# Monthly partitions are created ``MESSAGE_PARTITION_MONTHS_AHEAD`` months in
+# advance. Partitions older than ``MESSAGE_ARCHIVE_AFTER_MONTHS`` months are
+# moved to ``MESSAGE_ARCHIVE_TABLESPACE`` (archival is off when it is empty).
+# History queries look at the last ``MESSAGE_HOT_WINDOW_DAYS`` days first.
+MESSAGE_PARTITION_MONTHS_AHEAD: int = int(require_env("MESSAGE_PARTITION_MONTHS_AHEAD", "3"))
+MESSAGE_ARCHIVE_AFTER_MONTHS: int = int(require_env("MESSAGE_ARCHIVE_AFTER_MONTHS", "12"))
+MESSAGE_ARCHIVE_TABLESPACE: str = require_env("MESSAGE_ARCHIVE_TABLESPACE", "")
+MESSAGE_HOT_WINDOW_DAYS: int = int(require_env("MESSAGE_HOT_WINDOW_DAYS", "7"))
+PARTITION_MAINTENANCE_INTERVAL_SECONDS: float = float(require_env("PARTITION_MAINTENANCE_INTERVAL_SECONDS", "3600"))
+
+# Conversation roles are cached per process for ``MEMBERSHIP_CACHE_TTL_SECONDS``
+# seconds (``MEMBERSHIP_CACHE_NEGATIVE_TTL_SECONDS`` for non-members), at
+# most ``MEMBERSHIP_CACHE_SIZE`` entries. Participant changes invalidate them
+# in every worker right away.
+MEMBERSHIP_CACHE_SIZE: int = int(require_env("MEMBERSHIP_CACHE_SIZE", "100000"))
+MEMBERSHIP_CACHE_TTL_SECONDS: float = float(require_env("MEMBERSHIP_CACHE_TTL_SECONDS", "300"))
+MEMBERSHIP_CACHE_NEGATIVE_TTL_SECONDS: float = float(require_env("MEMBERSHIP_CACHE_NEGATIVE_TTL_SECONDS", "5"))
+
+# User profiles are cached per process for ``PROFILE_CACHE_TTL_SECONDS``
+# seconds, at most ``PROFILE_CACHE_SIZE`` of them. Profile updates invalidate
+# them in every worker right away.
+PROFILE_CACHE_SIZE: int = int(require_env("PROFILE_CACHE_SIZE", "50000"))
+PROFILE_CACHE_TTL_SECONDS: float = float(require_env("PROFILE_CACHE_TTL_SECONDS", "60"))
+
+# The newest ``RECENT_MESSAGES_PER_CONVERSATION`` messages of recently read
+# conversations are cached per process, within ``RECENT_MESSAGES_CACHE_BYTES``
+# and for at most ``RECENT_MESSAGES_CACHE_TTL_SECONDS`` seconds. Sends, edits
+# and deletes update them in every worker right away.
+RECENT_MESSAGES_PER_CONVERSATION: int = int(require_env("RECENT_MESSAGES_PER_CONVERSATION", "50"))
+RECENT_MESSAGES_CACHE_BYTES: int = int(require_env("RECENT_MESSAGES_CACHE_BYTES", "67108864"))
+RECENT_MESSAGES_CACHE_TTL_SECONDS: float = float(require_env("RECENT_MESSAGES_CACHE_TTL_SECONDS", "300"))
+
+# Deleted conversations and accounts are purged in the background,
+# ``PURGE_BATCH_SIZE`` rows per transaction with ``PURGE_BATCH_PAUSE_SECONDS``
+# between batches. Workers look for new jobs every ``PURGE_INTERVAL_SECONDS``.
+PURGE_BATCH_SIZE: int = int(require_env("PURGE_BATCH_SIZE", "1000"))
+PURGE_BATCH_PAUSE_SECONDS: float = float(require_env("PURGE_BATCH_PAUSE_SECONDS", "0.1"))
+PURGE_INTERVAL_SECONDS: float = float(require_env("PURGE_INTERVAL_SECONDS", "10"))
+
+# Request deadlines
+# Every HTTP request must finish within ``REQUEST_DEADLINE_SECONDS`` of
+# arriving, list and history reads within ``READ_DEADLINE_SECONDS``. The time
+# left becomes the ``statement_timeout`` of each database transaction the
+# request opens; a request out of time is answered with 504.
+REQUEST_DEADLINE_SECONDS: float = float(require_env("REQUEST_DEADLINE_SECONDS", "10"))
+READ_DEADLINE_SECONDS: float = float(require_env("READ_DEADLINE_SECONDS", "5"))
+
+# Load shedding
+# List, history and search reads are refused with 503 while the average wait
+# for a pooled connection exceeds ``OVERLOAD_POOL_WAIT_SECONDS``, more than
+# ``OVERLOAD_THREADPOOL_QUEUE`` requests wait for a worker thread or the event
+# loop lags more than ``OVERLOAD_LOOP_LAG_SECONDS`` behind. Clients are asked
+# to retry after ``OVERLOAD_RETRY_AFTER_SECONDS``. Sends and auth are always
+# admitted.
+OVERLOAD_POOL_WAIT_SECONDS: float = float(require_env("OVERLOAD_POOL_WAIT_SECONDS", "0.1"))
+OVERLOAD_THREADPOOL_QUEUE: int = int(require_env("OVERLOAD_THREADPOOL_QUEUE", "20"))
+OVERLOAD_LOOP_LAG_SECONDS: float = float(require_env("OVERLOAD_LOOP_LAG_SECONDS", "0.1"))
+OVERLOAD_RETRY_AFTER_SECONDS: int = int(require_env("OVERLOAD_RETRY_AFTER_SECONDS", "2"))
+
+# Delta sync
+# Changes are kept in ``change_log`` for ``CHANGE_LOG_RETENTION_DAYS`` days;
+# a client whose sync cursor is older has to reload everything.
+CHANGE_LOG_RETENTION_DAYS: int = int(require_env("CHANGE_LOG_RETENTION_DAYS", "30"))
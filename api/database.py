@@ -1,9 +1,326 @@
-from .config import DATABASE_URL
+from .config import DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING, DB_REPLICA_URLS, REPLICA_READ_YOUR_WRITES_SECONDS
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+from uuid import UUID
 
-engine = create_engine(url=DATABASE_URL)
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.orm import sessionmaker, declarative_base, Session, ORMExecuteState
+from starlette.requests import Request
+
+from .deadlines import apply_deadline
+
+logger = logging.getLogger(__name__)
+
+class DecayingAverage:
+    """Moving average of recent samples that fades to 0 when samples stop.
+
+    Each sample moves the average ``weight`` of the way towards it, and the
+    average halves every ``half_life`` seconds without samples, so a burst
+    that is over stops counting even if nothing is measured afterwards.
+    """
+    def __init__(self, half_life: float, weight: float = 0.2) -> None:
+        self.half_life = half_life
+        self.weight = weight
+        self.lock = threading.Lock()
+        self._value = 0.0
+        self._updated_at = time.monotonic()
+
+    def _decayed(self, now: float) -> float:
+        return self._value * 0.5 ** ((now - self._updated_at) / self.half_life)
+
+    def observe(self, sample: float) -> None:
+        now = time.monotonic()
+        with self.lock:
+            current = self._decayed(now=now)
+            self._value = current + self.weight * (sample - current)
+            self._updated_at = now
+
+    def value(self) -> float:
+        with self.lock:
+            return self._decayed(now=time.monotonic())
+
+class PoolMetrics:
+    """Thread-safe counters describing how long callers wait for connections."""
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        # What acquiring a connection costs right now, for load shedding
+        self.recent_wait = DecayingAverage(half_life=5.0)
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+        self.recent_wait.observe(sample=seconds)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_seconds_total = 0.0
+            self.wait_seconds_max = 0.0
+            self.recent_wait = DecayingAverage(half_life=self.recent_wait.half_life)
+
+pool_metrics = PoolMetrics()
+
+class InstrumentedQueuePool(QueuePool):
+    """``QueuePool`` that records the time spent acquiring each connection."""
+    def _do_get(self) -> Any:
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.record_wait(seconds=time.perf_counter() - start, timed_out=True)
+            raise
+        pool_metrics.record_wait(seconds=time.perf_counter() - start)
+        return conn
+
+engine = create_engine(
+    url=DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Streaming replicas of the primary, used for read-only requests
+replica_engines = [
+    create_engine(
+        url=url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    for url in DB_REPLICA_URLS
+]
+ReplicaSessionLocals = [sessionmaker(autocommit=False, autoflush=False, bind=e) for e in replica_engines]
+_next_replica = itertools.count()
+
 Base = declarative_base()
+
+def parse_lsn(lsn: str) -> int:
+    """Convert a Postgres LSN such as ``"16/B374D848"`` to an integer."""
+    high, _, low = lsn.partition("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+def format_lsn(position: int) -> str:
+    return f"{position >> 32:X}/{position & 0xFFFFFFFF:X}"
+
+class WriteLsnTracker:
+    """Remembers the WAL position of each user's latest write.
+
+    A replica that has replayed past that position has every change the user
+    made, so it can serve their reads without them seeing stale data.
+    Positions expire after ``ttl`` seconds, by which time replicas have long
+    caught up.
+    """
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.positions: dict[UUID, tuple[int, float]] = {}
+
+    def record(self, user_id: UUID, lsn: str) -> None:
+        position = parse_lsn(lsn=lsn)
+        now = time.monotonic()
+        with self.lock:
+            previous = self.positions.get(user_id)
+            if previous is not None and previous[0] > position:
+                position = previous[0]
+            self.positions[user_id] = (position, now)
+
+    def get(self, user_id: UUID) -> Optional[str]:
+        with self.lock:
+            entry = self.positions.get(user_id)
+            if entry is None:
+                return None
+            position, recorded_at = entry
+            if time.monotonic() - recorded_at > self.ttl:
+                del self.positions[user_id]
+                return None
+        return format_lsn(position=position)
+
+write_lsn_tracker = WriteLsnTracker(ttl=REPLICA_READ_YOUR_WRITES_SECONDS)
+
+@event.listens_for(SessionLocal, "after_flush")
+def _mark_flush_as_write(session: Session, flush_context: Any) -> None:
+    session.info["wrote"] = True
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _mark_statement_as_write(state: ORMExecuteState) -> None:
+    # Bulk UPDATE/DELETE and raw SQL don't flush; treat anything but a SELECT as a write
+    if not state.is_select:
+        state.session.info["wrote"] = True
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_rolled_back_write(session: Session) -> None:
+    session.info.pop("wrote", None)
+    session.info.pop("write_lsn", None)
+
+def _request_user_id(session: Session) -> Optional[UUID]:
+    request: Optional[Request] = session.info.get("request")
+    return getattr(request.state, "user_id", None) if request is not None else None
+
+@event.listens_for(SessionLocal, "before_commit")
+def _read_write_position(session: Session) -> None:
+    """Read the WAL position of a request's write on its own connection, just before it commits.
+
+    The position is at or before the commit record; replicas replay WAL in
+    order, so one that has replayed past it is about to make the write
+    visible, which is close enough for read-your-writes.
+    """
+    if not replica_engines or _request_user_id(session=session) is None:
+        return
+    # Flush now so the position is past every pending write
+    session.flush()
+    if not session.info.get("wrote"):
+        return
+    session.info["write_lsn"] = session.connection().execute(text("SELECT pg_current_wal_insert_lsn()::text")).scalar_one()
+
+@event.listens_for(SessionLocal, "after_commit")
+def _record_write_position(session: Session) -> None:
+    """Remember the WAL position of a request's write so its user reads their own writes."""
+    session.info.pop("wrote", None)
+    lsn = session.info.pop("write_lsn", None)
+    user_id = _request_user_id(session=session)
+    if lsn is not None and user_id is not None:
+        write_lsn_tracker.record(user_id=user_id, lsn=lsn)
+
+def open_read_session(user_id: Optional[UUID] = None) -> Session:
+    """Open a session for read-only queries, on a replica when possible.
+
+    Replicas are tried round-robin. If ``user_id`` wrote recently, only a
+    replica that has replayed that write qualifies. Unreachable replicas are
+    skipped, and the primary is used when no replica qualifies or none are
+    configured.
+    """
+    if not ReplicaSessionLocals:
+        return SessionLocal()
+
+    min_lsn = write_lsn_tracker.get(user_id=user_id) if user_id is not None else None
+    start = next(_next_replica)
+    for offset in range(len(ReplicaSessionLocals)):
+        db = ReplicaSessionLocals[(start + offset) % len(ReplicaSessionLocals)]()
+        try:
+            if min_lsn is None:
+                # Check out a connection now so a dead replica is skipped
+                db.connection()
+                return db
+            caught_up = db.execute(
+                text("SELECT pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn)"),
+                {"lsn": min_lsn},
+            ).scalar()
+        except DBAPIError:
+            logger.warning("Replica %s is unavailable", db.get_bind().url.host, exc_info=True)
+            db.close()
+            continue
+        if caught_up:
+            return db
+        db.close()
+    return SessionLocal()
+
+def get_read_db(request: Request) -> Iterator[Session]:
+    """FastAPI dependency providing a session for read-only requests.
+
+    The session comes from :pyfunc:`open_read_session` for the user set on
+    ``request.state`` by the auth dependency, which therefore has to be
+    declared before this one. Nothing is committed.
+    """
+    db = open_read_session(user_id=getattr(request.state, "user_id", None))
+    try:
+        apply_deadline(db=db, deadline=getattr(request.state, "deadline", None))
+        yield db
+    finally:
+        db.close()
+
+def get_db(request: Request) -> Iterator[Session]:
+    """FastAPI dependency providing one session per request.
+
+    The session is committed when the request handler finishes, rolled back
+    if it raises, and always closed so its connection returns to the pool.
+    """
+    db = SessionLocal()
+    # Lets the commit hook attribute writes to the requesting user
+    db.info["request"] = request
+    apply_deadline(db=db, deadline=getattr(request.state, "deadline", None))
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+@contextmanager
+def session_scope(db: Optional[Session] = None) -> Iterator[Session]:
+    """Use ``db`` when supplied, otherwise open a session and close it on exit.
+
+    Services accept an optional session so routes can share the request
+    session from :pyfunc:`get_db`, while direct callers (tests, scripts)
+    still get a session that is guaranteed to be released.
+    """
+    if db is not None:
+        yield db
+        return
+
+    owned = SessionLocal()
+    try:
+        yield owned
+    except Exception:
+        owned.rollback()
+        raise
+    finally:
+        owned.close()
+
+def commit_returning(db: Session, *instances: object) -> None:
+    """Commit ``db`` and keep ``instances`` loaded with their current values.
+
+    ``commit()`` expires every instance in the session, so reading one
+    afterwards costs another ``SELECT``. Rows that were just written with
+    ``RETURNING`` already hold everything the database has, so they are
+    detached from the session before the commit instead.
+    """
+    for instance in instances:
+        db.expunge(instance=instance)
+    db.commit()
+
+def get_pool_status() -> dict[str, Any]:
+    """Return a snapshot of connection pool usage and acquisition wait times."""
+    pool = engine.pool
+    with pool_metrics.lock:
+        checkouts = pool_metrics.checkouts
+        timeouts = pool_metrics.timeouts
+        wait_total = pool_metrics.wait_seconds_total
+        wait_max = pool_metrics.wait_seconds_max
+
+    return {
+        "pool_size": pool.size(),  # type: ignore[attr-defined]
+        "max_overflow": DB_MAX_OVERFLOW,
+        "checked_out": pool.checkedout(),  # type: ignore[attr-defined]
+        "checked_in": pool.checkedin(),  # type: ignore[attr-defined]
+        "overflow": max(pool.overflow(), 0),  # type: ignore[attr-defined]
+        "checkouts": checkouts,
+        "timeouts": timeouts,
+        "wait_seconds_total": wait_total,
+        "wait_seconds_max": wait_max,
+        "wait_seconds_avg": wait_total / checkouts if checkouts else 0.0,
+    }
@@ -0,0 +1,235 @@
+"""Request deadlines enforced down to the database.
+
+:class:`DeadlineMiddleware` gives every HTTP request a
+:class:`RequestDeadline`, ``REQUEST_DEADLINE_SECONDS`` after it arrived;
+routes with a tighter latency budget shorten it with
+:pyfunc:`request_budget`. Sessions handed out by ``get_db`` and
+``get_read_db`` carry the deadline, and every transaction they begin runs
+``SET LOCAL statement_timeout`` with the time that is left, so Postgres
+cancels a query that would outlive its request instead of letting it hold a
+pooled connection and a threadpool thread. The ``SET LOCAL`` is sent in
+front of the transaction's first statement rather than in a round trip of
+its own. A transaction that would begin
+after the deadline raises :class:`DeadlineExceeded` without touching the
+database.
+
+When the client disconnects before the response starts, the request's
+running queries are cancelled too: nobody is waiting for them any more.
+Connections are registered with their deadline only while they are checked
+out of the pool, so a cancel never reaches a connection another request is
+using.
+"""
+from typing import Any, Callable, Optional
+import asyncio
+import logging
+import threading
+import time
+
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session, SessionTransaction
+from sqlalchemy.pool import Pool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import READ_DEADLINE_SECONDS, REQUEST_DEADLINE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# SQLSTATE of a statement cancelled by statement_timeout or a cancel request
+QUERY_CANCELED = "57014"
+# Seconds clients are asked to wait before retrying a 503
+RETRY_AFTER_SECONDS = 1
+
+class DeadlineExceeded(Exception):
+    """Raised when a request has no time left to start another transaction."""
+
+class RequestDeadline:
+    """The point in time by which a request has to be answered."""
+    def __init__(self, budget: float) -> None:
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + budget
+        self.client_gone = False
+        self.responded = False
+
+    def set_budget(self, seconds: float) -> None:
+        """Make the deadline ``seconds`` after the request arrived."""
+        self.expires_at = self.started_at + seconds
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+# Checked out connections running queries for a request with a deadline
+_lock = threading.Lock()
+_attached: dict[int, tuple[Any, RequestDeadline]] = {}
+
+def _attach(dbapi_connection: Any, deadline: RequestDeadline) -> None:
+    with _lock:
+        _attached[id(dbapi_connection)] = (dbapi_connection, deadline)
+
+# Connection.info key of the timeout for the next statement to set
+_PENDING_TIMEOUT = "pending_statement_timeout_ms"
+
+@event.listens_for(Pool, "checkin")
+def _detach(dbapi_connection: Any, connection_record: Any) -> None:
+    # Runs before the pool can hand the connection to anyone else
+    with _lock:
+        _attached.pop(id(dbapi_connection), None)
+    if connection_record is not None:
+        connection_record.info.pop(_PENDING_TIMEOUT, None)
+
+def cancel_queries(deadline: RequestDeadline) -> int:
+    """Cancel whatever the request's connections are running; returns how many were signalled."""
+    with _lock:
+        connections = [conn for conn, owner in _attached.values() if owner is deadline]
+        for conn in connections:
+            try:
+                conn.cancel()
+            except Exception:
+                logger.warning("Cancelling a query failed", exc_info=True)
+    return len(connections)
+
+def _apply(session: Session, connection: Connection) -> None:
+    deadline: Optional[RequestDeadline] = session.info.get("deadline")
+    if deadline is None:
+        return
+    remaining = deadline.remaining()
+    if remaining <= 0 or deadline.client_gone:
+        raise DeadlineExceeded()
+    # Whole milliseconds, at least one: 0 would mean no timeout at all
+    connection.info[_PENDING_TIMEOUT] = max(1, int(remaining * 1000))
+    _attach(dbapi_connection=connection.connection.dbapi_connection, deadline=deadline)
+
+@event.listens_for(Engine, "before_cursor_execute", retval=True)
+def _send_pending_timeout(
+    conn: Connection,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    context: Any,
+    executemany: bool,
+) -> tuple[str, Any]:
+    """Prefix the transaction's first statement with its ``SET LOCAL statement_timeout``."""
+    timeout_ms = conn.info.pop(_PENDING_TIMEOUT, None)
+    if timeout_ms is None:
+        return statement, parameters
+    setting = f"SET LOCAL statement_timeout = {int(timeout_ms)}"
+    if getattr(cursor, "name", None) is not None:
+        # A server-side cursor declares a single query; set the timeout on its own
+        plain = conn.connection.cursor()
+        try:
+            plain.execute(setting)
+        finally:
+            plain.close()
+        return statement, parameters
+    return f"{setting}; {statement}", parameters
+
+@event.listens_for(Session, "after_begin")
+def _apply_deadline(session: Session, transaction: SessionTransaction, connection: Connection) -> None:
+    _apply(session=session, connection=connection)
+
+def apply_deadline(db: Session, deadline: Optional[RequestDeadline]) -> None:
+    """Bound every transaction of ``db`` by ``deadline``, including one already begun."""
+    if deadline is None:
+        return
+    db.info["deadline"] = deadline
+    if db.in_transaction():
+        _apply(session=db, connection=db.connection())
+
+def request_budget(seconds: float) -> Callable[[Request], None]:
+    """Return a route dependency shortening the request's deadline to ``seconds``.
+
+    Declare it in the route's ``dependencies`` so it runs before the
+    session dependencies read the deadline.
+    """
+    def set_budget(request: Request) -> None:
+        deadline: Optional[RequestDeadline] = getattr(request.state, "deadline", None)
+        if deadline is not None:
+            deadline.set_budget(seconds=seconds)
+    return set_budget
+
+class DeadlineMiddleware:
+    """Give each HTTP request a deadline and cancel its queries if the client leaves.
+
+    The ASGI ``receive`` channel is read by a background task that hands
+    messages on to the application; the ``http.disconnect`` it sees once
+    the client is gone cancels the request's queries.
+    """
+    def __init__(self, app: ASGIApp, budget: float = REQUEST_DEADLINE_SECONDS) -> None:
+        self.app = app
+        self.budget = budget
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        deadline = RequestDeadline(budget=self.budget)
+        scope.setdefault("state", {})["deadline"] = deadline
+        messages: asyncio.Queue[Message] = asyncio.Queue()
+
+        async def watch_client() -> None:
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    deadline.client_gone = True
+                    # A finished request may still be committing; only abandoned work is cancelled
+                    if not deadline.responded:
+                        await asyncio.to_thread(cancel_queries, deadline)
+                    return
+
+        async def send_response(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                deadline.responded = True
+            await send(message)
+
+        watcher = asyncio.create_task(watch_client())
+        try:
+            await self.app(scope, messages.get, send_response)
+        finally:
+            watcher.cancel()
+
+def _unavailable(detail: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": detail},
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
+
+def _timed_out() -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        content={"detail": "Request deadline exceeded"},
+    )
+
+async def deadline_exceeded_handler(request: Request, exc: Exception) -> JSONResponse:
+    return _timed_out()
+
+async def database_error_handler(request: Request, exc: Exception) -> JSONResponse:
+    """Answer 504 for queries stopped by the deadline and 503 when the database is unreachable."""
+    if getattr(getattr(exc, "orig", None), "pgcode", None) == QUERY_CANCELED:
+        deadline: Optional[RequestDeadline] = getattr(request.state, "deadline", None)
+        if deadline is not None and deadline.client_gone:
+            # Nobody reads this response
+            return _unavailable(detail="Request cancelled")
+        return _timed_out()
+    logger.warning("Database unavailable: %s", exc)
+    return _unavailable(detail="Database unavailable")
+
+async def pool_timeout_handler(request: Request, exc: Exception) -> JSONResponse:
+    return _unavailable(detail="No database connection available")
+
+EXCEPTION_HANDLERS: dict[Any, Callable[..., Any]] = {
+    DeadlineExceeded: deadline_exceeded_handler,
+    OperationalError: database_error_handler,
+    PoolTimeoutError: pool_timeout_handler,
+}
+
+# Budget of list, history and search reads
+read_budget = request_budget(seconds=READ_DEADLINE_SECONDS)
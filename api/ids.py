@@ -0,0 +1,58 @@
+"""Time-ordered UUIDv7 primary keys (RFC 9562).
+
+A UUIDv7 starts with its creation time in milliseconds, so new keys are
+appended at the right edge of a B-tree index instead of landing on random
+pages. Within a millisecond the 12 bits after the version are a counter, so
+ids generated by one process are strictly increasing.
+
+Rows created before UUIDv7 keep their random UUIDv4 keys; rewriting primary
+keys that clients, read positions and conversation summaries refer to isn't
+worth it. ``messages`` is partitioned by month, so every partition created
+after the switch holds UUIDv7 keys only and the random ones age out with
+their partitions. Code that derives a time from an id must check
+:pyfunc:`uuid7_time` for ``None``.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from uuid import UUID
+import os
+import threading
+import time
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_COUNTER_MAX = 0xFFF
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+def uuid7() -> UUID:
+    """Return a new UUIDv7, greater than every one this process returned before."""
+    global _last_ms, _counter
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _last_ms:
+            _last_ms = now_ms
+            # Start low in the counter range so a burst doesn't overflow it
+            _counter = int.from_bytes(os.urandom(2), "big") & 0x1FF
+        else:
+            _counter += 1
+            if _counter > _COUNTER_MAX:
+                # Out of counter values (or the clock went back): borrow the next millisecond
+                _last_ms += 1
+                _counter = 0
+        timestamp_ms, counter = _last_ms, _counter
+
+    random_bits = int.from_bytes(os.urandom(8), "big") & 0x3FFF_FFFF_FFFF_FFFF
+    value = (timestamp_ms & 0xFFFF_FFFF_FFFF) << 80
+    value |= 0x7 << 76
+    value |= counter << 64
+    value |= 0b10 << 62
+    value |= random_bits
+    return UUID(int=value)
+
+def uuid7_time(value: UUID) -> Optional[datetime]:
+    """Return the millisecond timestamp embedded in a UUIDv7, ``None`` for other versions."""
+    if value.version != 7:
+        return None
+    return _EPOCH + timedelta(milliseconds=value.int >> 80)
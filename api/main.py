@@ -1,7 +1,9 @@
 import os
 import sys
 import asyncio
-from typing import Callable, Awaitable
+import contextlib
+import time
+from typing import AsyncIterator, Callable, Awaitable
 
 # When running the file directly (for example from the `api/` folder in a debugger)
 # Python's import machinery won't find the top-level `api` package because
@@ -23,15 +25,48 @@ from starlette.responses import Response
 
 from .routes import (
     auth as auth_routes,
+    bootstrap as bootstrap_routes,
     users as users_routes,
     messages as messages_routes,
     conversations as conversations_routes,
+    metrics as metrics_routes,
+    sync as sync_routes,
 )
 from .sockets import auth_socket_router, chat_socket_router
 from .services.auth_service import cleanup_tokens
+from .services.cursor_service import NEXT_CURSOR_HEADER, PREV_CURSOR_HEADER
+from .services.read_receipts_service import flush_read_receipts, run_read_receipt_flusher
+from .services.partitions_service import run_partition_maintainer
+from .services.notifications_service import run_notification_listener
+from .services.purge_service import run_purge_worker
+from .overload import run_loop_lag_monitor
+from .deadlines import EXCEPTION_HANDLERS as DEADLINE_EXCEPTION_HANDLERS, DeadlineMiddleware
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Read receipts are buffered in memory and written in batches
+    flusher = asyncio.create_task(run_read_receipt_flusher())
+    # Keeps message partitions created ahead of time and archives old ones
+    maintainer = asyncio.create_task(run_partition_maintainer())
+    # Invalidates cached roles and profiles when another worker changes them
+    listener = asyncio.create_task(run_notification_listener())
+    # Removes deleted conversations and accounts in small batches
+    purger = asyncio.create_task(run_purge_worker())
+    # Feeds the overload controller that sheds low-priority requests
+    lag_monitor = asyncio.create_task(run_loop_lag_monitor())
+    try:
+        yield
+    finally:
+        for task in (flusher, maintainer, listener, purger, lag_monitor):
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        # Don't lose receipts buffered since the last flush
+        with contextlib.suppress(Exception):
+            await asyncio.to_thread(flush_read_receipts)
 
 # Define main app function config
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Set CORS - MUST be added before routes are included
 origins = [
@@ -45,8 +80,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let browser clients read the pagination cursors
+    expose_headers=[NEXT_CURSOR_HEADER, PREV_CURSOR_HEADER],
 )
 
+# Requests get a deadline that bounds their database queries; running out
+# of time is a 504, an unavailable database a 503
+app.add_middleware(middleware_class=DeadlineMiddleware)
+for exception_class, handler in DEADLINE_EXCEPTION_HANDLERS.items():
+    app.add_exception_handler(exc_class_or_status_code=exception_class, handler=handler)
+
 # Define routers
 # Include API routers from the routes package (each module exposes an APIRouter
 # instance named `router`). Import names are aliased above to avoid shadowing
@@ -55,17 +98,29 @@ app.include_router(router=auth_routes.router)
 app.include_router(router=users_routes.router)
 app.include_router(router=messages_routes.router)
 app.include_router(router=conversations_routes.router)
+app.include_router(router=metrics_routes.router)
+app.include_router(router=sync_routes.router)
+app.include_router(router=bootstrap_routes.router)
 
 # Define websockets
 app.include_router(router=auth_socket_router)
 app.include_router(router=chat_socket_router)
 
+# Token cleanup borrows a pooled connection, so run it at most once per interval
+# instead of once per request.
+TOKEN_CLEANUP_INTERVAL_SECONDS = 60.0
+_last_token_cleanup = 0.0
+
 @app.middleware(middleware_type="http")
 async def cleanup_middleware(
     request: Request, call_next: Callable[[Request], Awaitable[Response]]
 ) -> Response:
+    global _last_token_cleanup
     # Fire-and-forget token cleanup; don't await so requests aren't delayed.
-    asyncio.create_task(cleanup_tokens())
+    now = time.monotonic()
+    if now - _last_token_cleanup >= TOKEN_CLEANUP_INTERVAL_SECONDS:
+        _last_token_cleanup = now
+        asyncio.create_task(cleanup_tokens())
     response: Response = await call_next(request)
 
     # Ensure CORS headers are always present
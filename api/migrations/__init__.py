@@ -0,0 +1,130 @@
+"""Versioned schema migrations.
+
+Each migration lives in a module named ``mNNNN_<name>.py`` inside this
+package and defines:
+
+``VERSION``
+    Integer version, unique and increasing.
+``NAME``
+    Short human readable name.
+``TRANSACTIONAL``
+    ``False`` for migrations that must run outside a transaction, such as
+    ``CREATE INDEX CONCURRENTLY``.
+``INDEXES``
+    Mapping of index name to a description of the queries it serves. Used by
+    ``python -m api.migrations indexes``.
+``DROPPED_INDEXES``
+    Optional names of indexes built by earlier migrations that this one
+    drops; they are left out of the index report.
+``upgrade(conn)``
+    Applies the migration using the given connection.
+
+Migrations are written to be idempotent so they can be safely re-run against
+a database that was created from the current models by the baseline
+migration. Applied versions are recorded in the ``schema_migrations`` table.
+"""
+from importlib import import_module
+import pkgutil
+import re
+from types import ModuleType
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+MIGRATIONS_TABLE = "schema_migrations"
+# Arbitrary constant used as the advisory lock key so that only one process
+# applies migrations at a time.
+MIGRATIONS_LOCK_KEY = 482_611_027
+
+_MODULE_PATTERN = re.compile(pattern=r"^m\d{4}_")
+
+def discover_migrations() -> list[ModuleType]:
+    """Import every migration module in this package, ordered by version."""
+    modules: list[ModuleType] = []
+    for _, name, _ in pkgutil.iter_modules(path=__path__):
+        if _MODULE_PATTERN.match(string=name):
+            modules.append(import_module(name=f"{__name__}.{name}"))
+
+    modules.sort(key=lambda m: m.VERSION)
+    versions = [m.VERSION for m in modules]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration versions: {versions}")
+    return modules
+
+def ensure_migrations_table(engine: Engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+                version integer PRIMARY KEY,
+                name text NOT NULL,
+                applied_at timestamptz NOT NULL DEFAULT now()
+            )
+        """))
+
+def applied_versions(engine: Engine) -> set[int]:
+    ensure_migrations_table(engine=engine)
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"SELECT version FROM {MIGRATIONS_TABLE}")).all()
+    return {row.version for row in rows}
+
+def upgrade(engine: Engine, target: Optional[int] = None) -> list[int]:
+    """Apply all pending migrations up to ``target`` (inclusive).
+
+    Transactional migrations run inside a transaction together with the
+    bookkeeping insert. Non-transactional migrations run in autocommit mode
+    and are recorded once they finish; because they are idempotent an
+    interrupted run can simply be repeated.
+
+    Returns:
+        The list of versions applied by this call.
+    """
+    ensure_migrations_table(engine=engine)
+    applied: list[int] = []
+
+    with engine.connect() as lock_conn:
+        lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+        lock_conn.commit()
+        try:
+            done = applied_versions(engine=engine)
+            for migration in discover_migrations():
+                if migration.VERSION in done:
+                    continue
+                if target is not None and migration.VERSION > target:
+                    break
+
+                if migration.TRANSACTIONAL:
+                    with engine.begin() as conn:
+                        migration.upgrade(conn)
+                        _record(conn=conn, migration=migration)
+                else:
+                    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                        migration.upgrade(conn)
+                    with engine.begin() as conn:
+                        _record(conn=conn, migration=migration)
+                applied.append(migration.VERSION)
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+            lock_conn.commit()
+    return applied
+
+def _record(conn: Connection, migration: ModuleType) -> None:
+    conn.execute(
+        text(f"INSERT INTO {MIGRATIONS_TABLE} (version, name) VALUES (:version, :name) ON CONFLICT (version) DO NOTHING"),
+        {"version": migration.VERSION, "name": migration.NAME},
+    )
+
+def status(engine: Engine) -> list[tuple[int, str, bool]]:
+    """Return ``(version, name, applied)`` for every known migration."""
+    done = applied_versions(engine=engine)
+    return [(m.VERSION, m.NAME, m.VERSION in done) for m in discover_migrations()]
+
+def index_report() -> list[tuple[int, str, str]]:
+    """Return ``(version, index name, queries served)`` for every index that still exists."""
+    report: list[tuple[int, str, str]] = []
+    for migration in discover_migrations():
+        dropped = set(getattr(migration, "DROPPED_INDEXES", ()))
+        report = [entry for entry in report if entry[1] not in dropped]
+        for index_name, serves in getattr(migration, "INDEXES", {}).items():
+            report.append((migration.VERSION, index_name, serves))
+    return report
@@ -0,0 +1,31 @@
+"""Command line entry point: ``python -m api.migrations [upgrade|status|indexes]``."""
+import argparse
+
+from . import upgrade, status, index_report
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m api.migrations")
+    parser.add_argument("command", nargs="?", default="upgrade", choices=["upgrade", "status", "indexes"])
+    parser.add_argument("--target", type=int, default=None, help="Highest version to apply")
+    args = parser.parse_args()
+
+    if args.command == "indexes":
+        for version, name, serves in index_report():
+            print(f"[{version:04d}] {name}\n    serves: {serves}")
+        return
+
+    from ..database import engine
+
+    if args.command == "status":
+        for version, name, applied in status(engine=engine):
+            print(f"[{'x' if applied else ' '}] {version:04d} {name}")
+        return
+
+    applied = upgrade(engine=engine, target=args.target)
+    if applied:
+        print(f"Applied migrations: {', '.join(f'{v:04d}' for v in applied)}")
+    else:
+        print("Database is up to date")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""Create the tables declared by the models that don't exist yet.
+
+On a fresh database this produces the full current schema, which is why
+every later migration is written to be idempotent.
+"""
+from sqlalchemy.engine import Connection
+
+VERSION = 1
+NAME = "baseline"
+TRANSACTIONAL = True
+INDEXES: dict[str, str] = {}
+
+def upgrade(conn: Connection) -> None:
+    from .. import models  # noqa: F401  # register every model on Base.metadata
+    from ..database import Base
+
+    Base.metadata.create_all(bind=conn, checkfirst=True)
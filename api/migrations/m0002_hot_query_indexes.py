@@ -0,0 +1,68 @@
+"""Indexes for the queries issued on every request.
+
+Before this migration only primary keys and unique constraints were indexed,
+so message pages, membership checks and token lookups were sequential scans.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from .ops import create_index_concurrently
+
+VERSION = 2
+NAME = "hot_query_indexes"
+TRANSACTIONAL = False
+INDEXES: dict[str, str] = {
+    "ix_messages_conversation_created": (
+        "get_all_messages_service: WHERE conversation_id = ? ORDER BY created_at DESC, id DESC "
+        "LIMIT n (message history pages, newest first)"
+    ),
+    "uq_participants_user_conversation": (
+        "get_user_role / check_user_in_conversation: WHERE conversation_id = ? AND user_id = ?; "
+        "get_all_conversations_service: WHERE user_id = ?; prevents duplicate memberships"
+    ),
+    "ix_participants_conversation": (
+        "participant counts per conversation, delete_conversation_service and the "
+        "ON DELETE CASCADE from conversations"
+    ),
+    "ix_tokens_user_id": (
+        "create_refresh_token rotation and revoke_refresh_token: WHERE user_id = ?; "
+        "the ON DELETE CASCADE from users"
+    ),
+}
+
+def upgrade(conn: Connection) -> None:
+    # Duplicate memberships would make the unique index build fail; keep the
+    # strongest role (admin sorts first) and the earliest join.
+    conn.execute(text("""
+        DELETE FROM participants p
+        USING (
+            SELECT id, row_number() OVER (
+                PARTITION BY conversation_id, user_id
+                ORDER BY role = 'admin' DESC, joined_at ASC NULLS LAST, id
+            ) AS rn
+            FROM participants
+        ) d
+        WHERE p.id = d.id AND d.rn > 1
+    """))
+
+    create_index_concurrently(
+        conn=conn,
+        name="ix_messages_conversation_created",
+        definition="messages (conversation_id, created_at DESC, id DESC)",
+    )
+    create_index_concurrently(
+        conn=conn,
+        name="uq_participants_user_conversation",
+        definition="participants (user_id, conversation_id)",
+        unique=True,
+    )
+    create_index_concurrently(
+        conn=conn,
+        name="ix_participants_conversation",
+        definition="participants (conversation_id)",
+    )
+    create_index_concurrently(
+        conn=conn,
+        name="ix_tokens_user_id",
+        definition="tokens (user_id)",
+    )
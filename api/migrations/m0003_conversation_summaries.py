@@ -0,0 +1,80 @@
+"""Denormalized conversation summaries and activity ordering.
+
+Adds the summary columns maintained by the message and participant write
+paths, backfills them in batches and builds the index the conversation
+list is served from.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from .ops import create_index_concurrently
+
+VERSION = 3
+NAME = "conversation_summaries"
+TRANSACTIONAL = False
+INDEXES: dict[str, str] = {
+    "ix_participants_user_activity": (
+        "get_all_conversations_service: WHERE user_id = ? AND (last_message_at, conversation_id) < cursor "
+        "ORDER BY last_message_at DESC, conversation_id DESC LIMIT n (sidebar, keyset paged)"
+    ),
+}
+
+BATCH_SIZE = 1000
+PREVIEW_LENGTH = 140
+
+def upgrade(conn: Connection) -> None:
+    # New columns are added nullable so the ALTERs are metadata-only
+    conn.execute(text("""
+        ALTER TABLE conversations
+            ADD COLUMN IF NOT EXISTS participant_count integer NOT NULL DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS last_message_at timestamptz,
+            ADD COLUMN IF NOT EXISTS last_message_id uuid,
+            ADD COLUMN IF NOT EXISTS last_message_preview text,
+            ADD COLUMN IF NOT EXISTS last_message_sender_id uuid REFERENCES users (id) ON DELETE SET NULL
+    """))
+    conn.execute(text("ALTER TABLE participants ADD COLUMN IF NOT EXISTS last_message_at timestamptz"))
+
+    # Backfill conversations in bounded batches to keep row locks short
+    while True:
+        result = conn.execute(text("""
+            UPDATE conversations c SET
+                participant_count = (SELECT count(*) FROM participants p WHERE p.conversation_id = c.id),
+                last_message_at = COALESCE(lm.created_at, c.created_at),
+                last_message_id = lm.id,
+                last_message_preview = left(lm.content, :preview_length),
+                last_message_sender_id = lm.sender_id
+            FROM (
+                SELECT id FROM conversations WHERE last_message_at IS NULL ORDER BY id LIMIT :batch
+            ) todo
+            LEFT JOIN LATERAL (
+                SELECT m.id, m.created_at, m.content, m.sender_id
+                FROM messages m
+                WHERE m.conversation_id = todo.id
+                ORDER BY m.created_at DESC, m.id DESC
+                LIMIT 1
+            ) lm ON true
+            WHERE c.id = todo.id
+        """), {"batch": BATCH_SIZE, "preview_length": PREVIEW_LENGTH})
+        if result.rowcount == 0:
+            break
+
+    while True:
+        result = conn.execute(text("""
+            UPDATE participants p SET last_message_at = c.last_message_at
+            FROM conversations c
+            WHERE p.id IN (SELECT id FROM participants WHERE last_message_at IS NULL LIMIT :batch)
+              AND c.id = p.conversation_id
+        """), {"batch": BATCH_SIZE})
+        if result.rowcount == 0:
+            break
+
+    conn.execute(text("ALTER TABLE conversations ALTER COLUMN last_message_at SET DEFAULT now()"))
+    conn.execute(text("ALTER TABLE conversations ALTER COLUMN last_message_at SET NOT NULL"))
+    conn.execute(text("ALTER TABLE participants ALTER COLUMN last_message_at SET DEFAULT now()"))
+    conn.execute(text("ALTER TABLE participants ALTER COLUMN last_message_at SET NOT NULL"))
+
+    create_index_concurrently(
+        conn=conn,
+        name="ix_participants_user_activity",
+        definition="participants (user_id, last_message_at DESC, conversation_id DESC)",
+    )
@@ -0,0 +1,25 @@
+"""Per-participant read cursors and unread counters.
+
+Existing memberships are treated as read up to their last activity, so they
+start with zero unread messages rather than counting each conversation's
+full history.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+VERSION = 4
+NAME = "read_state"
+TRANSACTIONAL = True
+INDEXES: dict[str, str] = {}
+
+def upgrade(conn: Connection) -> None:
+    conn.execute(text("""
+        ALTER TABLE participants
+            ADD COLUMN IF NOT EXISTS last_read_message_id uuid,
+            ADD COLUMN IF NOT EXISTS last_read_at timestamptz,
+            ADD COLUMN IF NOT EXISTS unread_count integer NOT NULL DEFAULT 0
+    """))
+    conn.execute(text("""
+        UPDATE participants SET last_read_at = last_message_at
+        WHERE last_read_at IS NULL
+    """))
@@ -0,0 +1,57 @@
+"""Full-text search over message content.
+
+Adds a ``tsvector`` column kept up to date by a trigger on insert and on
+content edits, backfills existing messages in batches and builds the GIN
+index searches are served from.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from .ops import create_index_concurrently
+
+VERSION = 5
+NAME = "message_search"
+TRANSACTIONAL = False
+INDEXES: dict[str, str] = {
+    "ix_messages_search_vector": (
+        "search_messages_service: WHERE search_vector @@ websearch_to_tsquery(?) "
+        "ORDER BY ts_rank_cd DESC, id DESC (message search, keyset paged)"
+    ),
+}
+
+BATCH_SIZE = 5000
+
+def upgrade(conn: Connection) -> None:
+    conn.execute(text("ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector"))
+
+    # 'simple' doesn't stem or drop stop words, which suits mixed-language chat;
+    # search_service.TEXT_SEARCH_CONFIG must match.
+    conn.execute(text("""
+        CREATE OR REPLACE FUNCTION messages_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := to_tsvector('simple', coalesce(NEW.content, ''));
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """))
+    conn.execute(text("DROP TRIGGER IF EXISTS messages_search_vector ON messages"))
+    conn.execute(text("""
+        CREATE TRIGGER messages_search_vector
+            BEFORE INSERT OR UPDATE OF content ON messages
+            FOR EACH ROW EXECUTE FUNCTION messages_search_vector_update()
+    """))
+
+    # Backfill in bounded batches to keep row locks short
+    while True:
+        result = conn.execute(text("""
+            UPDATE messages SET search_vector = to_tsvector('simple', content)
+            WHERE id IN (SELECT id FROM messages WHERE search_vector IS NULL LIMIT :batch)
+        """), {"batch": BATCH_SIZE})
+        if result.rowcount == 0:
+            break
+
+    create_index_concurrently(
+        conn=conn,
+        name="ix_messages_search_vector",
+        definition="messages USING gin (search_vector)",
+    )
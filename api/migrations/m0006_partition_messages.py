@@ -0,0 +1,97 @@
+"""Range partition ``messages`` by month on ``created_at``.
+
+A table can't be turned into a partitioned table in place, and copying
+hundreds of millions of rows isn't an option. Instead the existing table is
+renamed to ``messages_legacy`` and attached to a new partitioned
+``messages`` as the partition for everything before the start of next
+month; new monthly partitions take over from there. Everything expensive
+happens before the swap without blocking writes:
+
+* a unique index on ``(id, created_at)`` matching the new primary key is
+  built concurrently; the swap makes it the legacy partition's primary key
+  in place of the one on ``id`` alone, and
+* a ``CHECK`` constraint matching the legacy partition's bounds is added
+  ``NOT VALID`` and validated, so attaching doesn't scan the table.
+
+The swap itself is metadata only and runs in one short transaction. The
+existing indexes and foreign keys are reused by the new parent rather than
+rebuilt. Databases created from the current models already have a
+partitioned ``messages``; for those only the partitions are created.
+"""
+from datetime import datetime, timezone
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from .ops import create_index_concurrently
+
+VERSION = 6
+NAME = "partition_messages"
+TRANSACTIONAL = False
+INDEXES: dict[str, str] = {}
+
+def upgrade(conn: Connection) -> None:
+    from ..services.partitions_service import add_months, ensure_message_partitions, is_partitioned, month_start
+
+    if not is_partitioned(conn=conn):
+        legacy_exists = conn.execute(text("SELECT to_regclass('messages_legacy')")).scalar()
+        if legacy_exists:
+            raise RuntimeError("messages_legacy already exists but messages isn't partitioned")
+
+        next_month = add_months(value=month_start(value=datetime.now(tz=timezone.utc).date()), months=1)
+        cutoff = f"'{next_month.isoformat()} 00:00:00+00'"
+
+        create_index_concurrently(
+            conn=conn,
+            name="messages_legacy_id_created_at",
+            definition="messages (id, created_at)",
+            unique=True,
+        )
+        exists = conn.execute(text("""
+            SELECT 1 FROM pg_constraint
+            WHERE conname = 'messages_legacy_range' AND connamespace = current_schema()::regnamespace
+        """)).first()
+        if not exists:
+            conn.execute(text(f"ALTER TABLE messages ADD CONSTRAINT messages_legacy_range CHECK (created_at < {cutoff}) NOT VALID"))
+        conn.execute(text("ALTER TABLE messages VALIDATE CONSTRAINT messages_legacy_range"))
+
+        conn.execute(text("BEGIN"))
+        try:
+            conn.execute(text("SET LOCAL lock_timeout = '10s'"))
+            conn.execute(text("LOCK TABLE messages IN ACCESS EXCLUSIVE MODE"))
+            conn.execute(text("ALTER TABLE messages RENAME TO messages_legacy"))
+            # A partition can't have a primary key other than the parent's
+            conn.execute(text("""
+                ALTER TABLE messages_legacy
+                    DROP CONSTRAINT messages_pkey,
+                    ADD CONSTRAINT messages_legacy_pkey PRIMARY KEY USING INDEX messages_legacy_id_created_at
+            """))
+            conn.execute(text("ALTER INDEX ix_messages_conversation_created RENAME TO messages_legacy_conversation_created"))
+            conn.execute(text("ALTER INDEX ix_messages_search_vector RENAME TO messages_legacy_search_vector"))
+            # The parent's trigger is cloned onto every partition
+            conn.execute(text("DROP TRIGGER IF EXISTS messages_search_vector ON messages_legacy"))
+
+            conn.execute(text("""
+                CREATE TABLE messages (LIKE messages_legacy INCLUDING DEFAULTS INCLUDING STORAGE)
+                PARTITION BY RANGE (created_at)
+            """))
+            conn.execute(text("ALTER TABLE messages ADD PRIMARY KEY (id, created_at)"))
+            conn.execute(text("""
+                ALTER TABLE messages
+                    ADD FOREIGN KEY (conversation_id) REFERENCES conversations (id) ON DELETE CASCADE,
+                    ADD FOREIGN KEY (sender_id) REFERENCES users (id) ON DELETE CASCADE
+            """))
+            conn.execute(text("CREATE INDEX ix_messages_conversation_created ON messages (conversation_id, created_at DESC, id DESC)"))
+            conn.execute(text("CREATE INDEX ix_messages_search_vector ON messages USING gin (search_vector)"))
+            conn.execute(text("""
+                CREATE TRIGGER messages_search_vector
+                    BEFORE INSERT OR UPDATE OF content ON messages
+                    FOR EACH ROW EXECUTE FUNCTION messages_search_vector_update()
+            """))
+            # Matching indexes, foreign keys and the validated CHECK make this metadata only
+            conn.execute(text(f"ALTER TABLE messages ATTACH PARTITION messages_legacy FOR VALUES FROM (MINVALUE) TO ({cutoff})"))
+            conn.execute(text("COMMIT"))
+        except Exception:
+            conn.execute(text("ROLLBACK"))
+            raise
+
+    ensure_message_partitions(conn=conn)
@@ -0,0 +1,45 @@
+"""Indexes for the user directory's keyset pages and name/email search.
+
+Substring matches can't use a btree index, so email and names get pg_trgm
+GIN indexes; they serve both ``LIKE 'abc%'`` and ``LIKE '%abc%'``.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from .ops import create_index_concurrently
+
+VERSION = 7
+NAME = "user_directory"
+TRANSACTIONAL = False
+INDEXES: dict[str, str] = {
+    "ix_users_email_lower": (
+        "search_users_service: ORDER BY lower(email), id LIMIT n with a keyset cursor "
+        "(directory pages)"
+    ),
+    "ix_users_email_trgm": (
+        "search_users_service: WHERE lower(email) LIKE 'q%' (email prefix search)"
+    ),
+    "ix_user_profiles_search_name_trgm": (
+        "search_users_service: WHERE lower(first_name || ' ' || last_name) LIKE 'q%' OR LIKE '% q%' "
+        "(name search)"
+    ),
+}
+
+def upgrade(conn: Connection) -> None:
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+    create_index_concurrently(
+        conn=conn,
+        name="ix_users_email_lower",
+        definition="users (lower(email), id)",
+    )
+    create_index_concurrently(
+        conn=conn,
+        name="ix_users_email_trgm",
+        definition="users USING gin (lower(email) gin_trgm_ops)",
+    )
+    create_index_concurrently(
+        conn=conn,
+        name="ix_user_profiles_search_name_trgm",
+        definition="user_profiles USING gin (lower(coalesce(first_name, '') || ' ' || coalesce(last_name, '')) gin_trgm_ops)",
+    )
@@ -0,0 +1,54 @@
+"""One private conversation per pair of users.
+
+Adds ``conversations.private_pair_key`` and a unique index on it. Existing
+private conversations between exactly two users get their key; where a
+pair already has several, only the one with the most recent activity gets
+it and the others stay as they are, so no history is merged or lost.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from .ops import create_index_concurrently
+
+VERSION = 8
+NAME = "private_pair_key"
+TRANSACTIONAL = False
+INDEXES: dict[str, str] = {
+    "uq_conversations_private_pair": (
+        "create_conversation_service: INSERT ... ON CONFLICT (private_pair_key) for private "
+        "conversations; prevents duplicate conversations between two users"
+    ),
+}
+
+def upgrade(conn: Connection) -> None:
+    conn.execute(text("ALTER TABLE conversations ADD COLUMN IF NOT EXISTS private_pair_key text"))
+    # uuid ordering matches the ordering of the ids in Python
+    conn.execute(text("""
+        UPDATE conversations c SET private_pair_key = k.pair_key
+        FROM (
+            SELECT DISTINCT ON (pair_key) conversation_id, pair_key
+            FROM (
+                SELECT
+                    p.conversation_id,
+                    (array_agg(p.user_id ORDER BY p.user_id))[1]::text || ':'
+                        || (array_agg(p.user_id ORDER BY p.user_id))[2]::text AS pair_key,
+                    max(c.last_message_at) AS last_message_at
+                FROM participants p
+                JOIN conversations c ON c.id = p.conversation_id
+                WHERE c.conversation_type = 'private'
+                GROUP BY p.conversation_id
+                HAVING count(DISTINCT p.user_id) = 2
+            ) pairs
+            ORDER BY pair_key, last_message_at DESC, conversation_id
+        ) k
+        WHERE c.id = k.conversation_id
+          AND c.private_pair_key IS NULL
+          AND NOT EXISTS (SELECT 1 FROM conversations o WHERE o.private_pair_key = k.pair_key)
+    """))
+
+    create_index_concurrently(
+        conn=conn,
+        name="uq_conversations_private_pair",
+        definition="conversations (private_pair_key) WHERE private_pair_key IS NOT NULL",
+        unique=True,
+    )
@@ -0,0 +1,42 @@
+"""Soft deletion and background purging of conversations and accounts.
+
+Adds ``deleted_at`` to ``conversations`` and ``users``, the ``purge_jobs``
+table the purge worker works through, and an index on ``messages.sender_id``
+so an account's messages can be deleted in batches without scanning every
+partition.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from .ops import create_partitioned_index_concurrently
+
+VERSION = 9
+NAME = "purge_jobs"
+TRANSACTIONAL = False
+INDEXES: dict[str, str] = {
+    "ix_purge_jobs_unfinished": "purge_service: oldest unfinished job, WHERE status <> 'done' ORDER BY created_at",
+    "ix_messages_sender": "purge_service: DELETE FROM messages WHERE sender_id = ? in batches when an account is purged",
+}
+
+def upgrade(conn: Connection) -> None:
+    conn.execute(text("ALTER TABLE conversations ADD COLUMN IF NOT EXISTS deleted_at timestamptz"))
+    conn.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS deleted_at timestamptz"))
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS purge_jobs (
+            id uuid PRIMARY KEY,
+            kind varchar NOT NULL,
+            target_id uuid NOT NULL,
+            requested_by uuid,
+            status varchar NOT NULL,
+            phase varchar NOT NULL,
+            rows_deleted bigint NOT NULL DEFAULT 0,
+            last_error text,
+            created_at timestamptz NOT NULL,
+            updated_at timestamptz NOT NULL,
+            finished_at timestamptz
+        )
+    """))
+    # The table is new, so this doesn't have to be built concurrently
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_purge_jobs_unfinished ON purge_jobs (created_at) WHERE status <> 'done'"))
+
+    create_partitioned_index_concurrently(conn=conn, name="ix_messages_sender", table="messages", columns="(sender_id)")
@@ -0,0 +1,73 @@
+"""Per-conversation message sequence numbers.
+
+Adds ``messages.seq`` and ``conversations.last_seq`` and numbers the
+existing messages of every conversation 1, 2, 3, ... in ``(created_at, id)``
+order. The backfill runs one conversation at a time in transactions of
+``BACKFILL_BATCH_SIZE`` messages that lock the conversation row, like
+sending a message does, so it can run next to the application. Only
+messages without a ``seq`` are numbered, continuing from ``last_seq``.
+
+Apply it before deploying the code that assigns ``seq``. Messages the
+previous version sends after its conversation was numbered get no ``seq``;
+running this module's ``upgrade`` again after the deploy numbers them too.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from .ops import create_partitioned_index_concurrently
+
+VERSION = 10
+NAME = "message_seq"
+TRANSACTIONAL = False
+INDEXES: dict[str, str] = {
+    "ix_messages_conversation_seq": (
+        "get_messages_by_seq_service: WHERE conversation_id = ? AND seq BETWEEN ? AND ?"
+    ),
+}
+
+BACKFILL_BATCH_SIZE = 10000
+
+def upgrade(conn: Connection) -> None:
+    conn.execute(text("ALTER TABLE conversations ADD COLUMN IF NOT EXISTS last_seq bigint NOT NULL DEFAULT 0"))
+    conn.execute(text("ALTER TABLE messages ADD COLUMN IF NOT EXISTS seq bigint"))
+    # Built first so the backfill can find unnumbered messages per conversation quickly
+    create_partitioned_index_concurrently(conn=conn, name="ix_messages_conversation_seq", table="messages", columns="(conversation_id, seq)")
+
+    conversation_ids = conn.execute(text("SELECT id FROM conversations ORDER BY id")).scalars().all()
+    for conversation_id in conversation_ids:
+        while _number_batch(conn=conn, conversation_id=conversation_id) == BACKFILL_BATCH_SIZE:
+            pass
+
+def _number_batch(conn: Connection, conversation_id: object) -> int:
+    conn.execute(text("BEGIN"))
+    try:
+        numbered = conn.execute(
+            text("""
+                WITH conversation AS (
+                    SELECT id, last_seq FROM conversations WHERE id = :conversation_id FOR UPDATE
+                ), batch AS (
+                    SELECT id, created_at FROM messages
+                    WHERE conversation_id = :conversation_id AND seq IS NULL
+                    ORDER BY created_at, id
+                    LIMIT :batch_size
+                ), numbered AS (
+                    SELECT b.id, b.created_at, c.last_seq + row_number() OVER (ORDER BY b.created_at, b.id) AS seq
+                    FROM batch b CROSS JOIN conversation c
+                ), updated AS (
+                    UPDATE messages m SET seq = n.seq
+                    FROM numbered n
+                    WHERE m.id = n.id AND m.created_at = n.created_at
+                    RETURNING m.seq
+                ), counter AS (
+                    UPDATE conversations SET last_seq = (SELECT max(seq) FROM updated)
+                    WHERE id = :conversation_id AND EXISTS (SELECT 1 FROM updated)
+                )
+                SELECT count(*) FROM updated
+            """),
+            {"conversation_id": conversation_id, "batch_size": BACKFILL_BATCH_SIZE},
+        ).scalar_one()
+        conn.execute(text("COMMIT"))
+    except Exception:
+        conn.execute(text("ROLLBACK"))
+        raise
+    return numbered
@@ -0,0 +1,31 @@
+"""Participants ordered by user within a conversation.
+
+Replaces ``ix_participants_conversation`` with an index on
+``(conversation_id, user_id)``. It serves everything the old one did, plus
+the keyset-paginated member list and the ``user_id = ANY(...)`` lookups of
+bulk participant changes.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from .ops import create_index_concurrently
+
+VERSION = 12
+NAME = "participants_by_conversation"
+TRANSACTIONAL = False
+INDEXES: dict[str, str] = {
+    "ix_participants_conversation_user": (
+        "get_participants_page_service: WHERE conversation_id = ? AND user_id > ? ORDER BY user_id; "
+        "bulk participant changes WHERE conversation_id = ? AND user_id = ANY(?); "
+        "delete_conversation_service and the ON DELETE CASCADE from conversations"
+    ),
+}
+DROPPED_INDEXES = ("ix_participants_conversation",)
+
+def upgrade(conn: Connection) -> None:
+    create_index_concurrently(
+        conn=conn,
+        name="ix_participants_conversation_user",
+        definition="participants (conversation_id, user_id)",
+    )
+    conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS ix_participants_conversation"))
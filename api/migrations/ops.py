@@ -0,0 +1,77 @@
+"""Helpers shared by migration modules."""
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+def index_is_valid(conn: Connection, name: str) -> Optional[bool]:
+    """Return whether index ``name`` is valid, or ``None`` if it doesn't exist."""
+    row = conn.execute(
+        text("""
+            SELECT i.indisvalid
+            FROM pg_class c
+            JOIN pg_index i ON i.indexrelid = c.oid
+            WHERE c.relname = :name AND c.relkind IN ('i', 'I') AND c.relnamespace = current_schema()::regnamespace
+        """),
+        {"name": name},
+    ).first()
+    return None if row is None else bool(row.indisvalid)
+
+def create_index_concurrently(conn: Connection, name: str, definition: str, unique: bool = False) -> None:
+    """Build an index without blocking writes.
+
+    ``definition`` is everything after ``ON``, for example
+    ``"messages (conversation_id, created_at DESC)"``. A previously
+    interrupted ``CONCURRENTLY`` build leaves an invalid index behind; it is
+    dropped and rebuilt. The connection must be in autocommit mode.
+    """
+    valid = index_is_valid(conn=conn, name=name)
+    if valid:
+        return
+    if valid is False:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+    unique_sql = "UNIQUE " if unique else ""
+    conn.execute(text(f"CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}"))
+
+def column_exists(conn: Connection, table: str, column: str) -> bool:
+    row = conn.execute(
+        text("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = :table AND column_name = :column
+        """),
+        {"table": table, "column": column},
+    ).first()
+    return row is not None
+
+def create_partitioned_index_concurrently(conn: Connection, name: str, table: str, columns: str) -> None:
+    """Build an index on a partitioned table without blocking writes.
+
+    Postgres can't build an index on a partitioned table concurrently, so an
+    invalid parent index is created with ``ON ONLY``, each partition is
+    indexed concurrently and attached to it, and the parent index becomes
+    valid once every partition is attached. Partitions created later get
+    the index automatically. ``columns`` is the parenthesised column list,
+    for example ``"(sender_id)"``. The connection must be in autocommit mode.
+    """
+    if index_is_valid(conn=conn, name=name):
+        return
+    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY {table} {columns}"))
+    partitions = conn.execute(
+        text("""
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = CAST(:table AS regclass)
+        """),
+        {"table": table},
+    ).scalars().all()
+    for partition in partitions:
+        partition_index = f"{partition}_{name}"
+        create_index_concurrently(conn=conn, name=partition_index, definition=f"{partition} {columns}")
+        attached = conn.execute(
+            text("SELECT 1 FROM pg_inherits WHERE inhrelid = CAST(:index AS regclass)"),
+            {"index": partition_index},
+        ).first()
+        if attached is None:
+            conn.execute(text(f"ALTER INDEX {name} ATTACH PARTITION {partition_index}"))
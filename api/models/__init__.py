@@ -1,4 +1,4 @@
 # models package
 # Import model modules relatively so importing the package registers the models
 
-from . import auth, users, conversations, messages  # type: ignore[reportUnusedImport]
\ No newline at end of file
+from . import auth, users, conversations, messages, purge_jobs, change_log  # type: ignore[reportUnusedImport]
\ No newline at end of file
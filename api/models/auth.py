@@ -4,20 +4,23 @@ from typing import List, Optional, TYPE_CHECKING
 from datetime import datetime
 import uuid
 
-from sqlalchemy import String, TIMESTAMP, func, ForeignKey
+from sqlalchemy import String, TIMESTAMP, func, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from ..database import Base
+from ..ids import uuid7
 
 class User(Base):
     __tablename__ = "users"
 
-    id: Mapped[uuid.UUID] = mapped_column(__name_pos=UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(__name_pos=UUID(as_uuid=True), primary_key=True, default=uuid7)
     email: Mapped[str] = mapped_column(__name_pos=String, unique=True, nullable=False)
     password: Mapped[str] = mapped_column(__name_pos=String, nullable=False)
     created_at: Mapped[datetime] = mapped_column(__name_pos=TIMESTAMP(timezone=False), default=func.now(), nullable=False)
     updated_at: Mapped[datetime] = mapped_column(__name_pos=TIMESTAMP(timezone=False), default=func.now(), onupdate=func.now(), nullable=False)
+    # set when the account is deleted; the rows are removed in the background (see purge_service)
+    deleted_at: Mapped[Optional[datetime]] = mapped_column(__name_pos=TIMESTAMP(timezone=True), nullable=True)
 
     # relationships
     tokens: Mapped[List["Tokens"]] = relationship(argument="Tokens", back_populates="user", cascade="all, delete-orphan")
@@ -26,7 +29,7 @@ class User(Base):
 class Tokens(Base):
     __tablename__ = "tokens"
 
-    id: Mapped[uuid.UUID] = mapped_column(__name_pos=UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(__name_pos=UUID(as_uuid=True), primary_key=True, default=uuid7)
     user_id: Mapped[uuid.UUID] = mapped_column(__name_pos=UUID(as_uuid=True), __type_pos=ForeignKey(column="users.id", ondelete="CASCADE"), nullable=False)
     token: Mapped[str] = mapped_column(__name_pos=String, nullable=False, unique=True)
     expires_at: Mapped[Optional[datetime]] = mapped_column(__name_pos=TIMESTAMP(timezone=True), nullable=False)
@@ -37,6 +40,16 @@ class Tokens(Base):
     # relationships
     user: Mapped["User"] = relationship(argument="User", back_populates="tokens")
 
+Index("ix_tokens_user_id", Tokens.user_id)
+# User directory: keyset pages ordered by (lower(email), id) and prefix/substring search
+Index("ix_users_email_lower", func.lower(User.email), User.id)
+Index(
+    "ix_users_email_trgm",
+    func.lower(User.email).label("email_lower"),
+    postgresql_using="gin",
+    postgresql_ops={"email_lower": "gin_trgm_ops"},
+)
+
 if TYPE_CHECKING:
     # import for type checking only to avoid circular imports at runtime
     from .users import UserProfile  # noqa: F401
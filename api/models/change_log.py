@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from typing import Any
+from datetime import datetime
+import uuid
+
+from sqlalchemy import BigInteger, Integer, String, DateTime, func, Index
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql.functions import FunctionElement
+
+from ..database import Base
+
+class current_txid(FunctionElement[int]):
+    """The id of the writing transaction, as a ``bigint``."""
+    type = BigInteger()
+    inherit_cache = True
+
+@compiles(current_txid, "postgresql")
+def _current_txid_postgresql(element: current_txid, compiler: Any, **kw: Any) -> str:
+    return "pg_current_xact_id()::text::bigint"
+
+@compiles(current_txid)
+def _current_txid_default(element: current_txid, compiler: Any, **kw: Any) -> str:
+    # Other databases (SQLite in tests) can't sync, but can still record changes
+    return "0"
+
+class ChangeLog(Base):
+    """Append-only record of changes clients catch up on with ``GET /sync`` (see sync_service)."""
+    __tablename__ = "change_log"
+
+    id: Mapped[int] = mapped_column(__name_pos=BigInteger().with_variant(Integer(), "sqlite"), primary_key=True, autoincrement=True)
+    # transaction that made the change; sync cursors are snapshots of which transactions are visible
+    txid: Mapped[int] = mapped_column(__name_pos=BigInteger, default=current_txid(), nullable=False)
+    # no foreign key: removals have to outlive a purged conversation until they are pruned
+    conversation_id: Mapped[uuid.UUID] = mapped_column(__name_pos=UUID(as_uuid=True), nullable=False)
+    # 'message_created', 'message_edited', 'message_deleted', 'conversation_renamed',
+    # 'participant_added', 'participant_removed' or 'participant_role_changed'
+    kind: Mapped[str] = mapped_column(__name_pos=String, nullable=False)
+    # the message, conversation or user that changed
+    entity_id: Mapped[uuid.UUID] = mapped_column(__name_pos=UUID(as_uuid=True), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(__name_pos=DateTime(timezone=True), default=func.now(), nullable=False)
+
+# Sync: changes in the caller's conversations, WHERE conversation_id = ? AND txid >= ?
+Index("ix_change_log_conversation_txid", ChangeLog.conversation_id, ChangeLog.txid)
+# Sync: the caller's own removals, from conversations they no longer see
+Index("ix_change_log_removed_user", ChangeLog.entity_id, ChangeLog.txid, postgresql_where=ChangeLog.kind == "participant_removed")
+# Pruning: WHERE created_at < ?
+Index("ix_change_log_created", ChangeLog.created_at)
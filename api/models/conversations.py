@@ -1,24 +1,38 @@
 from __future__ import annotations
 
-from typing import List, TYPE_CHECKING
+from typing import List, Optional, TYPE_CHECKING
 from datetime import datetime
 import uuid
 
-from sqlalchemy import String, Text, func, DateTime, ForeignKey
+from sqlalchemy import String, Text, Integer, BigInteger, func, DateTime, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from ..database import Base
+from ..ids import uuid7
 
 class Conversation(Base):
     __tablename__ = "conversations"
 
-    id: Mapped[uuid.UUID] = mapped_column(__name_pos=UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(__name_pos=UUID(as_uuid=True), primary_key=True, default=uuid7)
     conversation_type: Mapped[str] = mapped_column(__name_pos=String, nullable=False)  # 'private' or 'group'
     name: Mapped[str] = mapped_column(__name_pos=Text, nullable=True)
     created_by: Mapped[uuid.UUID] = mapped_column(__name_pos=UUID(as_uuid=True), nullable=False)
     created_at: Mapped[datetime] = mapped_column(__name_pos=DateTime(timezone=True), default=func.now(), nullable=False)
 
+    # summary maintained on write so conversation lists never aggregate
+    participant_count: Mapped[int] = mapped_column(__name_pos=Integer, default=0, server_default="0", nullable=False)
+    last_message_at: Mapped[datetime] = mapped_column(__name_pos=DateTime(timezone=True), default=func.now(), nullable=False)  # creation time until the first message
+    last_message_id: Mapped[Optional[uuid.UUID]] = mapped_column(__name_pos=UUID(as_uuid=True), nullable=True)
+    last_message_preview: Mapped[Optional[str]] = mapped_column(__name_pos=Text, nullable=True)
+    last_message_sender_id: Mapped[Optional[uuid.UUID]] = mapped_column(__name_pos=UUID(as_uuid=True), __type_pos=ForeignKey(column="users.id", ondelete="SET NULL"), nullable=True)
+    # seq of the newest message; sending a message increments it while holding the row lock
+    last_seq: Mapped[int] = mapped_column(__name_pos=BigInteger, default=0, server_default="0", nullable=False)
+    # "<lower user id>:<higher user id>" for private conversations, NULL for groups; one private conversation per pair
+    private_pair_key: Mapped[Optional[str]] = mapped_column(__name_pos=Text, nullable=True)
+    # set when the conversation is deleted; its messages are removed in the background (see purge_service)
+    deleted_at: Mapped[Optional[datetime]] = mapped_column(__name_pos=DateTime(timezone=True), nullable=True)
+
     # relationships
     messages: Mapped[List["Message"]] = relationship(argument="Message", back_populates="conversation", cascade="all, delete-orphan")
     participants: Mapped[List["Participant"]] = relationship(argument="Participant", back_populates="conversation", cascade="all, delete-orphan")
@@ -26,16 +40,32 @@ class Conversation(Base):
 class Participant(Base):
     __tablename__ = "participants"
 
-    id: Mapped[uuid.UUID] = mapped_column(__name_pos=UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(__name_pos=UUID(as_uuid=True), primary_key=True, default=uuid7)
     conversation_id: Mapped[uuid.UUID] = mapped_column(__name_pos=UUID(as_uuid=True), __type_pos=ForeignKey(column="conversations.id", ondelete="CASCADE"), nullable=False)
     user_id: Mapped[uuid.UUID] = mapped_column(__name_pos=UUID(as_uuid=True), __type_pos=ForeignKey(column="users.id", ondelete="CASCADE"), nullable=False)
     role: Mapped[str] = mapped_column(__name_pos=String, default="member", nullable=False)  # 'member' or 'admin'
     joined_at: Mapped[datetime] = mapped_column(__name_pos=DateTime(timezone=True), default=func.now())
+    # copy of Conversation.last_message_at so a user's conversation list is one index range scan
+    last_message_at: Mapped[datetime] = mapped_column(__name_pos=DateTime(timezone=True), default=func.now(), nullable=False)
+    # read state: position of the newest message the user has read and the number of newer messages from others
+    last_read_message_id: Mapped[Optional[uuid.UUID]] = mapped_column(__name_pos=UUID(as_uuid=True), nullable=True)
+    last_read_at: Mapped[Optional[datetime]] = mapped_column(__name_pos=DateTime(timezone=True), nullable=True)
+    unread_count: Mapped[int] = mapped_column(__name_pos=Integer, default=0, server_default="0", nullable=False)
 
     # relationships
     conversation: Mapped["Conversation"] = relationship(argument="Conversation", back_populates="participants")
     user: Mapped["User"] = relationship(argument="User")
 
+# "Open a private conversation with X" is an upsert on this key
+Index("uq_conversations_private_pair", Conversation.private_pair_key, unique=True, postgresql_where=Conversation.private_pair_key.isnot(None))
+
+# Membership lookups and "conversations of a user"; also prevents duplicate memberships
+Index("uq_participants_user_conversation", Participant.user_id, Participant.conversation_id, unique=True)
+# Members of a conversation in user order: WHERE conversation_id = ? AND user_id > ? ORDER BY user_id
+Index("ix_participants_conversation_user", Participant.conversation_id, Participant.user_id)
+# Conversation list ordered by recent activity: WHERE user_id = ? ORDER BY last_message_at DESC, conversation_id DESC
+Index("ix_participants_user_activity", Participant.user_id, Participant.last_message_at.desc(), Participant.conversation_id.desc())
+
 if TYPE_CHECKING:
     from .messages import Message  # noqa: F401
     from .auth import User  # noqa: F401
\ No newline at end of file
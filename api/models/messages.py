@@ -1,28 +1,54 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
-from datetime import datetime
+from typing import Any, TYPE_CHECKING
+from datetime import datetime, timezone
+from typing import Optional
 import uuid
 
-from sqlalchemy import Text, DateTime, func, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import BigInteger, Text, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from ..database import Base
+from ..ids import uuid7, uuid7_time
+
+def _created_at_from_id(context: Any) -> datetime:
+    # A new message's created_at is the time in its UUIDv7, so ordering by
+    # (created_at, id) is ordering by id and the id alone is a page cursor
+    message_id = context.get_current_parameters().get("id")
+    return (uuid7_time(message_id) if message_id is not None else None) or datetime.now(tz=timezone.utc)
 
 class Message(Base):
     __tablename__ = "messages"
+    # Range partitioned by month on created_at (see migration 0006 and partitions_service);
+    # the partition key has to be part of the primary key.
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
 
-    id: Mapped[uuid.UUID] = mapped_column(__name_pos=UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(__name_pos=UUID(as_uuid=True), primary_key=True, default=uuid7)
     conversation_id: Mapped[uuid.UUID] = mapped_column(__name_pos=UUID(as_uuid=True), __type_pos=ForeignKey(column="conversations.id", ondelete="CASCADE"), nullable=False)
     sender_id: Mapped[uuid.UUID] = mapped_column(__name_pos=UUID(as_uuid=True), __type_pos=ForeignKey(column="users.id", ondelete="CASCADE"), nullable=False)
     content: Mapped[str] = mapped_column(__name_pos=Text, nullable=False)
-    created_at: Mapped[datetime] = mapped_column(__name_pos=DateTime(timezone=True), default=func.now(), nullable=False)
+    # 1, 2, 3, ... in the order messages were sent to the conversation (see Conversation.last_seq);
+    # NULL only for messages that predate it and weren't backfilled yet
+    seq: Mapped[Optional[int]] = mapped_column(__name_pos=BigInteger, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(__name_pos=DateTime(timezone=True), primary_key=True, default=_created_at_from_id, nullable=False)
+    # full-text search document, maintained by the messages_search_vector trigger (see migration 0005);
+    # deferred so loading messages doesn't fetch it
+    search_vector: Mapped[Optional[str]] = mapped_column(__name_pos=TSVECTOR().with_variant(Text(), "sqlite"), nullable=True, deferred=True)
 
     # relationships
     conversation: Mapped["Conversation"] = relationship(argument="Conversation", back_populates="messages")
     sender: Mapped["User"] = relationship(argument="User")
 
+# Message history pages: WHERE conversation_id = ? ORDER BY created_at DESC, id DESC
+Index("ix_messages_conversation_created", Message.conversation_id, Message.created_at.desc(), Message.id.desc())
+# Sync by sequence number: WHERE conversation_id = ? AND seq BETWEEN ? AND ?
+Index("ix_messages_conversation_seq", Message.conversation_id, Message.seq)
+# Account purge: DELETE ... WHERE sender_id = ? in batches
+Index("ix_messages_sender", Message.sender_id)
+# Message search: WHERE search_vector @@ query
+Index("ix_messages_search_vector", Message.search_vector, postgresql_using="gin")
+
 if TYPE_CHECKING:
     from .conversations import Conversation  # noqa: F401
     from .auth import User  # noqa: F401
\ No newline at end of file
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from typing import Optional
+from datetime import datetime
+import uuid
+
+from sqlalchemy import String, Text, BigInteger, DateTime, func, Index
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ..database import Base
+from ..ids import uuid7
+
+class PurgeJob(Base):
+    """Background removal of a soft-deleted conversation or user (see purge_service)."""
+    __tablename__ = "purge_jobs"
+
+    id: Mapped[uuid.UUID] = mapped_column(__name_pos=UUID(as_uuid=True), primary_key=True, default=uuid7)
+    kind: Mapped[str] = mapped_column(__name_pos=String, nullable=False)  # 'conversation' or 'user'
+    target_id: Mapped[uuid.UUID] = mapped_column(__name_pos=UUID(as_uuid=True), nullable=False)
+    # no foreign key: the requesting user may be the one being purged
+    requested_by: Mapped[Optional[uuid.UUID]] = mapped_column(__name_pos=UUID(as_uuid=True), nullable=True)
+    status: Mapped[str] = mapped_column(__name_pos=String, default="pending", nullable=False)  # 'pending', 'running' or 'done'
+    # the step the job resumes at, for example 'messages'
+    phase: Mapped[str] = mapped_column(__name_pos=String, nullable=False)
+    rows_deleted: Mapped[int] = mapped_column(__name_pos=BigInteger, default=0, server_default="0", nullable=False)
+    last_error: Mapped[Optional[str]] = mapped_column(__name_pos=Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(__name_pos=DateTime(timezone=True), default=func.now(), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(__name_pos=DateTime(timezone=True), default=func.now(), onupdate=func.now(), nullable=False)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(__name_pos=DateTime(timezone=True), nullable=True)
+
+# The purge worker picks the oldest unfinished job
+Index("ix_purge_jobs_unfinished", PurgeJob.created_at, postgresql_where=PurgeJob.status != "done")
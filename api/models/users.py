@@ -4,16 +4,17 @@ from typing import Optional, TYPE_CHECKING
 from datetime import datetime
 import uuid
 
-from sqlalchemy import Text, DateTime, func, ForeignKey
+from sqlalchemy import DDL, Text, DateTime, event, func, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from ..database import Base
+from ..ids import uuid7
 
 class UserProfile(Base):
     __tablename__ = 'user_profiles'
 
-    id: Mapped[uuid.UUID] = mapped_column(__name_pos=UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(__name_pos=UUID(as_uuid=True), primary_key=True, default=uuid7)
     user_id: Mapped[uuid.UUID] = mapped_column(__name_pos=UUID(as_uuid=True), __type_pos=ForeignKey(column="users.id", ondelete="CASCADE"), nullable=False, unique=True)
     first_name: Mapped[Optional[str]] = mapped_column(__name_pos=Text)
     last_name: Mapped[Optional[str]] = mapped_column(__name_pos=Text)
@@ -29,5 +30,18 @@ class UserProfile(Base):
     # relationship back to user
     user: Mapped["User"] = relationship(argument="User", back_populates="profile")
 
+# Lowercased "first last"; the user directory matches names against this
+# exact expression so the trigram index below applies
+profile_search_name = func.lower(func.coalesce(UserProfile.first_name, "") + " " + func.coalesce(UserProfile.last_name, ""))
+Index(
+    "ix_user_profiles_search_name_trgm",
+    profile_search_name.label("search_name"),
+    postgresql_using="gin",
+    postgresql_ops={"search_name": "gin_trgm_ops"},
+)
+
+# Trigram indexes need pg_trgm; create it before the tables on fresh databases
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
+
 if TYPE_CHECKING:
     from .auth import User  # noqa: F401
@@ -0,0 +1,99 @@
+"""Load shedding for low-priority requests.
+
+When Postgres slows down, requests pile up waiting for a pooled connection
+and for a worker thread, and every request gets slower until clients time
+out and retry on top of it. :class:`OverloadController` watches three
+signals of that queueing: the recent wait for a pooled connection, the
+number of requests waiting for a threadpool thread and how far the event
+loop lags behind. While any of them is over its limit, routes marked with
+the :pyfunc:`low_priority` dependency (list, history and search reads, which
+clients can retry) are refused with 503 and ``Retry-After`` before they
+queue for anything. Sends, auth and other writes are always admitted, so the
+work users notice keeps getting through.
+"""
+from typing import Optional
+import asyncio
+import logging
+import time
+
+import anyio.to_thread
+from fastapi import HTTPException, status
+
+from .config import OVERLOAD_LOOP_LAG_SECONDS, OVERLOAD_POOL_WAIT_SECONDS, OVERLOAD_RETRY_AFTER_SECONDS, OVERLOAD_THREADPOOL_QUEUE
+from .database import DecayingAverage, pool_metrics
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_INTERVAL_SECONDS = 0.1
+
+class OverloadController:
+    """Decides whether low-priority work is admitted; call it from the event loop."""
+    def __init__(
+        self,
+        pool_wait_limit: float = OVERLOAD_POOL_WAIT_SECONDS,
+        threadpool_queue_limit: int = OVERLOAD_THREADPOOL_QUEUE,
+        loop_lag_limit: float = OVERLOAD_LOOP_LAG_SECONDS,
+    ) -> None:
+        self.pool_wait_limit = pool_wait_limit
+        self.threadpool_queue_limit = threadpool_queue_limit
+        self.loop_lag_limit = loop_lag_limit
+        self.loop_lag = DecayingAverage(half_life=2.0)
+        self.shed = 0
+
+    def signals(self) -> dict[str, float]:
+        threadpool = anyio.to_thread.current_default_thread_limiter().statistics()
+        return {
+            "pool_wait_seconds": pool_metrics.recent_wait.value(),
+            "threadpool_queue": threadpool.tasks_waiting,
+            "threadpool_busy": threadpool.borrowed_tokens,
+            "loop_lag_seconds": self.loop_lag.value(),
+        }
+
+    def overload_reason(self) -> Optional[str]:
+        """Return which limit is exceeded, or ``None`` when low-priority work may run."""
+        signals = self.signals()
+        if signals["pool_wait_seconds"] > self.pool_wait_limit:
+            return "pool_wait"
+        if signals["threadpool_queue"] > self.threadpool_queue_limit:
+            return "threadpool_queue"
+        if signals["loop_lag_seconds"] > self.loop_lag_limit:
+            return "loop_lag"
+        return None
+
+overload_controller = OverloadController()
+
+async def low_priority() -> None:
+    """Route dependency refusing the request with 503 while the server is overloaded.
+
+    ``async`` so the check runs on the event loop instead of waiting for a
+    threadpool thread itself. Declare it in the route's ``dependencies``.
+    """
+    reason = overload_controller.overload_reason()
+    if reason is None:
+        return
+    overload_controller.shed += 1
+    logger.info("Shedding a low-priority request (%s)", reason)
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is overloaded, retry later",
+        headers={"Retry-After": str(OVERLOAD_RETRY_AFTER_SECONDS)}
+    )
+
+def get_overload_status() -> dict[str, object]:
+    """Return the current overload signals, their limits and how many requests were shed."""
+    controller = overload_controller
+    return {
+        **controller.signals(),
+        "pool_wait_limit": controller.pool_wait_limit,
+        "threadpool_queue_limit": controller.threadpool_queue_limit,
+        "loop_lag_limit": controller.loop_lag_limit,
+        "overloaded": controller.overload_reason() is not None,
+        "shed": controller.shed,
+    }
+
+async def run_loop_lag_monitor(interval: float = LOOP_LAG_INTERVAL_SECONDS) -> None:
+    """Background loop measuring how late the event loop wakes up from a sleep."""
+    while True:
+        started = time.monotonic()
+        await asyncio.sleep(interval)
+        overload_controller.loop_lag.observe(sample=max(0.0, time.monotonic() - started - interval))
@@ -1,3 +1,3 @@
 # routes package
 
-from . import auth, users, messages, conversations # # type: ignore[reportUnusedImport]
\ No newline at end of file
+from . import auth, bootstrap, users, messages, conversations, metrics, sync # # type: ignore[reportUnusedImport]
\ No newline at end of file
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from uuid import UUID
+from sqlalchemy.orm.session import Session
 import asyncio
 
+from ..database import get_db
 from ..schema.http.auth import LoginRequest, LoginResponse, RegisterRequest, RegisterResponse, ValidateResponse, RefreshRequest, RefreshResponse
 from ..services.auth_service import authenticate_user, register_user, validate_access_token, refresh_token, get_http_user_id, revoke_refresh_token, cleanup_tokens, get_access_token_http
 
@@ -11,8 +13,8 @@ router = APIRouter(
 )
 
 @router.post(path="/login")
-async def login(data: LoginRequest) -> LoginResponse:
-    tokens = authenticate_user(email=data.email, password=data.password)
+async def login(data: LoginRequest, db: Session = Depends(dependency=get_db)) -> LoginResponse:
+    tokens = authenticate_user(email=data.email, password=data.password, db=db)
 
     return LoginResponse(
         refresh_token=tokens["refresh_token"],
@@ -20,8 +22,8 @@ async def login(data: LoginRequest) -> LoginResponse:
     )
 
 @router.post(path="/register")
-async def register(data: RegisterRequest) -> RegisterResponse:
-    tokens = register_user(email=data.email, password=data.password)
+async def register(data: RegisterRequest, db: Session = Depends(dependency=get_db)) -> RegisterResponse:
+    tokens = register_user(email=data.email, password=data.password, db=db)
 
     return RegisterResponse(
         refresh_token=tokens["refresh_token"],
@@ -43,8 +45,8 @@ async def validate(access_token: str = Depends(get_access_token_http)) -> Valida
     )
 
 @router.post(path="/refresh")
-async def refresh(data: RefreshRequest) -> RefreshResponse:
-    tokens = refresh_token(old_refresh_token=data.refresh_token)
+async def refresh(data: RefreshRequest, db: Session = Depends(dependency=get_db)) -> RefreshResponse:
+    tokens = refresh_token(old_refresh_token=data.refresh_token, db=db)
 
     return RefreshResponse(
         refresh_token=tokens["refresh_token"],
@@ -52,9 +54,9 @@ async def refresh(data: RefreshRequest) -> RefreshResponse:
     )
 
 @router.get(path="/logout", status_code=status.HTTP_204_NO_CONTENT)
-async def logout(user_id: UUID = Depends(dependency=get_http_user_id)) -> None:
+async def logout(user_id: UUID = Depends(dependency=get_http_user_id), db: Session = Depends(dependency=get_db)) -> None:
     # Revoke any active refresh tokens for this user
-    revoke_refresh_token(user_id=user_id)
+    revoke_refresh_token(user_id=user_id, db=db)
 
     asyncio.create_task(coro=cleanup_tokens())  # Run cleanup before the request
     return None
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, Response
+from pydantic_core import to_json
+from uuid import UUID
+from sqlalchemy.orm.session import Session
+
+from ..deadlines import read_budget
+from ..overload import low_priority
+from ..database import get_read_db
+from ..services.auth_service import get_http_user_id
+from ..services.bootstrap_service import get_bootstrap_service
+from ..schema.http.bootstrap import BootstrapRequest, BootstrapResponse
+
+router = APIRouter(
+    prefix="/bootstrap",
+    tags=["bootstrap"]
+)
+
+@router.get(path="/", response_model=BootstrapResponse, dependencies=[Depends(dependency=low_priority), Depends(dependency=read_budget)])
+def bootstrap(
+    data: BootstrapRequest = Depends(),
+    user_id: UUID = Depends(dependency=get_http_user_id),
+    db: Session = Depends(dependency=get_read_db)
+) -> Response:
+    """Return everything a client shows on startup: profile, conversations and their newest messages.
+
+    The payload holds up to thousands of messages, so it is encoded once by
+    pydantic-core instead of being validated against ``BootstrapResponse``,
+    which only documents it.
+    """
+    state = get_bootstrap_service(
+        user_id=user_id,
+        conversations=data.conversations,
+        messages=data.messages,
+        db=db
+    )
+    return Response(content=to_json(state), media_type="application/json")
@@ -1,16 +1,24 @@
-from fastapi import APIRouter, status, Depends, HTTPException
+from fastapi import APIRouter, Response, status, Depends, HTTPException
 from typing import List
 from uuid import UUID
+from sqlalchemy.orm.session import Session
 
 from api.models.conversations import Conversation
 from api.schema.internal.conversations import conversationObject
 
+from ..deadlines import read_budget
+from ..overload import low_priority
+from ..database import get_db, get_read_db
 from ..services.auth_service import get_http_user_id
-from ..services.conversations_service import get_all_conversations_service, get_single_conversation_service, create_conversation_service, edit_conversation_service, delete_conversation_service
-from ..schema.http.conversations import GetConversationsRequest, GetConversationsResponse, CreateConversationRequest, CreateConversationResponse, EditConversationRequest, EditConversationResponse, DeleteConversationRequest
+from ..services.cursor_service import set_cursor_headers
+from ..services.conversations_service import get_all_conversations_service, get_conversations_page_service, get_single_conversation_service, create_conversation_service, edit_conversation_service, delete_conversation_service, add_participants_service, remove_participants_service, set_participant_roles_service, get_participants_page_service
+from ..services.read_receipts_service import queue_read_receipt, get_unread_counts_service
+from ..schema.http.conversations import GetConversationsRequest, GetConversationsResponse, CreateConversationRequest, CreateConversationResponse, EditConversationRequest, EditConversationResponse, DeleteConversationRequest, MarkReadRequest, UnreadCountResponse, GetParticipantsRequest, ParticipantResponse, AddParticipantsRequest, RemoveParticipantsRequest, SetParticipantRolesRequest, ParticipantsChangeResponse
+from ..schema.http.purge import PurgeJobResponse
+from ..schema.internal.conversations import UnreadCountObject, ParticipantObject
 
 from ..schema.http.messages import GetMessagesRequest, GetMessagesResponse
-from ..services.messages_service import get_all_messages_service, get_single_message_service
+from ..services.messages_service import get_all_messages_service, get_messages_by_seq_service, get_message_window_service, get_messages_page_service, get_single_message_service
 from ..models.messages import Message
 
 router = APIRouter(
@@ -18,32 +26,66 @@ router = APIRouter(
     tags=["conversations"]
 )
 
-@router.get(path="/", response_model=List[GetConversationsResponse])
+@router.get(path="/", response_model=List[GetConversationsResponse], dependencies=[Depends(dependency=low_priority), Depends(dependency=read_budget)])
 def get_conversations(
+    response: Response,
     data: GetConversationsRequest = Depends(),
-    user_id: UUID = Depends(dependency=get_http_user_id)
+    user_id: UUID = Depends(dependency=get_http_user_id),
+    db: Session = Depends(dependency=get_read_db)
 ) -> List[conversationObject]:
     if data.conversation_id:
         return get_single_conversation_service(
             user_id=user_id,
-            conversation_id=data.conversation_id
+            conversation_id=data.conversation_id,
+            db=db
         )
-    return get_all_conversations_service(
+    if data.offset:
+        # Offset paging is kept for older clients; cursors scale better
+        return get_all_conversations_service(
+            user_id=user_id,
+            limit=data.limit,
+            offset=data.offset,
+            db=db
+        )
+    page = get_conversations_page_service(
         user_id=user_id,
         limit=data.limit,
-        offset=data.offset,
+        cursor=data.cursor,
+        db=db
     )
+    set_cursor_headers(response=response, next_cursor=page["next_cursor"], prev_cursor=None)
+    return page["conversations"]
+
+@router.get(path="/unread", response_model=List[UnreadCountResponse], dependencies=[Depends(dependency=low_priority), Depends(dependency=read_budget)])
+def get_unread_counts(
+    user_id: UUID = Depends(dependency=get_http_user_id),
+    db: Session = Depends(dependency=get_read_db)
+) -> List[UnreadCountObject]:
+    return get_unread_counts_service(user_id=user_id, db=db)
+
+@router.post(path="/{conversation_id}/read", status_code=status.HTTP_202_ACCEPTED)
+def mark_read(
+    conversation_id: UUID,
+    data: MarkReadRequest,
+    user_id: UUID = Depends(dependency=get_http_user_id)
+) -> None:
+    # Receipts are coalesced and written by the background flusher; the
+    # batched UPDATE ignores positions from users who aren't participants.
+    queue_read_receipt(conversation_id=conversation_id, user_id=user_id, message_id=data.message_id)
+    return
 
 @router.post(path="/create")
 def create_conversation(
     data: CreateConversationRequest,
-    user_id: UUID = Depends(dependency=get_http_user_id)
+    user_id: UUID = Depends(dependency=get_http_user_id),
+    db: Session = Depends(dependency=get_db)
 ) -> CreateConversationResponse:
     new_conversation =  create_conversation_service(
         name=data.name,
         conversation_type=data.conversation_type,
         created_by=user_id,
-        participant_ids=data.participant_ids
+        participant_ids=data.participant_ids,
+        db=db
     )
 
     return CreateConversationResponse(
@@ -57,43 +99,152 @@ def create_conversation(
 @router.patch(path="/edit", response_model=EditConversationResponse)
 def edit_conversation(
     data: EditConversationRequest,
-    user_id: UUID = Depends(dependency=get_http_user_id)
+    user_id: UUID = Depends(dependency=get_http_user_id),
+    db: Session = Depends(dependency=get_db)
 ) -> Conversation:
     return edit_conversation_service(
         conversation_id=data.conversation_id,
         user_id=user_id,
-        new_name=data.new_name
+        new_name=data.new_name,
+        db=db
     )
 
-@router.delete(path="/delete", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(path="/delete", status_code=status.HTTP_202_ACCEPTED)
 def delete_message(
     data: DeleteConversationRequest,
-    user_id: UUID = Depends(dependency=get_http_user_id)
-) -> None:
-    delete_conversation_service(
+    user_id: UUID = Depends(dependency=get_http_user_id),
+    db: Session = Depends(dependency=get_db)
+) -> PurgeJobResponse:
+    """Delete a conversation; its history is purged in the background.
+
+    Progress can be followed at ``GET /metrics/purge-jobs/{id}``.
+    """
+    job = delete_conversation_service(
         conversation_id=data.conversation_id,
-        user_id=user_id
+        user_id=user_id,
+        db=db
         )
-    return
+    return PurgeJobResponse(**job)
+
+@router.get(path="/{conversation_id}/participants", response_model=List[ParticipantResponse], dependencies=[Depends(dependency=low_priority), Depends(dependency=read_budget)])
+def get_participants(
+    conversation_id: UUID,
+    response: Response,
+    data: GetParticipantsRequest = Depends(),
+    user_id: UUID = Depends(dependency=get_http_user_id),
+    db: Session = Depends(dependency=get_read_db)
+) -> List[ParticipantObject]:
+    page = get_participants_page_service(
+        conversation_id=conversation_id,
+        user_id=user_id,
+        limit=data.limit,
+        cursor=data.cursor,
+        db=db
+    )
+    set_cursor_headers(response=response, next_cursor=page["next_cursor"], prev_cursor=None)
+    return page["participants"]
 
-@router.get("/{conversation_id}/messages", response_model=List[GetMessagesResponse])
+@router.post(path="/{conversation_id}/participants")
+def add_participants(
+    conversation_id: UUID,
+    data: AddParticipantsRequest,
+    user_id: UUID = Depends(dependency=get_http_user_id),
+    db: Session = Depends(dependency=get_db)
+) -> ParticipantsChangeResponse:
+    result = add_participants_service(
+        conversation_id=conversation_id,
+        user_id=user_id,
+        participant_ids=data.user_ids,
+        role=data.role,
+        db=db
+    )
+    return ParticipantsChangeResponse(**result)
+
+@router.delete(path="/{conversation_id}/participants")
+def remove_participants(
+    conversation_id: UUID,
+    data: RemoveParticipantsRequest,
+    user_id: UUID = Depends(dependency=get_http_user_id),
+    db: Session = Depends(dependency=get_db)
+) -> ParticipantsChangeResponse:
+    result = remove_participants_service(
+        conversation_id=conversation_id,
+        user_id=user_id,
+        participant_ids=data.user_ids,
+        db=db
+    )
+    return ParticipantsChangeResponse(**result)
+
+@router.patch(path="/{conversation_id}/participants")
+def set_participant_roles(
+    conversation_id: UUID,
+    data: SetParticipantRolesRequest,
+    user_id: UUID = Depends(dependency=get_http_user_id),
+    db: Session = Depends(dependency=get_db)
+) -> ParticipantsChangeResponse:
+    result = set_participant_roles_service(
+        conversation_id=conversation_id,
+        user_id=user_id,
+        participant_ids=data.user_ids,
+        role=data.role,
+        db=db
+    )
+    return ParticipantsChangeResponse(**result)
+
+@router.get("/{conversation_id}/messages", response_model=List[GetMessagesResponse], dependencies=[Depends(dependency=low_priority), Depends(dependency=read_budget)])
 def get_messages(
+    response: Response,
     data: GetMessagesRequest = Depends(),
-    user_id: UUID = Depends(dependency=get_http_user_id)
+    user_id: UUID = Depends(dependency=get_http_user_id),
+    db: Session = Depends(dependency=get_read_db)
 ) -> List[Message]:
     if data.message_id:
         return [get_single_message_service(
             message_id=data.message_id,
-            user_id=user_id
+            user_id=user_id,
+            db=db
         )]
     if data.conversation_id:
-        return get_all_messages_service(
+        if data.from_seq is not None:
+            return get_messages_by_seq_service(
+                conversation_id=data.conversation_id,
+                user_id=user_id,
+                from_seq=data.from_seq,
+                to_seq=data.to_seq,
+                db=db
+            )
+        if data.around or data.around_at:
+            page = get_message_window_service(
+                conversation_id=data.conversation_id,
+                user_id=user_id,
+                around=data.around,
+                around_at=data.around_at,
+                limit=data.limit,
+                db=db
+            )
+            set_cursor_headers(response=response, next_cursor=page["next_cursor"], prev_cursor=page["prev_cursor"])
+            return page["messages"]
+        if data.offset:
+            # Offset paging is kept for older clients; cursors scale better
+            return get_all_messages_service(
+                conversation_id=data.conversation_id,
+                user_id=user_id,
+                limit=data.limit,
+                offset=data.offset,
+                before=data.before,
+                db=db
+            )
+        page = get_messages_page_service(
             conversation_id=data.conversation_id,
             user_id=user_id,
             limit=data.limit,
-            offset=data.offset,
-            before=data.before
+            cursor=data.cursor,
+            before=data.before,
+            after=data.after,
+            db=db
         )
+        set_cursor_headers(response=response, next_cursor=page["next_cursor"], prev_cursor=page["prev_cursor"])
+        return page["messages"]
     raise HTTPException(
         status_code=400,
         detail="Must provide conversation_id or message_id")
@@ -1,46 +1,112 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, Response, status, Depends
 from typing import List
 from uuid import UUID
+from sqlalchemy.orm.session import Session
 
+from ..deadlines import read_budget
+from ..overload import low_priority
+from ..database import get_db, get_read_db
 from ..models.messages import Message
 
 from ..services.auth_service import get_http_user_id
-from ..services.messages_service import get_all_messages_service, send_message_service, get_single_message_service, edit_message_service, delete_message_service
-from ..schema.http.messages import GetMessagesRequest, GetMessagesResponse, SendMessageRequest, SendMessageResponse, EditMessageRequest, EditMessageResponse, DeleteMessageRequest
+from ..services.cursor_service import set_cursor_headers
+from ..services.search_service import search_messages_service
+from ..services.messages_service import get_all_messages_service, get_messages_by_seq_service, get_message_window_service, get_messages_page_service, send_message_service, get_single_message_service, edit_message_service, delete_message_service, send_messages_bulk_service
+from ..schema.http.messages import GetMessagesRequest, GetMessagesResponse, SendMessageRequest, SendMessageResponse, EditMessageRequest, EditMessageResponse, DeleteMessageRequest, SearchMessagesRequest, SearchMessagesResponse, BulkSendMessagesRequest, BulkSendMessagesResponse, BulkMessageResultResponse
+from ..schema.internal.messages import SearchResultObject, BulkMessageItem
 
 router = APIRouter(
     prefix="/messages",
     tags=["messages"]
 )
 
-@router.get(path="/", response_model=List[GetMessagesResponse])
+@router.get(path="/", response_model=List[GetMessagesResponse], dependencies=[Depends(dependency=low_priority), Depends(dependency=read_budget)])
 def get_messages(
+    response: Response,
     data: GetMessagesRequest = Depends(),
-    user_id: UUID = Depends(dependency=get_http_user_id)
+    user_id: UUID = Depends(dependency=get_http_user_id),
+    db: Session = Depends(dependency=get_read_db)
 ) -> List[Message]:
     if data.message_id:
         return [get_single_message_service(
             message_id=data.message_id,
-            user_id=user_id
+            user_id=user_id,
+            db=db
         )]
     if data.conversation_id:
-        return get_all_messages_service(
+        if data.from_seq is not None:
+            return get_messages_by_seq_service(
+                conversation_id=data.conversation_id,
+                user_id=user_id,
+                from_seq=data.from_seq,
+                to_seq=data.to_seq,
+                db=db
+            )
+        if data.around or data.around_at:
+            page = get_message_window_service(
+                conversation_id=data.conversation_id,
+                user_id=user_id,
+                around=data.around,
+                around_at=data.around_at,
+                limit=data.limit,
+                db=db
+            )
+            set_cursor_headers(response=response, next_cursor=page["next_cursor"], prev_cursor=page["prev_cursor"])
+            return page["messages"]
+        if data.offset:
+            # Offset paging is kept for older clients; cursors scale better
+            return get_all_messages_service(
+                conversation_id=data.conversation_id,
+                user_id=user_id,
+                limit=data.limit,
+                offset=data.offset,
+                before=data.before,
+                db=db
+            )
+        page = get_messages_page_service(
             conversation_id=data.conversation_id,
             user_id=user_id,
             limit=data.limit,
-            offset=data.offset,
-            before=data.before
+            cursor=data.cursor,
+            before=data.before,
+            after=data.after,
+            db=db
         )
+        set_cursor_headers(response=response, next_cursor=page["next_cursor"], prev_cursor=page["prev_cursor"])
+        return page["messages"]
     raise HTTPException(
         status_code=400,
         detail="Must provide conversation_id or message_id")
 
+@router.get(path="/search", response_model=List[SearchMessagesResponse], dependencies=[Depends(dependency=low_priority), Depends(dependency=read_budget)])
+def search_messages(
+    response: Response,
+    data: SearchMessagesRequest = Depends(),
+    user_id: UUID = Depends(dependency=get_http_user_id),
+    db: Session = Depends(dependency=get_read_db)
+) -> List[SearchResultObject]:
+    page = search_messages_service(
+        user_id=user_id,
+        query=data.q,
+        conversation_id=data.conversation_id,
+        limit=data.limit,
+        cursor=data.cursor,
+        db=db
+    )
+    set_cursor_headers(response=response, next_cursor=page["next_cursor"], prev_cursor=None)
+    return page["results"]
+
 @router.post(path="/send")
-def send_message(data: SendMessageRequest, user_id: UUID = Depends(dependency=get_http_user_id)) -> SendMessageResponse:
+def send_message(
+    data: SendMessageRequest,
+    user_id: UUID = Depends(dependency=get_http_user_id),
+    db: Session = Depends(dependency=get_db)
+) -> SendMessageResponse:
     new_message: Message = send_message_service(
         sender_id=user_id,
         conversation_id=data.conversation_id,
-        content=data.content
+        content=data.content,
+        db=db
     )
     if not new_message:
         raise HTTPException(
@@ -53,20 +119,45 @@ def send_message(data: SendMessageRequest, user_id: UUID = Depends(dependency=ge
         conversation_id=new_message.conversation_id,
         sender_id=new_message.sender_id,
         content=new_message.content,
-        created_at=new_message.created_at
+        created_at=new_message.created_at,
+        seq=new_message.seq
+    )
+
+@router.post(path="/bulk")
+def send_messages_bulk(
+    data: BulkSendMessagesRequest,
+    user_id: UUID = Depends(dependency=get_http_user_id),
+    db: Session = Depends(dependency=get_db)
+) -> BulkSendMessagesResponse:
+    results = send_messages_bulk_service(
+        sender_id=user_id,
+        messages=[BulkMessageItem(conversation_id=m.conversation_id, content=m.content) for m in data.messages],
+        db=db
+    )
+    created = sum(1 for r in results if r["status"] == "created")
+    return BulkSendMessagesResponse(
+        created=created,
+        rejected=len(results) - created,
+        results=[BulkMessageResultResponse(**r) for r in results]
     )
 
 @router.patch(path="/edit", response_model=EditMessageResponse)
-def edit_message(data: EditMessageRequest, user_id: UUID = Depends(dependency=get_http_user_id)) -> Message:
+def edit_message(
+    data: EditMessageRequest,
+    user_id: UUID = Depends(dependency=get_http_user_id),
+    db: Session = Depends(dependency=get_db)
+) -> Message:
     return edit_message_service(
         message_id=data.message_id,
-        new_content=data.new_content
+        new_content=data.new_content,
+        db=db
     )
 
 @router.delete(path="/delete", status_code=status.HTTP_204_NO_CONTENT)
 def delete_message(
     data: DeleteMessageRequest,
-    user_id: UUID = Depends(dependency=get_http_user_id)
+    user_id: UUID = Depends(dependency=get_http_user_id),
+    db: Session = Depends(dependency=get_db)
 ) -> None:
-    delete_message_service(message_id=data.message_id, user_id=user_id)
+    delete_message_service(message_id=data.message_id, user_id=user_id, db=db)
     return
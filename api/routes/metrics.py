@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm.session import Session
+from uuid import UUID
+
+from ..database import get_db, get_pool_status
+from ..overload import get_overload_status
+from ..services.auth_service import get_http_user_id
+from ..services.purge_service import get_purge_job
+from ..schema.http.metrics import OverloadStatusResponse, PoolStatusResponse
+from ..schema.http.purge import PurgeJobResponse
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"]
+)
+
+@router.get(path="/pool")
+def pool_status(user_id: UUID = Depends(dependency=get_http_user_id)) -> PoolStatusResponse:
+    return PoolStatusResponse(**get_pool_status())
+
+@router.get(path="/overload")
+async def overload_status(user_id: UUID = Depends(dependency=get_http_user_id)) -> OverloadStatusResponse:
+    # async: the threadpool statistics are read on the event loop
+    return OverloadStatusResponse(**get_overload_status())
+
+@router.get(path="/purge-jobs/{job_id}")
+def purge_job_status(
+    job_id: UUID,
+    user_id: UUID = Depends(dependency=get_http_user_id),
+    db: Session = Depends(dependency=get_db)
+) -> PurgeJobResponse:
+    return PurgeJobResponse(**get_purge_job(job_id=job_id, user_id=user_id, db=db))
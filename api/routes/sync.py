@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends
+from uuid import UUID
+from sqlalchemy.orm.session import Session
+
+from ..deadlines import read_budget
+from ..overload import low_priority
+from ..database import get_db
+from ..services.auth_service import get_http_user_id
+from ..services.sync_service import get_changes_service
+from ..schema.http.sync import SyncRequest, SyncResponse
+from ..schema.internal.sync import SyncPage
+
+router = APIRouter(
+    prefix="/sync",
+    tags=["sync"]
+)
+
+# Reads the primary: a cursor is a snapshot, and a replica that has
+# replayed less than the one that issued it would skip changes
+@router.get(path="/", response_model=SyncResponse, dependencies=[Depends(dependency=low_priority), Depends(dependency=read_budget)])
+def sync(
+    data: SyncRequest = Depends(),
+    user_id: UUID = Depends(dependency=get_http_user_id),
+    db: Session = Depends(dependency=get_db)
+) -> SyncPage:
+    return get_changes_service(
+        user_id=user_id,
+        since=data.since,
+        limit=data.limit,
+        db=db
+    )
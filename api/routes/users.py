@@ -1,22 +1,126 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status, Depends
+from fastapi.responses import StreamingResponse
+from typing import Iterator, List
 from uuid import UUID
+from sqlalchemy.orm.session import Session
+import json
 
+from ..config import ADMIN_USER_IDS
+from ..deadlines import read_budget
+from ..overload import low_priority
+from ..database import get_db, get_read_db, open_read_session
 from ..services.auth_service import get_http_user_id
-from ..services.users_service import get_user_profile
-from ..schema.http.users import UserProfileResponse
+from ..services.cursor_service import set_cursor_headers
+from ..services.users_service import MAX_PROFILE_BATCH, delete_account_service, etag_matches, get_user_profile, get_user_profiles, iter_user_directory, profiles_etag, search_users_service, update_user_profile_service
+from ..schema.http.purge import PurgeJobResponse
+from ..schema.http.users import DirectoryEntryResponse, PublicUserProfileResponse, SearchUsersRequest, UpdateUserProfileRequest, UserProfileResponse
+from ..schema.internal.user_service import DirectoryEntryObject, UserProfileUpdate
 
 router = APIRouter(
     prefix="/users",
     tags=["users"]
 )
 
+def _not_modified(request: Request, etag: str) -> bool:
+    return etag_matches(if_none_match=request.headers.get("if-none-match"), etag=etag)
+
 @router.get(path="/me")
-async def me(user_id: UUID = Depends(dependency=get_http_user_id)) -> UserProfileResponse:
-    user_profile = get_user_profile(user_id=user_id)
+async def me(
+    request: Request,
+    response: Response,
+    user_id: UUID = Depends(dependency=get_http_user_id),
+    db: Session = Depends(dependency=get_read_db)
+) -> UserProfileResponse:
+    user_profile = get_user_profile(user_id=user_id, db=db)
     if not user_profile:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User profile not found"
         )
 
+    etag = profiles_etag(profiles=[user_profile])
+    if _not_modified(request=request, etag=etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})  # type: ignore[return-value]
+    response.headers["ETag"] = etag
+    return UserProfileResponse(**user_profile)
+
+@router.patch(path="/me")
+def update_me(
+    data: UpdateUserProfileRequest,
+    response: Response,
+    user_id: UUID = Depends(dependency=get_http_user_id),
+    db: Session = Depends(dependency=get_db)
+) -> UserProfileResponse:
+    user_profile = update_user_profile_service(
+        user_id=user_id,
+        changes=UserProfileUpdate(**data.model_dump(exclude_unset=True)),
+        db=db
+    )
+    response.headers["ETag"] = profiles_etag(profiles=[user_profile])
     return UserProfileResponse(**user_profile)
+
+@router.delete(path="/me", status_code=status.HTTP_202_ACCEPTED)
+def delete_me(
+    user_id: UUID = Depends(dependency=get_http_user_id),
+    db: Session = Depends(dependency=get_db)
+) -> PurgeJobResponse:
+    """Delete the account; its data is purged in the background.
+
+    Progress can be followed at ``GET /metrics/purge-jobs/{id}`` while the
+    access token is still valid.
+    """
+    job = delete_account_service(user_id=user_id, db=db)
+    return PurgeJobResponse(**job)
+
+@router.get(path="/profiles", response_model=List[PublicUserProfileResponse], dependencies=[Depends(dependency=low_priority), Depends(dependency=read_budget)])
+def get_profiles(
+    request: Request,
+    response: Response,
+    ids: List[UUID] = Query(default=..., min_length=1, max_length=MAX_PROFILE_BATCH),
+    user_id: UUID = Depends(dependency=get_http_user_id),
+    db: Session = Depends(dependency=get_read_db)
+) -> object:
+    """Resolve the public profiles of up to ``MAX_PROFILE_BATCH`` users in one call.
+
+    Meant for rendering senders: pass every ``sender_id`` of a message page
+    as repeated ``ids`` parameters. Unknown users are left out.
+    """
+    profiles = [
+        PublicUserProfileResponse(**profile).model_dump(mode="json")
+        for profile in get_user_profiles(user_ids=ids, db=db).values()
+    ]
+    etag = profiles_etag(profiles=profiles)
+    if _not_modified(request=request, etag=etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return profiles
+
+@router.get(path="/directory", response_model=List[DirectoryEntryResponse], dependencies=[Depends(dependency=low_priority), Depends(dependency=read_budget)])
+def search_users(
+    response: Response,
+    data: SearchUsersRequest = Depends(),
+    user_id: UUID = Depends(dependency=get_http_user_id),
+    db: Session = Depends(dependency=get_read_db)
+) -> List[DirectoryEntryObject]:
+    page = search_users_service(query=data.q, limit=data.limit, cursor=data.cursor, db=db)
+    set_cursor_headers(response=response, next_cursor=page["next_cursor"], prev_cursor=None)
+    return page["users"]
+
+def _export_lines() -> Iterator[str]:
+    db = open_read_session()
+    try:
+        for entry in iter_user_directory(db=db):
+            yield json.dumps(entry, default=str) + "\n"
+    finally:
+        db.close()
+
+@router.get(path="/directory/export")
+def export_users(user_id: UUID = Depends(dependency=get_http_user_id)) -> StreamingResponse:
+    """Stream the whole directory as newline delimited JSON (administrators only)."""
+    if str(user_id) not in ADMIN_USER_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can export the user directory."
+        )
+    # The rows are read while the response is sent, with their own session
+    return StreamingResponse(content=_export_lines(), media_type="application/x-ndjson")
@@ -1,3 +1,3 @@
 # schema.http package
 
-from . import auth, conversations, messages, users # type: ignore[reportUnusedImport]
\ No newline at end of file
+from . import auth, bootstrap, conversations, messages, metrics, purge, sync, users # type: ignore[reportUnusedImport]
\ No newline at end of file
@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from typing import Optional, List
+
+from .conversations import GetConversationsResponse
+from .messages import GetMessagesResponse
+from .users import UserProfileResponse
+
+class BootstrapRequest(BaseModel):
+    conversations: Optional[int] = 50
+    messages: Optional[int] = 20
+
+class BootstrapConversationResponse(BaseModel):
+    conversation: GetConversationsResponse
+    messages: List[GetMessagesResponse]
+    next_cursor: Optional[str] = None
+
+class BootstrapResponse(BaseModel):
+    profile: UserProfileResponse
+    conversations: List[BootstrapConversationResponse]
+    next_cursor: Optional[str] = None
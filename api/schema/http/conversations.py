@@ -7,6 +7,7 @@ class GetConversationsRequest(BaseModel):
     conversation_id: Optional[UUID] = None
     limit: Optional[int] = 50
     offset: Optional[int] = 0
+    cursor: Optional[str] = None
 
 class GetConversationsResponse(BaseModel):
     id: UUID
@@ -14,6 +15,12 @@ class GetConversationsResponse(BaseModel):
     created_by: UUID
     created_at: datetime
     participant_count: int
+    last_message_at: datetime
+    last_message_id: Optional[UUID] = None
+    last_message_preview: Optional[str] = None
+    last_message_sender_id: Optional[UUID] = None
+    last_seq: int = 0
+    unread_count: int = 0
 
 class CreateConversationRequest(BaseModel):
     name: str
@@ -40,3 +47,36 @@ class EditConversationResponse(BaseModel):
 
 class DeleteConversationRequest(BaseModel):
     conversation_id: UUID
+
+class MarkReadRequest(BaseModel):
+    message_id: UUID
+
+class UnreadCountResponse(BaseModel):
+    conversation_id: UUID
+    unread_count: int
+    last_read_message_id: Optional[UUID] = None
+
+class GetParticipantsRequest(BaseModel):
+    limit: Optional[int] = 100
+    cursor: Optional[str] = None
+
+class ParticipantResponse(BaseModel):
+    user_id: UUID
+    role: str
+    joined_at: datetime
+
+class AddParticipantsRequest(BaseModel):
+    user_ids: List[UUID]
+    role: Literal['member', 'admin'] = 'member'
+
+class RemoveParticipantsRequest(BaseModel):
+    user_ids: List[UUID]
+
+class SetParticipantRolesRequest(BaseModel):
+    user_ids: List[UUID]
+    role: Literal['member', 'admin']
+
+class ParticipantsChangeResponse(BaseModel):
+    conversation_id: UUID
+    user_ids: List[UUID]
+    participant_count: int
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 from uuid import UUID
 from datetime import datetime
 
@@ -9,6 +9,15 @@ class GetMessagesRequest(BaseModel):
     limit: Optional[int] = 50
     offset: Optional[int] = 0
     before: Optional[datetime] = None
+    # page of the messages directly following this message id
+    after: Optional[UUID] = None
+    cursor: Optional[str] = None
+    # window of limit messages on each side of a message id or a point in time
+    around: Optional[UUID] = None
+    around_at: Optional[datetime] = None
+    # messages numbered from_seq to to_seq (inclusive), in seq order
+    from_seq: Optional[int] = Field(default=None, ge=1)
+    to_seq: Optional[int] = Field(default=None, ge=1)
 
 class GetMessagesResponse(BaseModel):
     id: UUID
@@ -16,6 +25,22 @@ class GetMessagesResponse(BaseModel):
     sender_id: UUID
     content: str
     created_at: datetime
+    seq: Optional[int] = None
+
+class SearchMessagesRequest(BaseModel):
+    q: str
+    conversation_id: Optional[UUID] = None
+    limit: Optional[int] = 20
+    cursor: Optional[str] = None
+
+class SearchMessagesResponse(BaseModel):
+    id: UUID
+    conversation_id: UUID
+    sender_id: UUID
+    content: str
+    created_at: datetime
+    rank: float
+    snippet: str
 
 class SendMessageRequest(BaseModel):
     conversation_id: UUID
@@ -27,6 +52,24 @@ class SendMessageResponse(BaseModel):
     sender_id: UUID
     content: str
     created_at: datetime
+    seq: Optional[int] = None
+
+class BulkSendMessagesRequest(BaseModel):
+    messages: List[SendMessageRequest] = Field(min_length=1, max_length=5000)
+
+class BulkMessageResultResponse(BaseModel):
+    index: int
+    conversation_id: UUID
+    status: Literal["created", "rejected"]
+    id: Optional[UUID] = None
+    created_at: Optional[datetime] = None
+    seq: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkSendMessagesResponse(BaseModel):
+    created: int
+    rejected: int
+    results: List[BulkMessageResultResponse]
 
 class EditMessageRequest(BaseModel):
     message_id: UUID
@@ -38,6 +81,7 @@ class EditMessageResponse(BaseModel):
     sender_id: UUID
     content: str
     created_at: datetime
+    seq: Optional[int] = None
 
 class DeleteMessageRequest(BaseModel):
     message_id: UUID
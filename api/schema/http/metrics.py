@@ -0,0 +1,24 @@
+from pydantic import BaseModel
+
+class PoolStatusResponse(BaseModel):
+    pool_size: int
+    max_overflow: int
+    checked_out: int
+    checked_in: int
+    overflow: int
+    checkouts: int
+    timeouts: int
+    wait_seconds_total: float
+    wait_seconds_max: float
+    wait_seconds_avg: float
+
+class OverloadStatusResponse(BaseModel):
+    pool_wait_seconds: float
+    threadpool_queue: int
+    threadpool_busy: int
+    loop_lag_seconds: float
+    pool_wait_limit: float
+    threadpool_queue_limit: int
+    loop_lag_limit: float
+    overloaded: bool
+    shed: int
@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from datetime import datetime
+from uuid import UUID
+from typing import Optional
+
+class PurgeJobResponse(BaseModel):
+    id: UUID
+    kind: str
+    target_id: UUID
+    status: str
+    phase: str
+    rows_deleted: int
+    last_error: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime]
@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import Optional, List
+from uuid import UUID
+
+from .conversations import GetConversationsResponse
+from .messages import GetMessagesResponse
+
+class SyncRequest(BaseModel):
+    since: Optional[str] = None
+    limit: Optional[int] = 500
+
+class SyncResponse(BaseModel):
+    messages: List[GetMessagesResponse]
+    deleted_message_ids: List[UUID]
+    conversations: List[GetConversationsResponse]
+    removed_conversation_ids: List[UUID]
+    cursor: str
+    has_more: bool
@@ -26,3 +26,32 @@ class UserProfileResponse(BaseModel):
         from_attributes = True
         # TODO: fix "Type of "json_encoders" is partially unknown" type warning
         json_encoders = {UUID: lambda u: str(object=u)} # type: ignore
+
+class PublicUserProfileResponse(BaseModel):
+    """The parts of a profile any signed-in user may see, e.g. to render senders."""
+    user_id: UUID
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    avatar_url: Optional[str] = None
+
+class UpdateUserProfileRequest(BaseModel):
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    phone: Optional[str] = None
+    avatar_url: Optional[str] = None
+    bio: Optional[str] = None
+    date_of_birth: Optional[datetime] = None
+    location: Optional[str] = None
+    website: Optional[str] = None
+
+class SearchUsersRequest(BaseModel):
+    q: Optional[str] = None
+    limit: Optional[int] = 20
+    cursor: Optional[str] = None
+
+class DirectoryEntryResponse(BaseModel):
+    user_id: UUID
+    email: str
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    avatar_url: Optional[str] = None
@@ -1,3 +1,8 @@
 # schema.internal package
 
-from .conversations import conversationObject # type: ignore[reportUnusedImport]
\ No newline at end of file
+from .conversations import conversationObject, ConversationPage, UnreadCountObject, ParticipantObject, ParticipantPage, ParticipantsChangeObject # type: ignore[reportUnusedImport]
+from .messages import MessagePage, SearchPage, SearchResultObject, BulkMessageItem, BulkMessageResult # type: ignore[reportUnusedImport]
+from .partitions import PartitionObject # type: ignore[reportUnusedImport]
+from .purge import PurgeJobObject # type: ignore[reportUnusedImport]
+from .sync import SyncPage # type: ignore[reportUnusedImport]
+from .bootstrap import BootstrapObject, BootstrapConversationObject, BootstrapMessageObject # type: ignore[reportUnusedImport]
@@ -0,0 +1,24 @@
+from typing import TypedDict, Optional, List
+from datetime import datetime
+from uuid import UUID
+
+from .conversations import conversationObject
+from .user_service import UserProfileObj
+
+class BootstrapMessageObject(TypedDict):
+    id: UUID
+    conversation_id: UUID
+    sender_id: UUID
+    content: str
+    created_at: datetime
+    seq: Optional[int]
+
+class BootstrapConversationObject(TypedDict):
+    conversation: conversationObject
+    messages: List[BootstrapMessageObject]
+    next_cursor: Optional[str]
+
+class BootstrapObject(TypedDict):
+    profile: UserProfileObj
+    conversations: List[BootstrapConversationObject]
+    next_cursor: Optional[str]
@@ -1,4 +1,5 @@
-from typing import TypedDict
+from typing import TypedDict, Optional, List
+from datetime import datetime
 from uuid import UUID
 
 class conversationObject(TypedDict):
@@ -6,4 +7,33 @@ class conversationObject(TypedDict):
     name: str
     created_by: UUID
     created_at: str
-    participant_count: int
\ No newline at end of file
+    participant_count: int
+    last_message_at: str
+    last_message_id: Optional[UUID]
+    last_message_preview: Optional[str]
+    last_message_sender_id: Optional[UUID]
+    last_seq: int
+    unread_count: int
+
+class ConversationPage(TypedDict):
+    conversations: List[conversationObject]
+    next_cursor: Optional[str]
+
+class UnreadCountObject(TypedDict):
+    conversation_id: UUID
+    unread_count: int
+    last_read_message_id: Optional[UUID]
+
+class ParticipantObject(TypedDict):
+    user_id: UUID
+    role: str
+    joined_at: datetime
+
+class ParticipantPage(TypedDict):
+    participants: List[ParticipantObject]
+    next_cursor: Optional[str]
+
+class ParticipantsChangeObject(TypedDict):
+    conversation_id: UUID
+    user_ids: List[UUID]
+    participant_count: int
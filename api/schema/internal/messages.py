@@ -0,0 +1,36 @@
+from typing import TypedDict, Literal, Optional, List
+from datetime import datetime
+from uuid import UUID
+
+from ...models.messages import Message
+
+class MessagePage(TypedDict):
+    messages: List[Message]
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+
+class SearchResultObject(TypedDict):
+    id: UUID
+    conversation_id: UUID
+    sender_id: UUID
+    content: str
+    created_at: datetime
+    rank: float
+    snippet: str
+
+class SearchPage(TypedDict):
+    results: List[SearchResultObject]
+    next_cursor: Optional[str]
+
+class BulkMessageItem(TypedDict):
+    conversation_id: UUID
+    content: str
+
+class BulkMessageResult(TypedDict):
+    index: int
+    conversation_id: UUID
+    status: Literal["created", "rejected"]
+    id: Optional[UUID]
+    created_at: Optional[datetime]
+    seq: Optional[int]
+    error: Optional[str]
@@ -0,0 +1,10 @@
+from typing import TypedDict, Optional
+from datetime import datetime
+
+class PartitionObject(TypedDict):
+    name: str
+    bound: str
+    lower: Optional[datetime]
+    upper: Optional[datetime]
+    is_default: bool
+    tablespace: Optional[str]
@@ -0,0 +1,15 @@
+from typing import TypedDict, Optional
+from datetime import datetime
+from uuid import UUID
+
+class PurgeJobObject(TypedDict):
+    id: UUID
+    kind: str
+    target_id: UUID
+    status: str
+    phase: str
+    rows_deleted: int
+    last_error: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime]
@@ -0,0 +1,13 @@
+from typing import TypedDict, Optional, List
+from uuid import UUID
+
+from ...models.messages import Message
+from .conversations import conversationObject
+
+class SyncPage(TypedDict):
+    messages: List[Message]
+    deleted_message_ids: List[UUID]
+    conversations: List[conversationObject]
+    removed_conversation_ids: List[UUID]
+    cursor: str
+    has_more: bool
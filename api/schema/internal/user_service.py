@@ -16,3 +16,24 @@ class UserProfileObj(TypedDict):
     website: Optional[str]
     created_at: datetime
     updated_at: datetime
+
+class UserProfileUpdate(TypedDict, total=False):
+    first_name: Optional[str]
+    last_name: Optional[str]
+    phone: Optional[str]
+    avatar_url: Optional[str]
+    bio: Optional[str]
+    date_of_birth: Optional[datetime]
+    location: Optional[str]
+    website: Optional[str]
+
+class DirectoryEntryObject(TypedDict):
+    user_id: UUID
+    email: str
+    first_name: Optional[str]
+    last_name: Optional[str]
+    avatar_url: Optional[str]
+
+class UserDirectoryPage(TypedDict):
+    users: list[DirectoryEntryObject]
+    next_cursor: Optional[str]
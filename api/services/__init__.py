@@ -1,3 +1,3 @@
 # services package
 
-from . import auth_service, conversations_service, messages_service, participants_service, users_service # type: ignore[reportUnusedImport]
\ No newline at end of file
+from . import auth_service, bootstrap_service, change_log_service, conversations_service, messages_service, notifications_service, participants_service, partitions_service, purge_service, read_receipts_service, recent_messages_service, search_service, sync_service, users_service # type: ignore[reportUnusedImport]
\ No newline at end of file
@@ -7,7 +7,7 @@ import hashlib
 from uuid import UUID
 from typing import Optional
 
-from ..database import SessionLocal
+from ..database import SessionLocal, session_scope
 from argon2 import PasswordHasher
 from argon2.exceptions import VerificationError, InvalidHashError, VerifyMismatchError
 from ..models.auth import User, Tokens
@@ -271,7 +271,10 @@ def get_http_user_id(request: Request) -> UUID:
     Returns:
         The user UUID extracted from the request's access token.
     """
-    return get_user_from_access_token(request=request)
+    user_id = get_user_from_access_token(request=request)
+    # Read by the database dependencies to route reads after this user's writes
+    request.state.user_id = user_id
+    return user_id
 
 async def get_ws_user_id(websocket: WebSocket) -> UUID:
     """Extract the user UUID from a WebSocket's access token.
@@ -288,7 +291,7 @@ async def get_ws_user_id(websocket: WebSocket) -> UUID:
     """
     return get_user_from_access_token(websocket=websocket)
 
-def authenticate_user(email: str, password: str) -> dict[str, str]:
+def authenticate_user(email: str, password: str, db: Optional[Session] = None) -> dict[str, str]:
     """Authenticate a user and return a new access and refresh token pair.
 
     The function verifies credentials against the stored user record. On
@@ -298,6 +301,8 @@ def authenticate_user(email: str, password: str) -> dict[str, str]:
     Args:
         email: The user's email address used to locate the account.
         password: The plaintext password to verify.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
 
     Returns:
         A dict with keys ``access_token`` and ``refresh_token`` containing
@@ -306,21 +311,21 @@ def authenticate_user(email: str, password: str) -> dict[str, str]:
     Raises:
         fastapi.HTTPException: If credentials are invalid (HTTP 401).
     """
-    db = SessionLocal()
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(plain_password=password, hashed_password=user.password):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid credentials"
-        )
+    with session_scope(db) as db:
+        user = db.query(User).filter(User.email == email, User.deleted_at.is_(None)).first()
+        if not user or not verify_password(plain_password=password, hashed_password=user.password):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid credentials"
+            )
 
-    access_token = create_access_token(user_id=user.id)
+        access_token = create_access_token(user_id=user.id)
 
-    refresh_token = create_refresh_token(user_id=user.id, db=db)
+        refresh_token = create_refresh_token(user_id=user.id, db=db)
 
     return {"refresh_token": refresh_token, "access_token": access_token}
 
-def register_user(email: str, password: str, profile_data: Optional[UserProfile] = None) -> dict[str, str]:
+def register_user(email: str, password: str, profile_data: Optional[UserProfile] = None, db: Optional[Session] = None) -> dict[str, str]:
     """Create a new user account and associated profile, returning tokens.
 
     The function creates a user record with an Argon2-hashed password and a
@@ -333,6 +338,8 @@ def register_user(email: str, password: str, profile_data: Optional[UserProfile]
         password: Plaintext password which will be hashed for storage.
         profile_data: Optional ``UserProfile`` data to populate the profile
             record.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
 
     Returns:
         A dict containing ``access_token`` and ``refresh_token`` for the new
@@ -342,46 +349,44 @@ def register_user(email: str, password: str, profile_data: Optional[UserProfile]
         fastapi.HTTPException: If the email is already registered
             (HTTP 409).
     """
-    db = SessionLocal()
-    try:
-        # Hash the password before storing
-        hashed_password = hash_password(password=password)
-
-        # Create a new User instance
-        new_user = User(email=email, password=hashed_password)
-
-        # Add and commit to the database
-        db.add(instance=new_user)
-        db.flush()  # Get the generated user ID
-
-        # Create user profile
-        user_profile = UserProfile(
-            user_id=new_user.id,
-            first_name=profile_data.first_name if profile_data else None,
-            last_name=profile_data.last_name if profile_data else None,
-            phone=profile_data.phone if profile_data else None,
-            avatar_url=profile_data.avatar_url if profile_data else None,
-            bio=profile_data.bio if profile_data else None,
-            date_of_birth=profile_data.date_of_birth if profile_data else None,
-            location=profile_data.location if profile_data else None,
-            website=profile_data.website if profile_data else None
-        )
-
-        db.add(instance=user_profile)
-        db.commit()
-
-        refresh_token = create_refresh_token(user_id=new_user.id, db=db)
-        access_token = create_access_token(user_id=new_user.id)
-
-        return {"refresh_token": refresh_token, "access_token": access_token}
-    except IntegrityError:
-        db.rollback()  # if email is already in use
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="Email already registered"
-        )
-    finally:
-        db.close()
+    with session_scope(db) as db:
+        try:
+            # Hash the password before storing
+            hashed_password = hash_password(password=password)
+
+            # Create a new User instance
+            new_user = User(email=email, password=hashed_password)
+
+            # Add and commit to the database
+            db.add(instance=new_user)
+            db.flush()  # Get the generated user ID
+
+            # Create user profile
+            user_profile = UserProfile(
+                user_id=new_user.id,
+                first_name=profile_data.first_name if profile_data else None,
+                last_name=profile_data.last_name if profile_data else None,
+                phone=profile_data.phone if profile_data else None,
+                avatar_url=profile_data.avatar_url if profile_data else None,
+                bio=profile_data.bio if profile_data else None,
+                date_of_birth=profile_data.date_of_birth if profile_data else None,
+                location=profile_data.location if profile_data else None,
+                website=profile_data.website if profile_data else None
+            )
+
+            db.add(instance=user_profile)
+            db.commit()
+
+            refresh_token = create_refresh_token(user_id=new_user.id, db=db)
+            access_token = create_access_token(user_id=new_user.id)
+
+            return {"refresh_token": refresh_token, "access_token": access_token}
+        except IntegrityError:
+            db.rollback()  # if email is already in use
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Email already registered"
+            )
 
 def validate_access_token(token: str) -> Claims:
     """Decode and validate a JWT access token, returning its claims.
@@ -405,7 +410,7 @@ def validate_access_token(token: str) -> Claims:
             detail="Access token is invalid or expired"
         )
 
-def refresh_token(old_refresh_token: str) -> dict[str, str]:
+def refresh_token(old_refresh_token: str, db: Optional[Session] = None) -> dict[str, str]:
     """Validate a refresh token, rotate it and issue a new token pair.
 
     The function verifies the provided refresh token against stored hashed
@@ -414,6 +419,8 @@ def refresh_token(old_refresh_token: str) -> dict[str, str]:
 
     Args:
         old_refresh_token: The raw refresh token presented by the client.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
 
     Returns:
         A dict with keys ``access_token`` and ``refresh_token`` for the
@@ -423,38 +430,36 @@ def refresh_token(old_refresh_token: str) -> dict[str, str]:
         fastapi.HTTPException: If the provided refresh token is invalid,
             revoked, or expired (HTTP 401).
     """
-    db = SessionLocal()
     token_hash = hash_token(token=old_refresh_token)
 
-    token_entry = db.query(Tokens).filter(
-        Tokens.token == token_hash,
-        Tokens.revoked_at.is_(other=None),
-        Tokens.expires_at > datetime.now(timezone.utc)
-    ).first()
-
-    if not token_entry:
-        raise HTTPException(  # invalid, expired, or revoked
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid refresh token"
-        )
-
-    # Rotate refresh token: revoke old, create new
-    token_entry.revoked_at = datetime.now(timezone.utc)
-    db.commit()
+    with session_scope(db) as db:
+        token_entry = db.query(Tokens).filter(
+            Tokens.token == token_hash,
+            Tokens.revoked_at.is_(other=None),
+            Tokens.expires_at > datetime.now(timezone.utc)
+        ).first()
+
+        if not token_entry:
+            raise HTTPException(  # invalid, expired, or revoked
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid refresh token"
+            )
+
+        # Rotate refresh token: revoke old, create new
+        user_id = token_entry.user_id
+        token_entry.revoked_at = datetime.now(timezone.utc)
+        db.commit()
 
-    # Issue new tokens
-    new_access = create_access_token(user_id=token_entry.user_id)
+        # Issue new tokens
+        new_access = create_access_token(user_id=user_id)
 
-    # create_refresh_token will revoke previous tokens and persist the new one
-    new_refresh = create_refresh_token(user_id=token_entry.user_id, db=db)
+        # create_refresh_token will revoke previous tokens and persist the new one
+        new_refresh = create_refresh_token(user_id=user_id, db=db)
 
     return {"refresh_token": new_refresh, "access_token": new_access}
 
-def revoke_refresh_token(user_id: UUID) -> None:
+def revoke_refresh_token(user_id: UUID, db: Optional[Session] = None) -> None:
     """Revoke all stored refresh tokens for a given user by updating revoked_at."""
-    db = SessionLocal()
-    try:
+    with session_scope(db) as db:
         db.query(Tokens).filter(Tokens.user_id == user_id, Tokens.revoked_at.is_(other=None)).update(values={Tokens.revoked_at: datetime.now(tz=timezone.utc)}, synchronize_session=False)
         db.commit()
-    finally:
-        db.close()
@@ -0,0 +1,124 @@
+"""Initial client state in one request.
+
+On startup a client needs the user's profile, the first page of their
+conversations and the newest messages of each. :pyfunc:`get_bootstrap_service`
+loads the conversations and their messages with one statement: the page of
+the user's participant rows (a range scan on
+``ix_participants_user_activity``) joined ``LATERAL`` to the newest messages
+of each conversation (a short range scan on
+``ix_messages_conversation_created`` per row). The profile usually comes
+from ``profile_cache``.
+"""
+from sqlalchemy import select, true
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm.session import Session
+from typing import Optional
+from uuid import UUID
+
+from ..database import session_scope
+from ..models.conversations import Conversation, Participant
+from ..models.messages import Message
+from ..schema.internal import BootstrapConversationObject, BootstrapMessageObject, BootstrapObject
+from .conversations_service import CONVERSATION_CURSOR_KIND, to_conversation_object
+from .cursor_service import encode_cursor
+from .messages_service import encode_message_cursor
+from .users_service import get_user_profile
+
+MAX_BOOTSTRAP_CONVERSATIONS = 100
+MAX_BOOTSTRAP_MESSAGES = 50
+
+def _to_message_object(message: Message) -> BootstrapMessageObject:
+    return BootstrapMessageObject(
+        id=message.id,
+        conversation_id=message.conversation_id,
+        sender_id=message.sender_id,
+        content=message.content,
+        created_at=message.created_at,
+        seq=message.seq,
+    )
+
+def get_bootstrap_service(
+    user_id: UUID,
+    conversations: Optional[int] = 50,
+    messages: Optional[int] = 20,
+    db: Optional[Session] = None,
+) -> BootstrapObject:
+    """Return the user's profile, first page of conversations and their newest messages.
+
+    Args:
+        user_id: UUID of the requesting user.
+        conversations: Number of conversations, most recent first, capped
+            at ``MAX_BOOTSTRAP_CONVERSATIONS``.
+        messages: Number of messages per conversation, newest first,
+            capped at ``MAX_BOOTSTRAP_MESSAGES``.
+        db: Optional SQLAlchemy session; a private session is used when omitted.
+
+    Returns:
+        A ``BootstrapObject``. Its ``next_cursor`` continues the list at
+        ``GET /conversations/?cursor=``; each conversation's ``next_cursor``
+        continues its history at ``GET /messages/?cursor=``.
+
+    Raises:
+        fastapi.HTTPException: If the user has no profile (HTTP 404).
+    """
+    conversation_limit = min(conversations or 50, MAX_BOOTSTRAP_CONVERSATIONS)
+    message_limit = min(messages or 20, MAX_BOOTSTRAP_MESSAGES)
+
+    with session_scope(db) as db:
+        profile = get_user_profile(user_id=user_id, db=db)
+
+        # One row past each limit tells whether there is more
+        page = (
+            select(Participant.conversation_id, Participant.unread_count, Participant.last_message_at)
+            .where(Participant.user_id == user_id)
+            .order_by(Participant.last_message_at.desc(), Participant.conversation_id.desc())
+            .limit(conversation_limit + 1)
+            .subquery(name="page")
+        )
+        recent = (
+            select(Message.id, Message.conversation_id, Message.sender_id, Message.content, Message.seq, Message.created_at)
+            .where(Message.conversation_id == page.c.conversation_id)
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .limit(message_limit + 1)
+            .lateral(name="recent")
+        )
+        recent_message = aliased(Message, recent)
+        rows = db.execute(
+            select(Conversation, page.c.unread_count, recent_message)
+            .join(page, page.c.conversation_id == Conversation.id)
+            .outerjoin(recent, true())
+            .order_by(
+                page.c.last_message_at.desc(),
+                page.c.conversation_id.desc(),
+                recent.c.created_at.desc(),
+                recent.c.id.desc(),
+            )
+        ).all()
+
+        entries: list[BootstrapConversationObject] = []
+        history: dict[UUID, list[Message]] = {}
+        for conversation, unread_count, message in rows:
+            if conversation.id not in history:
+                history[conversation.id] = []
+                entries.append(BootstrapConversationObject(
+                    conversation=to_conversation_object(conversation=conversation, unread_count=unread_count),
+                    messages=[],
+                    next_cursor=None,
+                ))
+            if message is not None:
+                history[conversation.id].append(message)
+
+        next_cursor: Optional[str] = None
+        if len(entries) > conversation_limit:
+            entries = entries[:conversation_limit]
+            last = entries[-1]["conversation"]
+            next_cursor = encode_cursor(kind=CONVERSATION_CURSOR_KIND, values=[last["last_message_at"], last["id"]])
+
+        for entry in entries:
+            newest = history[entry["conversation"]["id"]]
+            if len(newest) > message_limit:
+                newest = newest[:message_limit]
+                entry["next_cursor"] = encode_message_cursor(message=newest[-1], direction="older")
+            entry["messages"] = [_to_message_object(message=message) for message in newest]
+
+        return BootstrapObject(profile=profile, conversations=entries, next_cursor=next_cursor)
@@ -0,0 +1,70 @@
+"""Recording changes for delta sync.
+
+Every write that a client showing a conversation has to know about appends
+a row to ``change_log`` in the same transaction: messages created, edited
+and deleted, conversations renamed, participants added, removed or given a
+new role. :pyfunc:`log_changes` appends rows from Python;
+:pyfunc:`change_log_insert` builds an ``INSERT ... SELECT`` that a single
+statement write can carry as a CTE. ``sync_service`` reads the log; rows
+older than ``CHANGE_LOG_RETENTION_DAYS`` are pruned.
+"""
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, insert, literal, select
+from sqlalchemy.orm.session import Session
+from sqlalchemy.sql import ColumnElement, Insert
+from typing import Any, Iterable, Literal, Optional
+from uuid import UUID
+
+from ..config import CHANGE_LOG_RETENTION_DAYS
+from ..database import session_scope
+from ..models.change_log import ChangeLog
+
+ChangeKind = Literal[
+    "message_created",
+    "message_edited",
+    "message_deleted",
+    "conversation_renamed",
+    "participant_added",
+    "participant_removed",
+    "participant_role_changed",
+]
+RETENTION = timedelta(days=CHANGE_LOG_RETENTION_DAYS)
+PRUNE_BATCH_SIZE = 10000
+
+def log_changes(db: Session, kind: ChangeKind, changes: Iterable[tuple[UUID, UUID]]) -> None:
+    """Append ``(conversation_id, entity_id)`` changes of one kind in the current transaction."""
+    rows = [{"conversation_id": conversation_id, "kind": kind, "entity_id": entity_id} for conversation_id, entity_id in changes]
+    if rows:
+        db.execute(insert(ChangeLog), rows)
+
+def change_log_insert(kind: ChangeKind, conversation_id: Any, entity_id: Any, source: Any) -> Insert:
+    """Return an ``INSERT ... SELECT`` appending a change for every row of ``source``.
+
+    ``conversation_id`` and ``entity_id`` are columns of ``source`` (for
+    example a CTE with ``RETURNING``) or literal values.
+    """
+    columns: list[ColumnElement[Any]] = [
+        _as_column(value=conversation_id, type_=ChangeLog.conversation_id.type),
+        literal(kind),
+        _as_column(value=entity_id, type_=ChangeLog.entity_id.type),
+    ]
+    return insert(ChangeLog).from_select(
+        ["conversation_id", "kind", "entity_id"],
+        select(*columns).select_from(source),
+    )
+
+def _as_column(value: Any, type_: Any) -> ColumnElement[Any]:
+    return value if isinstance(value, ColumnElement) else literal(value, type_=type_)
+
+def prune_change_log(batch_size: int = PRUNE_BATCH_SIZE, db: Optional[Session] = None) -> int:
+    """Delete up to ``batch_size`` changes older than the retention period.
+
+    Returns:
+        How many changes were deleted.
+    """
+    cutoff = datetime.now(tz=timezone.utc) - RETENTION
+    with session_scope(db) as db:
+        ids = select(ChangeLog.id).where(ChangeLog.created_at < cutoff).limit(batch_size)
+        result = db.execute(delete(ChangeLog).where(ChangeLog.id.in_(ids)), execution_options={"synchronize_session": False})
+        db.commit()
+        return result.rowcount
@@ -1,76 +1,152 @@
-from sqlalchemy import func, and_
+from sqlalchemy import Select, any_, bindparam, column, func, and_, or_, case, delete, exists, insert, literal, literal_column, select, text, true, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID, insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
 from sqlalchemy.orm.session import Session
-from ..database import SessionLocal
+from sqlalchemy.sql.selectable import CTE
+from datetime import datetime
+from ..database import commit_returning, session_scope
+from ..ids import uuid7
 from ..models.auth import User
 from ..models.conversations import Conversation, Participant
 from ..models.messages import Message
 from uuid import UUID
 from fastapi import HTTPException, status
-from .participants_service import get_user_role
-from ..schema.internal import conversationObject
-from typing import Optional, Literal
+from .change_log_service import ChangeKind, change_log_insert, log_changes
+from .participants_service import check_user_in_conversation, invalidate_memberships
+from .purge_service import enqueue_purge
+from ..schema.internal import conversationObject, ConversationPage, ParticipantObject, ParticipantPage, ParticipantsChangeObject, PurgeJobObject
+from .cursor_service import encode_cursor, decode_cursor
+from typing import Any, Iterable, Optional, Literal
+
+CONVERSATION_CURSOR_KIND = "conversations"
+PARTICIPANT_CURSOR_KIND = "participants"
+MAX_PARTICIPANT_BATCH = 1000
+PREVIEW_LENGTH = 140
+
+def to_conversation_object(conversation: Conversation, unread_count: int = 0) -> conversationObject:
+    return conversationObject(
+        id= conversation.id,
+        name= conversation.name or "Untitled Conversation",
+        created_by= conversation.created_by,
+        created_at= conversation.created_at.isoformat(),
+        participant_count= conversation.participant_count,
+        last_message_at= conversation.last_message_at.isoformat(),
+        last_message_id= conversation.last_message_id,
+        last_message_preview= conversation.last_message_preview,
+        last_message_sender_id= conversation.last_message_sender_id,
+        last_seq= conversation.last_seq,
+        unread_count= unread_count,
+    )
 
 def get_all_conversations_service(
     user_id: UUID,
     limit: Optional[int] = 50,
     offset: Optional[int] = 0,
+    cursor: Optional[str] = None,
+    db: Optional[Session] = None,
 ) -> list[conversationObject]:
     """Return a paginated list of conversations the user participates in.
 
-    The function queries conversations joined with participants to filter
-    results to those the given ``user_id`` is a member of. Each result is
-    converted into a ``conversationObject`` with basic metadata.
+    Conversations are ordered by recent activity (``last_message_at``, then
+    id). The user's participant rows carry a copy of ``last_message_at`` so
+    the list is a single range scan on ``ix_participants_user_activity``
+    followed by primary key lookups for the summaries; nothing is
+    aggregated at read time.
 
     Args:
         user_id: UUID of the requesting user.
-        limit: Maximum number of conversations to return.
-        offset: Number of conversations to skip for pagination.
+        limit: Maximum number of conversations to return; ``0`` returns all.
+        offset: Number of conversations to skip for pagination. Prefer
+            ``cursor``.
+        cursor: Cursor returned as ``next_cursor`` by
+            :pyfunc:`get_conversations_page_service`.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
 
     Returns:
         A list of ``conversationObject`` instances describing conversations.
+
+    Raises:
+        fastapi.HTTPException: If the cursor is invalid (HTTP 400).
     """
-    db = SessionLocal()
-
-    # Join conversations with participants to filter only those the user is in
-    query = (
-        db.query(
-            Conversation.id,
-            Conversation.name,
-            Conversation.created_at,
-            Conversation.created_by,
-            func.count(Participant.user_id).label("participant_count"),
+    with session_scope(db) as db:
+        query = (
+            db.query(Conversation, Participant.unread_count)
+            .join(Participant, Participant.conversation_id == Conversation.id)
+            .filter(Participant.user_id == user_id)
         )
-        .join(Participant, Participant.conversation_id == Conversation.id)
-        .filter(Participant.user_id == user_id)
-        .group_by(Conversation.id)
-        .order_by(Conversation.created_at.desc())
-        .offset(offset)
-    )
 
-    # Only apply limit if it's not 0
-    if limit and limit > 0:
-        query = query.limit(limit)
-
-    conversations = query.all()
-    db.close()
-
-    # Transform into desired response format
-    return [
-        conversationObject(
-            id= conversation.id,
-            name= conversation.name or "Untitled Conversation",
-            created_by= conversation.created_by,
-            created_at= conversation.created_at.isoformat(),
-            participant_count= conversation.participant_count,
+        if cursor:
+            last_message_at, conversation_id = _decode_conversation_cursor(cursor=cursor)
+            query = query.filter(
+                tuple_(Participant.last_message_at, Participant.conversation_id) < tuple_(last_message_at, conversation_id)
+            )
+
+        query = query.order_by(Participant.last_message_at.desc(), Participant.conversation_id.desc())
+
+        if offset:
+            query = query.offset(offset)
+
+        # Only apply limit if it's not 0
+        if limit and limit > 0:
+            query = query.limit(limit)
+
+        conversations = query.all()
+
+        # Transform into desired response format
+        return [
+            to_conversation_object(conversation=conversation, unread_count=unread_count)
+            for conversation, unread_count in conversations
+        ]
+
+def get_conversations_page_service(
+    user_id: UUID,
+    limit: Optional[int] = 50,
+    cursor: Optional[str] = None,
+    db: Optional[Session] = None,
+) -> ConversationPage:
+    """Return one keyset page of the user's conversations, most recent first.
+
+    Args:
+        user_id: UUID of the requesting user.
+        limit: Maximum number of conversations to return.
+        cursor: ``next_cursor`` of the previous page; omit for the first page.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
+
+    Returns:
+        A ``ConversationPage`` whose ``next_cursor`` is ``None`` on the last
+        page.
+    """
+    page_size = limit if limit and limit > 0 else 50
+    rows = get_all_conversations_service(user_id=user_id, limit=page_size + 1, cursor=cursor, db=db)
+
+    next_cursor: Optional[str] = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(kind=CONVERSATION_CURSOR_KIND, values=[last["last_message_at"], last["id"]])
+
+    return ConversationPage(conversations=rows, next_cursor=next_cursor)
+
+def _decode_conversation_cursor(cursor: str) -> tuple[datetime, UUID]:
+    values = decode_cursor(kind=CONVERSATION_CURSOR_KIND, cursor=cursor)
+    try:
+        last_message_at, conversation_id = values
+        return datetime.fromisoformat(last_message_at), UUID(conversation_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
         )
-        for conversation in conversations
-    ]
 
 def get_single_conversation_service(
     user_id: UUID,
     conversation_id: UUID,
     limit: int = 50,
     offset: int = 0,
+    db: Optional[Session] = None,
 ) -> list[conversationObject]:
     """Return details for a single conversation if the user is a member.
 
@@ -83,6 +159,8 @@ def get_single_conversation_service(
         conversation_id: UUID of the conversation to retrieve.
         limit: Unused here but kept for parity with list endpoints.
         offset: Unused here but kept for parity with list endpoints.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
 
     Returns:
         A one-element list with a ``conversationObject`` describing the
@@ -92,121 +170,453 @@ def get_single_conversation_service(
         fastapi.HTTPException: If the conversation does not exist
             (HTTP 404).
     """
-    db = SessionLocal()
+    with session_scope(db) as db:
+        # Join conversations with participants to filter only those the user is in
+        row = (
+            db.query(Conversation, Participant.unread_count)
+            .join(Participant, Participant.conversation_id == Conversation.id)
+            .filter(and_(Participant.user_id == user_id, Conversation.id == conversation_id))
+            .first()
+        )
+
+        if not row:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="conversation not found"
+            )
+
+        # Transform into desired response format
+        conversation, unread_count = row
+        return [to_conversation_object(conversation=conversation, unread_count=unread_count)]
+
+def get_conversations_by_ids(
+    user_id: UUID,
+    conversation_ids: Iterable[UUID],
+    db: Optional[Session] = None,
+) -> list[conversationObject]:
+    """Return the listed conversations the user participates in, most recent first.
+
+    Conversations the user isn't part of are left out.
+    """
+    ids = set(conversation_ids)
+    if not ids:
+        return []
+    with session_scope(db) as db:
+        rows = (
+            db.query(Conversation, Participant.unread_count)
+            .join(Participant, Participant.conversation_id == Conversation.id)
+            .filter(Participant.user_id == user_id, Conversation.id.in_(ids))
+            .order_by(Participant.last_message_at.desc(), Participant.conversation_id.desc())
+            .all()
+        )
+        return [
+            to_conversation_object(conversation=conversation, unread_count=unread_count)
+            for conversation, unread_count in rows
+        ]
+
+def reserve_message_seqs(db: Session, counts: dict[UUID, int]) -> dict[UUID, int]:
+    """Reserve ``counts[c]`` consecutive message sequence numbers in each conversation.
+
+    Increments ``Conversation.last_seq``, which keeps the conversation rows
+    locked until the transaction ends; concurrent senders wait and continue
+    from the new value, so numbers are never handed out twice. Several
+    conversations are locked in id order so two bulk sends can't deadlock.
+
+    Returns:
+        The first reserved number of each existing conversation.
+    """
+    if len(counts) > 1:
+        db.execute(
+            select(Conversation.id)
+            .where(Conversation.id.in_(counts))
+            .order_by(Conversation.id)
+            .with_for_update()
+        )
+    rows = db.execute(
+        update(Conversation)
+        .where(Conversation.id.in_(counts))
+        .values(last_seq=Conversation.last_seq + case(counts, value=Conversation.id))
+        .returning(Conversation.id, Conversation.last_seq),
+        execution_options={"synchronize_session": False},
+    )
+    return {row.id: row.last_seq - counts[row.id] + 1 for row in rows}
+
+def _summary_is_older(sent_at: Any, message_id: UUID) -> Any:
+    """Whether the conversation summary points at a message before ``(sent_at, message_id)``."""
+    return or_(
+        Conversation.last_message_id.is_(None),
+        tuple_(Conversation.last_message_at, Conversation.last_message_id) < tuple_(sent_at, message_id),
+    )
+
+def _participant_values(message_id: UUID, sender_id: UUID, sent_at: Any, message_count: int) -> dict[Any, Any]:
+    is_sender = Participant.user_id == sender_id
+    return {
+        Participant.last_message_at: func.greatest(Participant.last_message_at, sent_at),
+        Participant.unread_count: case((is_sender, 0), else_=Participant.unread_count + message_count),
+        Participant.last_read_message_id: case((is_sender, message_id), else_=Participant.last_read_message_id),
+        Participant.last_read_at: case((is_sender, sent_at), else_=Participant.last_read_at),
+    }
+
+def record_new_message(
+    db: Session,
+    conversation_id: UUID,
+    message_id: UUID,
+    sender_id: UUID,
+    content: str,
+    created_at: Optional[datetime] = None,
+    message_count: int = 1,
+) -> None:
+    """Point the conversation summary at a message inserted in this transaction.
+
+    Callers pass the message's ``created_at``, so the summary orders
+    messages exactly like history pages do; ``now()`` is used when it is
+    omitted. A transaction that started earlier but commits later cannot
+    move the summary backwards.
+
+    The participant rows are updated in one statement: every member's copy
+    of ``last_message_at`` advances so the conversation moves to the top of
+    their list, other members' unread counters are incremented and the
+    sender's read cursor moves to their own message. Bulk inserts pass the
+    newest message of the batch and ``message_count`` so a conversation is
+    updated once per batch.
+    """
+    sent_at = created_at if created_at is not None else func.now()
+    db.query(Conversation).filter(
+        Conversation.id == conversation_id,
+        _summary_is_older(sent_at=sent_at, message_id=message_id),
+    ).update(values={
+        Conversation.last_message_at: sent_at,
+        Conversation.last_message_id: message_id,
+        Conversation.last_message_preview: content[:PREVIEW_LENGTH],
+        Conversation.last_message_sender_id: sender_id,
+    }, synchronize_session=False)
+
+    db.query(Participant).filter(
+        Participant.conversation_id == conversation_id,
+    ).update(
+        values=_participant_values(message_id=message_id, sender_id=sender_id, sent_at=sent_at, message_count=message_count),
+        synchronize_session=False,
+    )
+
+def insert_message_statement(
+    message_id: UUID,
+    conversation_id: UUID,
+    sender_id: UUID,
+    content: str,
+    created_at: datetime,
+) -> Select:
+    """Return one statement that inserts a message and records it, selecting the new row.
 
-    # Join conversations with participants to filter only those the user is in
+    Does in a single round trip what :pyfunc:`reserve_message_seqs`, the
+    ``INSERT`` and :pyfunc:`record_new_message` do separately. The
+    conversation row is updated first: it takes the next ``seq`` (holding
+    the row lock until the transaction ends, like ``reserve_message_seqs``)
+    and moves the summary to the message unless the summary already points
+    at a later one. The ``INSERT`` reads its ``seq`` from that update, so
+    nothing is inserted into a conversation that doesn't exist, and the
+    participant rows are only updated once the message is in.
+
+    Returns:
+        A ``SELECT`` of the inserted ``Message``; it yields no row if the
+        conversation doesn't exist or was deleted.
+    """
+    is_older = _summary_is_older(sent_at=created_at, message_id=message_id)
     conversation = (
-        db.query(
-            Conversation.id,
-            Conversation.name,
-            Conversation.created_at,
-            Conversation.created_by,  # Assuming Conversation has created_by
-            func.count(Participant.user_id).label("participant_count"),
+        update(Conversation)
+        # A deleted conversation waiting for its purge takes no more messages
+        .where(Conversation.id == conversation_id, Conversation.deleted_at.is_(None))
+        .values({
+            Conversation.last_seq: Conversation.last_seq + 1,
+            Conversation.last_message_at: case((is_older, created_at), else_=Conversation.last_message_at),
+            Conversation.last_message_id: case((is_older, message_id), else_=Conversation.last_message_id),
+            Conversation.last_message_preview: case((is_older, content[:PREVIEW_LENGTH]), else_=Conversation.last_message_preview),
+            Conversation.last_message_sender_id: case((is_older, sender_id), else_=Conversation.last_message_sender_id),
+        })
+        .returning(Conversation.last_seq)
+        .cte(name="conversation")
+    )
+    columns = Message.__table__.c
+    inserted = (
+        insert(Message)
+        .from_select(
+            ["id", "conversation_id", "sender_id", "content", "created_at", "seq"],
+            select(
+                literal(message_id, type_=columns.id.type),
+                literal(conversation_id, type_=columns.conversation_id.type),
+                literal(sender_id, type_=columns.sender_id.type),
+                literal(content, type_=columns.content.type),
+                literal(created_at, type_=columns.created_at.type),
+                conversation.c.last_seq,
+            ),
         )
-        .join(Participant, Participant.conversation_id == Conversation.id)
-        .filter(and_(Participant.user_id == user_id, Conversation.id == conversation_id))
-        .group_by(Conversation.id)
-        .order_by(Conversation.created_at.desc())
-        .offset(offset=offset)
-        .limit(limit=limit)
-        .first()
+        .returning(*(column for column in columns if column.key != "search_vector"))
+        .cte(name="inserted")
     )
-    db.close()
+    participants = (
+        update(Participant)
+        .where(Participant.conversation_id == conversation_id, exists().where(inserted.c.id.isnot(None)))
+        .values(_participant_values(message_id=message_id, sender_id=sender_id, sent_at=created_at, message_count=1))
+        .cte(name="participants")
+    )
+    logged = change_log_insert(
+        kind="message_created", conversation_id=inserted.c.conversation_id, entity_id=inserted.c.id, source=inserted
+    ).cte(name="logged")
+    return select(aliased(Message, inserted)).add_cte(participants, logged)
 
-    if not conversation:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="conversation not found"
+def edit_message_statement(message_id: UUID, content: str) -> Select:
+    """Return one statement that edits a message and its preview, selecting the edited row.
+
+    The preview is only refreshed if the edited message is its
+    conversation's latest.
+
+    Returns:
+        A ``SELECT`` of the updated ``Message``; it yields no row if the
+        message doesn't exist.
+    """
+    edited = (
+        update(Message)
+        .where(Message.id == message_id)
+        .values(content=content)
+        .returning(*(column for column in Message.__table__.c if column.key != "search_vector"))
+        .cte(name="edited")
+    )
+    summary = (
+        update(Conversation)
+        .where(Conversation.id == edited.c.conversation_id, Conversation.last_message_id == edited.c.id)
+        .values(last_message_preview=content[:PREVIEW_LENGTH])
+        .cte(name="summary")
+    )
+    logged = change_log_insert(
+        kind="message_edited", conversation_id=edited.c.conversation_id, entity_id=edited.c.id, source=edited
+    ).cte(name="logged")
+    return select(aliased(Message, edited)).add_cte(summary, logged)
+
+def record_deleted_messages(db: Session, messages: Iterable[tuple[UUID, UUID, datetime, UUID]]) -> None:
+    """Update summaries and unread counters for messages deleted in this transaction.
+
+    ``messages`` are ``(conversation_id, message_id, created_at, sender_id)``
+    of the deleted messages, from any number of conversations. Participants
+    keep their activity timestamp so the conversation doesn't jump around
+    in lists, but members who hadn't read a deleted message yet get their
+    unread counter decremented (one ``UPDATE`` per message, sent as one
+    batch). Every conversation whose latest message was deleted is then
+    repointed at its newest remaining message with a single ``UPDATE``; the
+    replacement is one index probe on ``ix_messages_conversation_created``.
+    """
+    rows = list(messages)
+    if not rows:
+        return
+    participants = Participant.__table__.c
+    db.execute(
+        update(Participant.__table__)
+        .where(
+            participants.conversation_id == bindparam("deleted_conversation_id"),
+            participants.user_id != bindparam("deleted_sender_id"),
+            participants.unread_count > 0,
+            or_(
+                participants.last_read_at.is_(None),
+                tuple_(participants.last_read_at, participants.last_read_message_id)
+                < tuple_(
+                    bindparam("deleted_created_at", type_=participants.last_read_at.type),
+                    bindparam("deleted_message_id", type_=participants.last_read_message_id.type),
+                ),
+            ),
         )
+        .values(unread_count=participants.unread_count - 1),
+        [
+            {
+                "deleted_conversation_id": conversation_id,
+                "deleted_message_id": message_id,
+                "deleted_created_at": created_at,
+                "deleted_sender_id": sender_id,
+            }
+            for conversation_id, message_id, created_at, sender_id in rows
+        ],
+    )
 
-    # Transform into desired response format
-    return [
-        conversationObject(
-            id= conversation.id,
-            name= conversation.name or "Untitled Conversation",
-            created_by= conversation.created_by,
-            created_at= conversation.created_at.isoformat(),
-            participant_count= conversation.participant_count,
+    def newest(column: Any) -> Any:
+        return (
+            select(column)
+            .where(Message.conversation_id == Conversation.id)
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .limit(1)
+            .scalar_subquery()
         )
-    ]
+    db.execute(
+        update(Conversation)
+        .where(
+            Conversation.id.in_({row[0] for row in rows}),
+            Conversation.last_message_id.in_([row[1] for row in rows]),
+        )
+        .values({
+            Conversation.last_message_id: newest(Message.id),
+            Conversation.last_message_at: func.coalesce(newest(Message.created_at), Conversation.created_at),
+            Conversation.last_message_preview: func.substr(newest(Message.content), 1, PREVIEW_LENGTH),
+            Conversation.last_message_sender_id: newest(Message.sender_id),
+        }),
+        execution_options={"synchronize_session": False},
+    )
+
+def record_deleted_message(
+    db: Session,
+    conversation_id: UUID,
+    message_id: UUID,
+    created_at: datetime,
+    sender_id: UUID,
+) -> None:
+    """Repoint the summary at the newest remaining message if the latest was deleted.
+
+    The one-message case of :pyfunc:`record_deleted_messages`; members who
+    hadn't read the message yet get their unread counter decremented.
+    """
+    record_deleted_messages(db=db, messages=[(conversation_id, message_id, created_at, sender_id)])
 
 def create_conversation_service(
     name: str,
     conversation_type: Literal["private", "group"],
     created_by: UUID,
-    participant_ids: list[UUID]
+    participant_ids: list[UUID],
+    db: Optional[Session] = None,
 ) -> Conversation:
     """Create a new conversation and add initial participants.
 
+    Everything happens in one transaction: the conversation is inserted
+    with ``INSERT ... RETURNING`` and the participants with one bulk
+    insert. A private conversation is keyed by its ordered pair of users
+    (``private_pair_key``) and the insert is an upsert on that key, so
+    opening a private conversation with someone who already has one with
+    the creator returns the existing conversation instead of a duplicate.
+    Whether every participant exists is left to the participants' foreign
+    keys; the users are only looked up when one is violated.
+
     Args:
         name: Display name for the new conversation.
         conversation_type: Application-specific conversation type string.
         created_by: UUID of the user creating the conversation.
         participant_ids: List of UUIDs to add as participants, without the creator's UUID.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
 
     Returns:
-        The newly created ``Conversation`` ORM instance, with a
-        ``participant_count`` attribute set.
+        The newly created (or, for private conversations, the existing)
+        ``Conversation`` ORM instance, with a ``participant_count``
+        attribute set.
+
+    Raises:
+        fastapi.HTTPException: If a participant doesn't exist (HTTP 400)
+            or a private conversation doesn't have exactly one participant
+            besides the creator (HTTP 400).
     """
-    db = SessionLocal()
+    member_ids = set(participant_ids)
+    member_ids.add(created_by)  # Ensure creator is a participant
 
-    # Validate all participant IDs (including creator) exist to avoid FK errors
-    candidate_ids = set(participant_ids)
-    candidate_ids.add(created_by)
-    existing_ids = {
-        row.id for row in db.query(User.id).filter(User.id.in_(candidate_ids)).all()
-    }
-    missing_ids = candidate_ids.difference(existing_ids)
-    if missing_ids:
-        db.close()
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Unknown user ids: {', '.join(str(x) for x in missing_ids)}",
-        )
+    pair_key: Optional[str] = None
+    if conversation_type == "private":
+        if len(member_ids) != 2:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="A private conversation has exactly one participant besides its creator.",
+            )
+        pair_key = private_pair_key(user_ids=member_ids)
 
-    new_conversation = Conversation(
-        name=name,
-        conversation_type=conversation_type,
-        created_by=created_by
-    )
+    with session_scope(db) as db:
+        statement = pg_insert(Conversation).values(
+            id=uuid7(),
+            name=name,
+            conversation_type=conversation_type,
+            created_by=created_by,
+            participant_count=len(member_ids),
+            private_pair_key=pair_key,
+        )
+        # Groups have no key and never conflict. For an existing private
+        # conversation the no-op update makes RETURNING produce its row;
+        # xmax is 0 only for a freshly inserted row.
+        statement = statement.on_conflict_do_update(
+            index_elements=[Conversation.private_pair_key],
+            index_where=Conversation.private_pair_key.isnot(None),
+            set_={"private_pair_key": statement.excluded.private_pair_key},
+        ).returning(Conversation, literal_column("xmax = 0").label("inserted"))
+        try:
+            conversation, inserted = db.execute(
+                statement,
+                execution_options={"populate_existing": True}
+            ).one()
 
-    db.add(instance=new_conversation)
-    db.commit()
-    db.refresh(instance=new_conversation)
-
-    if created_by not in participant_ids:
-        participant_ids.append(created_by)  # Ensure creator is a participant
-    participants: list[Participant] = []
-    for participant in participant_ids:
-        role = "admin" if participant == created_by else "member"
-        participants.append(
-            Participant(
-                conversation_id=new_conversation.id,
-                user_id=participant,
-                role=role
+            if inserted:
+                db.execute(insert(Participant), [
+                    {
+                        "conversation_id": conversation.id,
+                        "user_id": member_id,
+                        "role": "admin" if member_id == created_by else "member",
+                        "last_message_at": conversation.last_message_at,
+                    }
+                    for member_id in member_ids
+                ])
+                log_changes(db=db, kind="participant_added", changes=[(conversation.id, member_id) for member_id in member_ids])
+        except IntegrityError:
+            # The foreign keys check that every user exists; only on a
+            # violation is it worth a query to tell which ones don't
+            db.rollback()
+            existing_ids = set(db.scalars(select(User.id).where(User.id.in_(member_ids))))
+            missing_ids = member_ids.difference(existing_ids)
+            if not missing_ids:
+                raise
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown user ids: {', '.join(str(x) for x in missing_ids)}",
             )
-        )
 
-    db.add_all(instances=participants)
-    db.commit()
-    db.refresh(instance=new_conversation)
-    db.close()
+        if inserted:
+            invalidate_memberships(db=db, conversation_id=conversation.id, user_ids=member_ids)
+        commit_returning(db, conversation)
 
-    new_conversation.participant_count = len(participant_ids)
+    return conversation
+
+def private_pair_key(user_ids: Iterable[UUID]) -> str:
+    """Return the key identifying the private conversation between two users."""
+    low, high = sorted(user_ids)
+    return f"{low}:{high}"
 
-    return new_conversation
+def _member_role(conversation_id: UUID, user_id: UUID) -> CTE:
+    """Return a CTE with the role of ``user_id`` in the conversation; empty for non-members."""
+    return (
+        select(Participant.role)
+        .where(Participant.conversation_id == conversation_id, Participant.user_id == user_id)
+        .cte(name="member")
+    )
+
+def _check_admin(role: Optional[str], action: str = "edit conversations") -> None:
+    if not role:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User is not part of this conversation."
+        )
+
+    if role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Only admins can {action}."
+        )
 
 def edit_conversation_service(
     conversation_id: UUID,
     user_id: UUID,
-    new_name: str
+    new_name: str,
+    db: Optional[Session] = None,
 ) -> Conversation:
     """Rename an existing conversation if the user has admin privileges.
 
+    The role check and the update run as one statement: the ``UPDATE`` only
+    applies when the user's participant row says admin, and the role is
+    returned alongside the updated row so a refusal can be told apart from
+    a missing conversation without another query.
+
     Args:
         conversation_id: UUID of the conversation to edit.
         user_id: UUID of the requesting user.
         new_name: New name to set on the conversation.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
 
     Returns:
         The updated ``Conversation`` ORM instance.
@@ -216,88 +626,403 @@ def edit_conversation_service(
             (HTTP 403), not an admin (HTTP 403), or the conversation does
             not exist (HTTP 404).
     """
-    db = SessionLocal()
-
-    user_role = get_user_role(
-        conversation_id=conversation_id,
-        user_id=user_id,
-        db=db
-    )
-
-    if not user_role:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="User is not part of this conversation."
-        )
-
-    if user_role != "admin":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only admins can edit conversations."
+    with session_scope(db) as db:
+        member = _member_role(conversation_id=conversation_id, user_id=user_id)
+        updated = (
+            update(Conversation)
+            .where(
+                Conversation.id == conversation_id,
+                exists().where(member.c.role == "admin"),
+            )
+            .values(name=new_name)
+            .returning(*Conversation.__table__.c)
+            .cte(name="updated")
         )
+        updated_conversation = aliased(Conversation, updated)
+        logged = change_log_insert(
+            kind="conversation_renamed", conversation_id=updated.c.id, entity_id=updated.c.id, source=updated
+        ).cte(name="logged")
+        row = db.execute(
+            select(member.c.role, updated_conversation)
+            .select_from(member)
+            .outerjoin(updated, true())
+            .add_cte(logged)
+            .execution_options(populate_existing=True)
+        ).first()
 
-    conversation: Optional[Conversation] = db.query(Conversation).filter(Conversation.id == conversation_id).first()
+        _check_admin(role=row.role if row else None)
+        conversation: Optional[Conversation] = row[1]
 
-    if not conversation:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="conversation not found"
-        )
+        if not conversation:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="conversation not found"
+            )
 
-    conversation.name = new_name
-
-    db.commit()
-    db.refresh(conversation)
+        commit_returning(db, conversation)
 
     return conversation
 
 def delete_conversation_service(
     conversation_id: UUID,
-    user_id: UUID
-) -> None:
-    """Delete a conversation and its participants if the user is admin.
+    user_id: UUID,
+    db: Optional[Session] = None,
+) -> PurgeJobObject:
+    """Delete a conversation if the user is admin.
 
-    The function validates the user's role, removes participant rows to
-    satisfy FK constraints, deletes the conversation instance and commits
-    the change.
+    The role check and marking the conversation deleted run as one
+    statement. Its participants are removed right away, so it disappears
+    from every member's list and nobody can read or post in it any more.
+    Its messages are removed afterwards in batches by the purge worker (see
+    ``purge_service``), so deleting a conversation with a long history is as
+    fast as deleting an empty one.
 
     Args:
         conversation_id: UUID of the conversation to delete.
         user_id: UUID of the requesting user.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
+
+    Returns:
+        The purge job removing the conversation's messages.
 
     Raises:
         fastapi.HTTPException: If the user is not a participant
             (HTTP 403) or not an admin (HTTP 403).
     """
-    db = SessionLocal()
+    with session_scope(db) as db:
+        member = _member_role(conversation_id=conversation_id, user_id=user_id)
+        deleted = (
+            update(Conversation)
+            .where(
+                Conversation.id == conversation_id,
+                Conversation.deleted_at.is_(None),
+                exists().where(member.c.role == "admin"),
+            )
+            # Free the pair so the two users can start a new private conversation
+            .values(deleted_at=func.now(), private_pair_key=None, participant_count=0)
+            .returning(Conversation.id)
+            .cte(name="deleted")
+        )
+        row = db.execute(
+            select(member.c.role, select(func.count()).select_from(deleted).scalar_subquery())
+        ).first()
 
-    user_role = get_user_role(
-        conversation_id=conversation_id,
-        user_id=user_id,
-        db=db
+        _check_admin(role=row.role if row else None)
+        removed_ids = db.scalars(
+            delete(Participant).where(Participant.conversation_id == conversation_id).returning(Participant.user_id)
+        ).all()
+        # Lets every former member's sync drop the conversation
+        log_changes(db=db, kind="participant_removed", changes=[(conversation_id, removed_id) for removed_id in removed_ids])
+        invalidate_memberships(db=db, conversation_id=conversation_id)
+        job = enqueue_purge(db=db, kind="conversation", target_id=conversation_id, requested_by=user_id)
+        db.commit()
+    return job
+
+def _membership(conversation_id: UUID, user_id: UUID) -> CTE:
+    """Return a CTE with the user's role and the conversation's type, count and activity; empty for non-members."""
+    return (
+        select(Participant.role, Conversation.conversation_type, Conversation.participant_count, Conversation.last_message_at)
+        .join(Conversation, Conversation.id == Participant.conversation_id)
+        .where(Participant.conversation_id == conversation_id, Participant.user_id == user_id)
+        .cte(name="member")
     )
 
-    if not user_role:
+def _user_ids_param(user_ids: Iterable[UUID]) -> Any:
+    return bindparam("user_ids", value=list(user_ids), type_=ARRAY(PG_UUID(as_uuid=True)))
+
+def _check_participant_batch(participant_ids: list[UUID]) -> None:
+    if not participant_ids or len(participant_ids) > MAX_PARTICIPANT_BATCH:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="User is not part of this conversation."
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Between 1 and {MAX_PARTICIPANT_BATCH} users can be changed at once."
         )
 
-    if user_role != "admin":
+def _change_participants(
+    db: Session,
+    conversation_id: UUID,
+    member: CTE,
+    changed: CTE,
+    kind: ChangeKind,
+    count_delta: int,
+) -> Any:
+    """Run a participant change and return the caller's role, the conversation type, its new count and the changed users.
+
+    ``changed`` is a data-modifying CTE returning the ``user_id`` of every
+    changed participant. The same statement logs the changes and moves
+    ``participant_count`` by ``count_delta`` per changed row, so the count
+    can't drift from the rows however many users change or who else is
+    changing them.
+    """
+    logged = change_log_insert(
+        kind=kind, conversation_id=conversation_id, entity_id=changed.c.user_id, source=changed
+    ).cte(name="logged")
+    participant_count: Any = member.c.participant_count
+    if count_delta:
+        counted = (
+            update(Conversation)
+            .where(Conversation.id == conversation_id, exists(select(changed.c.user_id)))
+            .values(participant_count=Conversation.participant_count + count_delta * select(func.count()).select_from(changed).scalar_subquery())
+            .returning(Conversation.participant_count)
+            .cte(name="counted")
+        )
+        participant_count = func.coalesce(select(counted.c.participant_count).scalar_subquery(), member.c.participant_count)
+    return db.execute(
+        select(
+            member.c.role,
+            member.c.conversation_type,
+            participant_count.label("participant_count"),
+            select(func.array_agg(changed.c.user_id)).scalar_subquery().label("user_ids"),
+        ).add_cte(logged)
+    ).first()
+
+def _check_group(conversation_type: str) -> None:
+    if conversation_type != "group":
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only admins can edit conversations."
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Participants of a private conversation can't be changed."
         )
 
-    conversation = db.query(Conversation).filter(Conversation.id == conversation_id)
-    # fetch the instance, then delete
-    # remove participants first to avoid foreign key constraint issues
-    db.query(Participant).filter(Participant.conversation_id == conversation_id).delete(synchronize_session=False)
-    conv_inst = conversation.first()
-    if conv_inst:
-        db.delete(instance=conv_inst)
+def _participants_changed(db: Session, conversation_id: UUID, row: Any) -> ParticipantsChangeObject:
+    user_ids: list[UUID] = list(row.user_ids or [])
+    if user_ids:
+        invalidate_memberships(db=db, conversation_id=conversation_id, user_ids=user_ids)
     db.commit()
-    return
+    return ParticipantsChangeObject(
+        conversation_id=conversation_id,
+        user_ids=user_ids,
+        participant_count=row.participant_count,
+    )
+
+def add_participants_service(
+    conversation_id: UUID,
+    user_id: UUID,
+    participant_ids: list[UUID],
+    role: Literal["member", "admin"] = "member",
+    db: Optional[Session] = None,
+) -> ParticipantsChangeObject:
+    """Add many users to a group conversation in one statement.
+
+    The users are inserted with ``INSERT ... SELECT ... ON CONFLICT DO
+    NOTHING``, so users who are already members are skipped and a retried
+    request changes nothing. Only admins may add participants.
+
+    Args:
+        conversation_id: UUID of the group conversation.
+        user_id: UUID of the requesting user.
+        participant_ids: Users to add, at most ``MAX_PARTICIPANT_BATCH``.
+        role: Role given to the new participants.
+        db: Optional SQLAlchemy session; a private session is used when omitted.
+
+    Returns:
+        The users that were added and the new participant count.
+
+    Raises:
+        fastapi.HTTPException: If the batch is empty or too large, a user
+            doesn't exist, or the conversation is private (HTTP 400), or
+            the requesting user is not an admin of it (HTTP 403).
+    """
+    requested = list(dict.fromkeys(participant_ids))
+    _check_participant_batch(participant_ids=requested)
+    with session_scope(db) as db:
+        member = _membership(conversation_id=conversation_id, user_id=user_id)
+        # Participant ids are uuid7 like everywhere else, so they come from here
+        new = func.unnest(
+            bindparam("ids", value=[uuid7() for _ in requested], type_=ARRAY(PG_UUID(as_uuid=True))),
+            _user_ids_param(user_ids=requested),
+        ).table_valued(column("id", PG_UUID(as_uuid=True)), column("user_id", PG_UUID(as_uuid=True))).render_derived(name="new")
+        added = (
+            pg_insert(Participant)
+            .from_select(
+                # unread_count is spelled out: inside a CTE its Python-side default would be sent as NULL
+                ["id", "conversation_id", "user_id", "role", "last_message_at", "unread_count"],
+                select(new.c.id, literal(conversation_id, type_=PG_UUID(as_uuid=True)), new.c.user_id, literal(role), member.c.last_message_at, literal(0))
+                .select_from(new)
+                .join(User, User.id == new.c.user_id)
+                .join(member, true())
+                .where(member.c.role == "admin", member.c.conversation_type == "group"),
+            )
+            .on_conflict_do_nothing(index_elements=[Participant.user_id, Participant.conversation_id])
+            .returning(Participant.user_id)
+            .cte(name="changed")
+        )
+        row = _change_participants(
+            db=db, conversation_id=conversation_id, member=member, changed=added, kind="participant_added", count_delta=1
+        )
+        _check_admin(role=row.role if row else None, action="manage participants")
+        _check_group(conversation_type=row.conversation_type)
+
+        if len(row.user_ids or []) < len(requested):
+            # Users who are already members are skipped silently; only
+            # unknown users are an error, and only then worth a query
+            skipped = set(requested).difference(row.user_ids or [])
+            missing_ids = skipped.difference(db.scalars(select(User.id).where(User.id.in_(skipped))))
+            if missing_ids:
+                db.rollback()
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Unknown user ids: {', '.join(str(x) for x in missing_ids)}",
+                )
+        return _participants_changed(db=db, conversation_id=conversation_id, row=row)
+
+def remove_participants_service(
+    conversation_id: UUID,
+    user_id: UUID,
+    participant_ids: list[UUID],
+    db: Optional[Session] = None,
+) -> ParticipantsChangeObject:
+    """Remove many users from a group conversation in one statement.
+
+    Admins may remove anyone; any participant may remove themselves to
+    leave. Users who aren't participants are ignored.
+
+    Args:
+        conversation_id: UUID of the group conversation.
+        user_id: UUID of the requesting user.
+        participant_ids: Users to remove, at most ``MAX_PARTICIPANT_BATCH``.
+        db: Optional SQLAlchemy session; a private session is used when omitted.
+
+    Returns:
+        The users that were removed and the new participant count.
+
+    Raises:
+        fastapi.HTTPException: If the batch is empty or too large or the
+            conversation is private (HTTP 400), or the requesting user is
+            not an admin of it and isn't only leaving (HTTP 403).
+    """
+    requested = list(dict.fromkeys(participant_ids))
+    _check_participant_batch(participant_ids=requested)
+    leaving = requested == [user_id]
+    with session_scope(db) as db:
+        member = _membership(conversation_id=conversation_id, user_id=user_id)
+        allowed = member.c.role.isnot(None) if leaving else member.c.role == "admin"
+        removed = (
+            delete(Participant)
+            .where(
+                Participant.conversation_id == conversation_id,
+                Participant.user_id == any_(_user_ids_param(user_ids=requested)),
+                exists().where(allowed, member.c.conversation_type == "group"),
+            )
+            .returning(Participant.user_id)
+            .cte(name="changed")
+        )
+        row = _change_participants(
+            db=db, conversation_id=conversation_id, member=member, changed=removed, kind="participant_removed", count_delta=-1
+        )
+        if row is None or not leaving:
+            _check_admin(role=row.role if row else None, action="manage participants")
+        _check_group(conversation_type=row.conversation_type)
+        return _participants_changed(db=db, conversation_id=conversation_id, row=row)
+
+def set_participant_roles_service(
+    conversation_id: UUID,
+    user_id: UUID,
+    participant_ids: list[UUID],
+    role: Literal["member", "admin"],
+    db: Optional[Session] = None,
+) -> ParticipantsChangeObject:
+    """Give many participants the same role in one statement (admins only).
+
+    Users who aren't participants or already have the role are ignored.
+
+    Args:
+        conversation_id: UUID of the conversation.
+        user_id: UUID of the requesting user.
+        participant_ids: Participants to change, at most ``MAX_PARTICIPANT_BATCH``.
+        role: The role to give them.
+        db: Optional SQLAlchemy session; a private session is used when omitted.
+
+    Returns:
+        The users whose role changed and the participant count.
+
+    Raises:
+        fastapi.HTTPException: If the batch is empty or too large
+            (HTTP 400), or the requesting user is not an admin of the
+            conversation (HTTP 403).
+    """
+    requested = list(dict.fromkeys(participant_ids))
+    _check_participant_batch(participant_ids=requested)
+    with session_scope(db) as db:
+        member = _membership(conversation_id=conversation_id, user_id=user_id)
+        changed = (
+            update(Participant)
+            .where(
+                Participant.conversation_id == conversation_id,
+                Participant.user_id == any_(_user_ids_param(user_ids=requested)),
+                Participant.role != role,
+                exists().where(member.c.role == "admin"),
+            )
+            .values(role=role)
+            .returning(Participant.user_id)
+            .cte(name="changed")
+        )
+        row = _change_participants(
+            db=db, conversation_id=conversation_id, member=member, changed=changed, kind="participant_role_changed", count_delta=0
+        )
+        _check_admin(role=row.role if row else None, action="manage participants")
+        return _participants_changed(db=db, conversation_id=conversation_id, row=row)
+
+def get_participants_page_service(
+    conversation_id: UUID,
+    user_id: UUID,
+    limit: Optional[int] = 100,
+    cursor: Optional[str] = None,
+    db: Optional[Session] = None,
+) -> ParticipantPage:
+    """Return one keyset page of a conversation's participants, ordered by user id.
+
+    Each page is a range scan on ``ix_participants_conversation_user``
+    starting after the last user of the previous page, so paging through a
+    large group costs the same on every page.
+
+    Args:
+        conversation_id: UUID of the conversation.
+        user_id: UUID of the requesting user, who must be a participant.
+        limit: Maximum number of participants, capped at ``MAX_PARTICIPANT_BATCH``.
+        cursor: ``next_cursor`` of the previous page; omit for the first page.
+        db: Optional SQLAlchemy session; a private session is used when omitted.
+
+    Returns:
+        A ``ParticipantPage`` whose ``next_cursor`` is ``None`` on the last page.
+
+    Raises:
+        fastapi.HTTPException: If the cursor is invalid (HTTP 400) or the
+            user is not a participant (HTTP 404).
+    """
+    page_size = min(limit or 100, MAX_PARTICIPANT_BATCH)
+    with session_scope(db) as db:
+        if not check_user_in_conversation(conversation_id=conversation_id, user_id=user_id, db=db):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="conversation not found"
+            )
+        query = select(Participant.user_id, Participant.role, Participant.joined_at).where(Participant.conversation_id == conversation_id)
+        if cursor:
+            query = query.where(Participant.user_id > _decode_participant_cursor(cursor=cursor))
+        rows = db.execute(query.order_by(Participant.user_id).limit(page_size + 1)).all()
+
+        next_cursor: Optional[str] = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = encode_cursor(kind=PARTICIPANT_CURSOR_KIND, values=[rows[-1].user_id])
+        return ParticipantPage(
+            participants=[
+                ParticipantObject(user_id=row.user_id, role=row.role, joined_at=row.joined_at)
+                for row in rows
+            ],
+            next_cursor=next_cursor,
+        )
+
+def _decode_participant_cursor(cursor: str) -> UUID:
+    values = decode_cursor(kind=PARTICIPANT_CURSOR_KIND, cursor=cursor)
+    try:
+        [last_user_id] = values
+        return UUID(last_user_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
 
 def get_conversation_by_message(
     message_id: UUID,
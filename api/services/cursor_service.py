@@ -0,0 +1,90 @@
+"""Opaque, signed pagination cursors.
+
+A cursor is the base64url encoded JSON ``[kind, values]`` followed by a
+truncated HMAC-SHA256 signature over it. The signature keeps clients from
+crafting positions the server never handed out; ``kind`` keeps a cursor
+issued by one endpoint from being replayed against another.
+"""
+import base64
+import hashlib
+import hmac
+import json
+from datetime import datetime
+from typing import Any, Optional, Sequence
+from uuid import UUID
+
+from fastapi import HTTPException, Response, status
+
+from ..config import SECRET_KEY
+
+_SIGNATURE_BYTES = 16
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+def _sign(payload: str) -> str:
+    digest = hmac.new(key=SECRET_KEY.encode(), msg=payload.encode(), digestmod=hashlib.sha256).digest()
+    return _b64encode(raw=digest[:_SIGNATURE_BYTES])
+
+def _serialize(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+def encode_cursor(kind: str, values: Sequence[Any]) -> str:
+    """Encode ``values`` into a signed cursor string tagged with ``kind``.
+
+    Args:
+        kind: Namespace of the cursor, for example ``"messages"``.
+        values: JSON serialisable position values; ``datetime`` and ``UUID``
+            values are converted to strings.
+
+    Returns:
+        The opaque cursor string.
+    """
+    payload = _b64encode(raw=json.dumps([kind, [_serialize(v) for v in values]], separators=(",", ":")).encode())
+    return f"{payload}.{_sign(payload=payload)}"
+
+def decode_cursor(kind: str, cursor: str) -> list[Any]:
+    """Verify and decode a cursor produced by :pyfunc:`encode_cursor`.
+
+    Args:
+        kind: Expected namespace of the cursor.
+        cursor: Cursor string received from a client.
+
+    Returns:
+        The list of position values in the order they were encoded.
+
+    Raises:
+        fastapi.HTTPException: If the cursor is malformed, its signature does
+            not match or it was issued for another ``kind`` (HTTP 400).
+    """
+    invalid = HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Invalid cursor"
+    )
+    payload, _, signature = cursor.partition(".")
+    if not payload or not hmac.compare_digest(signature, _sign(payload=payload)):
+        raise invalid
+    try:
+        decoded_kind, values = json.loads(_b64decode(value=payload))
+    except (ValueError, TypeError):
+        raise invalid
+    if decoded_kind != kind or not isinstance(values, list):
+        raise invalid
+    return values
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+PREV_CURSOR_HEADER = "X-Prev-Cursor"
+
+def set_cursor_headers(response: Response, next_cursor: Optional[str], prev_cursor: Optional[str]) -> None:
+    """Expose page cursors as response headers so list bodies stay plain arrays."""
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if prev_cursor:
+        response.headers[PREV_CURSOR_HEADER] = prev_cursor
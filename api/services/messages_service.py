@@ -1,23 +1,231 @@
 from ..models.messages import Message
-from ..database import SessionLocal
-from typing import List, Optional
-from datetime import datetime
+from ..models.conversations import Conversation, Participant
+from ..config import MESSAGE_HOT_WINDOW_DAYS
+from ..database import commit_returning, engine, session_scope
+from ..deadlines import apply_deadline
+from sqlalchemy import and_, delete, func, insert, select, true, tuple_, union_all
+from sqlalchemy.orm import Query, aliased
+from sqlalchemy.orm.session import Session
+from collections import Counter
+from typing import Any, List, Literal, Optional
+from datetime import datetime, timedelta, timezone
 from uuid import UUID
 from fastapi import HTTPException, status
-from ..services.participants_service import get_user_role, check_user_in_conversation
-from ..services.conversations_service import get_conversation_by_message
+from ..schema.internal.messages import MessagePage, BulkMessageItem, BulkMessageResult
+from ..services.participants_service import check_user_in_conversation, membership_cache
+from ..services.conversations_service import edit_message_statement, insert_message_statement, record_new_message, record_deleted_message, reserve_message_seqs
+from ..services.cursor_service import encode_cursor, decode_cursor
+from ..services.change_log_service import change_log_insert, log_changes
+from ..services.recent_messages_service import forget_recent_message, invalidate_recent_messages, record_recent_message, recent_messages_cache
+from ..ids import uuid7, uuid7_time
+
+MESSAGE_CURSOR_KIND = "messages"
+MAX_PAGE_SIZE = 200
+# History queries look at this window first so older partitions can be pruned
+HOT_WINDOW = timedelta(days=MESSAGE_HOT_WINDOW_DAYS)
+BULK_MAX_MESSAGES = 5000
+# Rows per multi-row INSERT; keeps each statement well below the bind parameter limit
+BULK_CHUNK_SIZE = 1000
+
+def encode_message_cursor(message: Message, direction: Literal["older", "newer"]) -> str:
+    """Return a cursor pointing just past ``message`` in ``direction``.
+
+    When ``created_at`` is the time in the message's UUIDv7 (true for every
+    message sent since ids became time ordered) the id alone marks the
+    position; older messages also carry their ``created_at``.
+    """
+    if uuid7_time(value=message.id) == message.created_at:
+        return encode_cursor(kind=MESSAGE_CURSOR_KIND, values=[direction, message.id])
+    return encode_cursor(kind=MESSAGE_CURSOR_KIND, values=[direction, message.created_at, message.id])
+
+def decode_message_cursor(cursor: str) -> tuple[Literal["older", "newer"], datetime, UUID]:
+    """Decode a message cursor into ``(direction, created_at, id)``.
+
+    Raises:
+        fastapi.HTTPException: If the cursor is invalid (HTTP 400).
+    """
+    values = decode_cursor(kind=MESSAGE_CURSOR_KIND, cursor=cursor)
+    try:
+        if len(values) == 2:
+            direction, message_id = values
+            message_id = UUID(message_id)
+            created_at = uuid7_time(value=message_id)
+            if created_at is None:
+                raise ValueError(message_id)
+        else:
+            direction, created_at, message_id = values
+            created_at, message_id = datetime.fromisoformat(created_at), UUID(message_id)
+        if direction not in ("older", "newer"):
+            raise ValueError(direction)
+        return direction, created_at, message_id
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def _message_position(conversation_id: UUID, message_id: UUID) -> Any:
+    """Return the ``(created_at, id)`` keyset position of a message.
+
+    For a UUIDv7 the time comes from the id itself; for older ids it is
+    looked up in the same statement, and a message that doesn't exist in
+    the conversation compares as ``NULL`` so nothing matches.
+    """
+    created_at: Any = uuid7_time(value=message_id)
+    if created_at is None:
+        created_at = (
+            select(Message.created_at)
+            .where(Message.id == message_id, Message.conversation_id == conversation_id)
+            .scalar_subquery()
+        )
+    return tuple_(created_at, message_id)
+
+def _as_utc(value: datetime) -> datetime:
+    """Treat naive datetimes as UTC so they compare with stored timestamps."""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+def _authorized_page(
+    db: Session,
+    conversation_id: UUID,
+    user_id: UUID,
+    query: Query[Message],
+    newest_first: bool = True,
+    by_seq: bool = False
+) -> Optional[List[Message]]:
+    """Run a page query authorized for ``user_id``.
+
+    A cached role from ``membership_cache`` settles authorization without
+    touching the database. Otherwise the page is a subquery left joined to
+    the user's participant row, so membership and data come back in one
+    statement: a participant gets at least one row (without a message when
+    the page is empty) and anyone else gets none. Postgres doesn't evaluate
+    the page at all when the participant row is missing.
+
+    The page is ordered by ``(created_at, id)``, newest first unless
+    ``newest_first`` is false, or by ascending ``seq`` when ``by_seq`` is set.
+
+    Returns:
+        The page's messages, or ``None`` if the user is not a participant.
+    """
+    hit, role = membership_cache.get(conversation_id=conversation_id, user_id=user_id)
+    if hit:
+        return query.all() if role is not None else None
+
+    generation = membership_cache.generation
+    page = query.subquery()
+    message = aliased(Message, page)
+    if by_seq:
+        order = (page.c.seq.asc(),)
+    elif newest_first:
+        order = (page.c.created_at.desc(), page.c.id.desc())
+    else:
+        order = (page.c.created_at.asc(), page.c.id.asc())
+
+    rows = (
+        db.query(Participant.role, message)
+        .outerjoin(page, true())
+        .filter(Participant.conversation_id == conversation_id, Participant.user_id == user_id)
+        .order_by(*order)
+        .all()
+    )
+    membership_cache.set(
+        conversation_id=conversation_id,
+        user_id=user_id,
+        role=rows[0][0] if rows else None,
+        generation=generation
+    )
+    if not rows:
+        return None
+    return [row[1] for row in rows if row[1] is not None]
+
+def _fetch_newest_first(
+    db: Session,
+    conversation_id: UUID,
+    user_id: UUID,
+    query: Query[Message],
+    upper: Optional[datetime],
+    offset: int,
+    limit: int
+) -> Optional[List[Message]]:
+    """Run an authorized newest-first history query against the hot partitions first.
+
+    ``messages`` is partitioned by month and most pages are served from the
+    last few days. Bounding ``created_at`` from below with a literal lets
+    Postgres prune every older partition at plan time. Only when the hot
+    window holds fewer than ``offset + limit`` rows is the query repeated
+    without the bound; membership was already checked by then.
+
+    Returns:
+        The messages, or ``None`` if the user is not a participant.
+    """
+    hot_since = (upper or datetime.now(tz=timezone.utc)) - HOT_WINDOW
+    rows = _authorized_page(
+        db=db,
+        conversation_id=conversation_id,
+        user_id=user_id,
+        query=query.filter(Message.created_at >= hot_since).offset(offset=offset).limit(limit=limit)
+    )
+    if rows is not None and len(rows) < limit:
+        rows = query.offset(offset=offset).limit(limit=limit).all()
+    return rows
+
+def _newest_messages(db: Session, conversation_id: UUID, user_id: UUID, count: int) -> Optional[List[Message]]:
+    """Return the newest ``count`` messages from ``recent_messages_cache``, filling it on a miss.
+
+    With the role cached as well, a hit doesn't touch the database. A miss
+    reads the newest messages from the primary: a replica that hasn't
+    replayed a message whose notification was already applied would leave
+    it out of the cache until the next change. A replica session gives its
+    connection back first, so a miss never holds two connections, and the
+    primary session gets the request's deadline.
+
+    Returns:
+        The messages, newest first, or ``None`` if the user is not a participant.
+    """
+    if not check_user_in_conversation(conversation_id=conversation_id, user_id=user_id, db=db):
+        return None
+    rows = recent_messages_cache.get(conversation_id=conversation_id, count=count)
+    if rows is not None:
+        return rows
+
+    version = recent_messages_cache.begin_fill(conversation_id=conversation_id)
+
+    def fill(session: Session) -> Optional[List[Message]]:
+        newest = _fetch_newest_first(
+            db=session,
+            conversation_id=conversation_id,
+            user_id=user_id,
+            query=session.query(Message)
+                .filter(Message.conversation_id == conversation_id)
+                .order_by(Message.created_at.desc(), Message.id.desc()),
+            upper=None,
+            offset=0,
+            limit=recent_messages_cache.capacity
+        )
+        if newest is None:
+            return None
+        return recent_messages_cache.fill(conversation_id=conversation_id, version=version, messages=newest)[:count]
+
+    if db.get_bind() is engine:
+        return fill(session=db)
+    # Read-only, so ending its transaction loses nothing
+    db.rollback()
+    with session_scope() as primary:
+        apply_deadline(db=primary, deadline=db.info.get("deadline"))
+        return fill(session=primary)
 
 def get_all_messages_service(
     conversation_id: UUID,
     user_id: UUID,
     limit: Optional[int] = 50,
     offset: Optional[int] = 0,
-    before: Optional[datetime] = None
+    before: Optional[datetime] = None,
+    db: Optional[Session] = None
 ) -> List[Message]:
     """Retrieve messages for a conversation with optional pagination and time filter.
 
-    The function verifies the requesting user's membership in the
-    conversation, then returns messages ordered by creation time descending.
+    Messages are returned ordered by creation time descending. The
+    requesting user's membership is checked in the same statement.
 
     Args:
         conversation_id: UUID of the conversation to fetch messages from.
@@ -26,6 +234,8 @@ def get_all_messages_service(
         offset: Number of messages to skip for pagination.
         before: Optional datetime to only return messages created before this
             timestamp.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
 
     Returns:
         A list of ``Message`` ORM instances matching the query.
@@ -34,37 +244,328 @@ def get_all_messages_service(
         fastapi.HTTPException: If the requesting user is not a participant
             (HTTP 401).
     """
-    db = SessionLocal()
-    
-    in_conversation = check_user_in_conversation(
-        conversation_id=conversation_id,
-        user_id=user_id,
-        db=db
+    with session_scope(db) as db:
+        query = db.query(Message).filter(Message.conversation_id == conversation_id)
+
+        if before:
+            query = query.filter(Message.created_at < before)
+
+        query = query.order_by(Message.created_at.desc())
+        messages = _fetch_newest_first(
+            db=db,
+            conversation_id=conversation_id,
+            user_id=user_id,
+            query=query,
+            upper=before,
+            offset=offset or 0,
+            limit=limit or 50
+        )
+
+        if messages is None:
+            raise HTTPException(
+                status_code=401,
+                detail="Not authorized"
+            )
+        return messages
+
+def get_messages_page_service(
+    conversation_id: UUID,
+    user_id: UUID,
+    limit: Optional[int] = 50,
+    cursor: Optional[str] = None,
+    before: Optional[datetime] = None,
+    after: Optional[UUID] = None,
+    db: Optional[Session] = None
+) -> MessagePage:
+    """Return one page of a conversation's history using keyset pagination.
+
+    Messages are ordered newest first by ``(created_at, id)``, which makes
+    the order total even when timestamps tie. Instead of an ``OFFSET`` the
+    query starts right after the position encoded in ``cursor``, so every
+    page is a range scan on ``ix_messages_conversation_created`` and costs
+    the same regardless of how deep into the history it is.
+
+    Args:
+        conversation_id: UUID of the conversation to fetch messages from.
+        user_id: UUID of the requesting user (used for authorization).
+        limit: Maximum number of messages to return, capped at
+            ``MAX_PAGE_SIZE``.
+        cursor: Cursor from a previous page's ``next_cursor`` (older
+            messages) or ``prev_cursor`` (newer messages). Omit for the
+            newest page.
+        before: Optional datetime to start the first page from when no
+            cursor is given.
+        after: Optional message id; when no cursor is given, returns the
+            messages that directly follow it, like a ``newer`` page
+            starting at that message.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
+
+    Returns:
+        A ``MessagePage`` with the messages (newest first) and the cursors
+        for the adjacent pages. ``next_cursor`` is ``None`` once the oldest
+        message has been returned; ``prev_cursor`` is ``None`` once the
+        newest message has been returned by a ``newer`` page.
+
+    Raises:
+        fastapi.HTTPException: If the requesting user is not a participant
+            (HTTP 401) or the cursor is invalid (HTTP 400).
+    """
+    page_size = min(limit or 50, MAX_PAGE_SIZE)
+    direction: Literal["older", "newer"] = "older"
+
+    with session_scope(db) as db:
+        query = db.query(Message).filter(Message.conversation_id == conversation_id)
+        position = tuple_(Message.created_at, Message.id)
+        upper: Optional[datetime] = before
+
+        if cursor:
+            direction, created_at, message_id = decode_message_cursor(cursor=cursor)
+            upper = created_at
+            if direction == "older":
+                query = query.filter(position < tuple_(created_at, message_id))
+            else:
+                query = query.filter(position > tuple_(created_at, message_id))
+        elif after:
+            direction = "newer"
+            query = query.filter(position > _message_position(conversation_id=conversation_id, message_id=after))
+        elif before:
+            query = query.filter(Message.created_at < before)
+
+        # Fetch one extra row to learn whether another page exists
+        if direction == "older" and not cursor and not before and page_size < recent_messages_cache.capacity:
+            rows = _newest_messages(db=db, conversation_id=conversation_id, user_id=user_id, count=page_size + 1)
+        elif direction == "older":
+            query = query.order_by(Message.created_at.desc(), Message.id.desc())
+            rows = _fetch_newest_first(
+                db=db,
+                conversation_id=conversation_id,
+                user_id=user_id,
+                query=query,
+                upper=upper,
+                offset=0,
+                limit=page_size + 1
+            )
+        else:
+            # Already bounded from below by the cursor, so only recent partitions are scanned
+            query = query.order_by(Message.created_at.asc(), Message.id.asc())
+            rows = _authorized_page(
+                db=db,
+                conversation_id=conversation_id,
+                user_id=user_id,
+                query=query.limit(limit=page_size + 1),
+                newest_first=False
+            )
+
+        if rows is None:
+            raise HTTPException(
+                status_code=401,
+                detail="Not authorized"
+            )
+
+    has_more = len(rows) > page_size
+    messages = rows[:page_size]
+    if direction == "newer":
+        messages.reverse()
+
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    if messages:
+        if direction == "older":
+            next_cursor = encode_message_cursor(message=messages[-1], direction="older") if has_more else None
+            prev_cursor = encode_message_cursor(message=messages[0], direction="newer")
+        else:
+            next_cursor = encode_message_cursor(message=messages[-1], direction="older")
+            prev_cursor = encode_message_cursor(message=messages[0], direction="newer") if has_more else None
+
+    return MessagePage(
+        messages=messages,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor
     )
-    
-    if not in_conversation:
+
+def get_messages_by_seq_service(
+    conversation_id: UUID,
+    user_id: UUID,
+    from_seq: int,
+    to_seq: Optional[int] = None,
+    db: Optional[Session] = None
+) -> List[Message]:
+    """Return the messages numbered ``from_seq`` to ``to_seq`` (inclusive), in ``seq`` order.
+
+    Sequence numbers are consecutive per conversation, so a number missing
+    from the result belongs to a deleted message. Together with the
+    conversation's ``last_seq`` this tells a client exactly what it is
+    missing without paging through history. Each range is one scan of
+    ``ix_messages_conversation_seq``.
+
+    Args:
+        conversation_id: UUID of the conversation to fetch messages from.
+        user_id: UUID of the requesting user (used for authorization).
+        from_seq: First sequence number to return.
+        to_seq: Last sequence number to return; defaults to
+            ``from_seq + MAX_PAGE_SIZE - 1``.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
+
+    Returns:
+        The messages in the range, ordered by ``seq``.
+
+    Raises:
+        fastapi.HTTPException: If the range is empty or longer than
+            ``MAX_PAGE_SIZE`` (HTTP 400), or the requesting user is not a
+            participant (HTTP 401).
+    """
+    last = to_seq if to_seq is not None else from_seq + MAX_PAGE_SIZE - 1
+    if last < from_seq or last - from_seq >= MAX_PAGE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A seq range must hold between 1 and {MAX_PAGE_SIZE} messages."
+        )
+
+    with session_scope(db) as db:
+        query = db.query(Message).filter(
+            Message.conversation_id == conversation_id,
+            Message.seq.between(from_seq, last),
+        ).order_by(Message.seq.asc())
+        rows = _authorized_page(
+            db=db,
+            conversation_id=conversation_id,
+            user_id=user_id,
+            query=query,
+            by_seq=True
+        )
+        if rows is None:
+            raise HTTPException(
+                status_code=401,
+                detail="Not authorized"
+            )
+        return rows
+
+def get_message_window_service(
+    conversation_id: UUID,
+    user_id: UUID,
+    around: Optional[UUID] = None,
+    around_at: Optional[datetime] = None,
+    limit: Optional[int] = 25,
+    db: Optional[Session] = None
+) -> MessagePage:
+    """Return the history surrounding a message or a point in time.
+
+    Serves jump-to-message (a search hit, a reply, a pinned message) and
+    jump-to-date in one round trip instead of a lookup followed by two
+    pages. The older half (including the anchor) and the newer half are two
+    keyset range scans on ``ix_messages_conversation_created`` combined with
+    ``UNION ALL`` into a single authorized statement.
+
+    Args:
+        conversation_id: UUID of the conversation to fetch messages from.
+        user_id: UUID of the requesting user (used for authorization).
+        around: Message id to center the window on; the message itself is
+            part of the window.
+        around_at: Point in time to center the window on when ``around``
+            is not given.
+        limit: Number of messages on each side of the anchor, capped at
+            half of ``MAX_PAGE_SIZE``.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
+
+    Returns:
+        A ``MessagePage`` with the messages (newest first).
+        ``next_cursor`` continues with older and ``prev_cursor`` with newer
+        messages, like the cursors of :pyfunc:`get_messages_page_service`;
+        each is ``None`` once that end of the history is in the window.
+
+    Raises:
+        fastapi.HTTPException: If neither anchor is given (HTTP 400), the
+            requesting user is not a participant (HTTP 401) or ``around``
+            is not a message of the conversation (HTTP 404).
+    """
+    if around is None and around_at is None:
         raise HTTPException(
-            status_code=401,
-            detail="Not authorized"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Must provide around or around_at"
         )
-    
-    query = db.query(Message).filter(Message.conversation_id == conversation_id)
+    side = min(limit or 25, MAX_PAGE_SIZE // 2)
+    # The anchor message is returned on top of the older half
+    older_size = side + 1 if around is not None else side
+
+    with session_scope(db) as db:
+        query = db.query(Message).filter(Message.conversation_id == conversation_id)
+        position = tuple_(Message.created_at, Message.id)
+        if around is not None:
+            anchor = _message_position(conversation_id=conversation_id, message_id=around)
+        else:
+            around_at = _as_utc(value=around_at)
+            # Sorts after every message created at that instant
+            anchor = tuple_(around_at, UUID(int=(1 << 128) - 1))
+
+        # One extra row on each side tells whether the history goes on
+        older = (
+            query.filter(position <= anchor)
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .limit(limit=older_size + 1)
+            .subquery()
+        )
+        newer = (
+            query.filter(position > anchor)
+            .order_by(Message.created_at.asc(), Message.id.asc())
+            .limit(limit=side + 1)
+            .subquery()
+        )
+        window = aliased(Message, union_all(select(older), select(newer)).subquery())
+        rows = _authorized_page(
+            db=db,
+            conversation_id=conversation_id,
+            user_id=user_id,
+            query=db.query(window).order_by(window.created_at.desc(), window.id.desc())
+        )
+        if rows is None:
+            raise HTTPException(
+                status_code=401,
+                detail="Not authorized"
+            )
 
-    if before:
-        query = query.filter(Message.created_at < before)
+    if around is not None and not any(message.id == around for message in rows):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Message not found"
+        )
 
-    messages = query.order_by(Message.created_at.desc()).offset(offset=offset).limit(limit=limit).all()
-    return messages
+    # rows are newest first: the newer half, then the anchor and the older half
+    if around is not None:
+        split = next(i for i, message in enumerate(rows) if message.id == around)
+    else:
+        split = sum(1 for message in rows if _as_utc(value=message.created_at) > around_at)
+    newer_rows, older_rows = rows[:split], rows[split:]
+    messages = newer_rows[-side:] + older_rows[:older_size]
+
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    if messages:
+        if len(older_rows) > older_size:
+            next_cursor = encode_message_cursor(message=messages[-1], direction="older")
+        if len(newer_rows) > side:
+            prev_cursor = encode_message_cursor(message=messages[0], direction="newer")
+
+    return MessagePage(
+        messages=messages,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor
+    )
 
 def get_single_message_service(
     message_id: UUID,
-    user_id: UUID
+    user_id: UUID,
+    db: Optional[Session] = None
 ) -> Message:
     """Return a single message if the requesting user belongs to its conversation.
 
     Args:
         message_id: UUID of the message to retrieve.
         user_id: UUID of the requesting user (authorization check).
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
 
     Returns:
         The ``Message`` ORM instance.
@@ -73,38 +574,44 @@ def get_single_message_service(
         fastapi.HTTPException: If the user is not authorized to view the
             message (HTTP 401) or the message cannot be found (HTTP 404).
     """
-    db = SessionLocal()
-    
-    conversation_id = get_conversation_by_message(
-        message_id=message_id,
-        db=db
-    )
-    
-    in_conversation = check_user_in_conversation(
-        conversation_id=conversation_id,
-        user_id=user_id,
-        db=db
-    )
-    
-    if not in_conversation:
-        raise HTTPException(
-            status_code=401,
-            detail="Not authorized"
+    with session_scope(db) as db:
+        generation = membership_cache.generation
+        # One lookup: no row means no message, no participant means no access
+        row = (
+            db.query(Message, Participant.role)
+            .outerjoin(Participant, and_(
+                Participant.conversation_id == Message.conversation_id,
+                Participant.user_id == user_id
+            ))
+            .filter(Message.id == message_id)
+            .first()
         )
-    
-    message = db.query(Message).filter(Message.id == message_id).first()
 
-    if not message:
-        raise HTTPException(
-            status_code=404,
-            detail="message not found"
+        if not row:
+            raise HTTPException(
+                status_code=404,
+                detail="message not found"
+            )
+
+        message, role = row
+        membership_cache.set(
+            conversation_id=message.conversation_id,
+            user_id=user_id,
+            role=role,
+            generation=generation
         )
-    return message
+        if role is None:
+            raise HTTPException(
+                status_code=401,
+                detail="Not authorized"
+            )
+        return message
 
 def send_message_service(
     sender_id: UUID,
     conversation_id: UUID,
-    content: str
+    content: str,
+    db: Optional[Session] = None
 ) -> Message:
     """Persist a new message to the specified conversation.
 
@@ -112,34 +619,169 @@ def send_message_service(
         sender_id: UUID of the user sending the message.
         conversation_id: UUID of the conversation to append the message to.
         content: Message text content.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
 
     Returns:
         The newly created ``Message`` ORM instance.
+
+    Raises:
+        fastapi.HTTPException: If the conversation does not exist or was
+            deleted (HTTP 404).
     """
-    db = SessionLocal()
+    message_id = uuid7()
+    with session_scope(db) as db:
+        # Sequence number, conversation summary, insert and participants in one round trip
+        new_message = db.scalars(
+            insert_message_statement(
+                message_id=message_id,
+                conversation_id=conversation_id,
+                sender_id=sender_id,
+                content=content,
+                created_at=uuid7_time(value=message_id) or datetime.now(tz=timezone.utc)
+            )
+        ).one_or_none()
+
+        if new_message is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="conversation not found"
+            )
+        record_recent_message(db=db, message=new_message)
+        commit_returning(db, new_message)
+
+        return new_message
+
+def send_messages_bulk_service(
+    sender_id: UUID,
+    messages: list[BulkMessageItem],
+    db: Optional[Session] = None
+) -> list[BulkMessageResult]:
+    """Persist many messages from one sender in a single transaction.
+
+    Membership is checked with one query for all target conversations and
+    the accepted messages are written with multi-row ``INSERT ... RETURNING``
+    statements of ``BULK_CHUNK_SIZE`` rows. Conversation summaries and
+    unread counters are updated once per conversation rather than once per
+    message. Messages keep the order they were submitted in: their UUIDv7
+    ids are generated in that order and ``created_at`` is the time in the
+    id, so ``(created_at, id)`` increases from one message to the next, and
+    each conversation's ``seq`` range is reserved with one update and handed
+    out in the same order.
 
-    new_message = Message(
-        conversation_id=conversation_id,
-        sender_id=sender_id,
-        content=content
-    )
+    Args:
+        sender_id: UUID of the user sending the messages.
+        messages: Items with the target ``conversation_id`` and ``content``.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
 
-    db.add(instance=new_message)
-    db.commit()
-    db.refresh(instance=new_message)
-    db.close()
+    Returns:
+        One ``BulkMessageResult`` per submitted item, in submission order.
+        Items for conversations the sender isn't part of and empty messages
+        are rejected without failing the rest of the batch.
+
+    Raises:
+        fastapi.HTTPException: If more than ``BULK_MAX_MESSAGES`` messages
+            are submitted (HTTP 413).
+    """
+    if len(messages) > BULK_MAX_MESSAGES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {BULK_MAX_MESSAGES} messages can be sent per request."
+        )
 
-    return new_message
+    with session_scope(db) as db:
+        conversation_ids = {item["conversation_id"] for item in messages}
+        member_of = set(db.scalars(
+            select(Participant.conversation_id)
+            .join(Conversation, Conversation.id == Participant.conversation_id)
+            .where(
+                Participant.user_id == sender_id,
+                Participant.conversation_id.in_(conversation_ids),
+                Conversation.deleted_at.is_(None),
+            )
+        ))
+
+        results: list[BulkMessageResult] = []
+        rows: list[dict[str, object]] = []
+        # conversation_id -> (id, content, created_at) of its newest message in the batch, and message counts
+        newest: dict[UUID, tuple[UUID, str, datetime]] = {}
+        counts: Counter[UUID] = Counter()
+        for index, item in enumerate(messages):
+            error: Optional[str] = None
+            if item["conversation_id"] not in member_of:
+                error = "User is not part of this conversation."
+            elif not item["content"].strip():
+                error = "Message content is empty."
+
+            message_id = None if error else uuid7()
+            results.append(BulkMessageResult(
+                index=index,
+                conversation_id=item["conversation_id"],
+                status="rejected" if error else "created",
+                id=message_id,
+                created_at=None,
+                seq=None,
+                error=error,
+            ))
+            if message_id is None:
+                continue
+            created_at = uuid7_time(value=message_id)
+            rows.append({
+                "id": message_id,
+                "conversation_id": item["conversation_id"],
+                "sender_id": sender_id,
+                "content": item["content"],
+                "created_at": created_at,
+            })
+            newest[item["conversation_id"]] = (message_id, item["content"], created_at)
+            counts[item["conversation_id"]] += 1
+
+        next_seq = reserve_message_seqs(db=db, counts=counts) if counts else {}
+        for row in rows:
+            row["seq"] = next_seq[row["conversation_id"]]
+            next_seq[row["conversation_id"]] += 1
+
+        inserted_by_id: dict[UUID, tuple[datetime, int]] = {}
+        for start in range(0, len(rows), BULK_CHUNK_SIZE):
+            inserted = db.execute(
+                insert(Message)
+                .values(rows[start:start + BULK_CHUNK_SIZE])
+                .returning(Message.id, Message.created_at, Message.seq)
+            )
+            inserted_by_id.update({row.id: (row.created_at, row.seq) for row in inserted})
+        log_changes(db=db, kind="message_created", changes=[(row["conversation_id"], row["id"]) for row in rows])
+
+        for conversation_id, (message_id, content, created_at) in newest.items():
+            record_new_message(
+                db=db,
+                conversation_id=conversation_id,
+                message_id=message_id,
+                sender_id=sender_id,
+                content=content,
+                created_at=created_at,
+                message_count=counts[conversation_id]
+            )
+        invalidate_recent_messages(db=db, conversation_ids=counts.keys())
+        db.commit()
+
+    for result in results:
+        if result["id"] is not None:
+            result["created_at"], result["seq"] = inserted_by_id[result["id"]]
+    return results
 
 def edit_message_service(
     message_id: UUID,
-    new_content: str
+    new_content: str,
+    db: Optional[Session] = None
 ) -> Message:
     """Update the content of an existing message.
 
     Args:
         message_id: UUID of the message to update.
         new_content: New message content to set.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
 
     Returns:
         The updated ``Message`` ORM instance.
@@ -147,69 +789,99 @@ def edit_message_service(
     Raises:
         fastapi.HTTPException: If the message does not exist (HTTP 404).
     """
-    db = SessionLocal()
-
-    message = db.query(Message).filter(Message.id == message_id).first()
-
-    if not message:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="message not found"
-        )
-    
-    message.content = new_content
-
-    db.commit()
-    db.refresh(message)
-    db.close()
-
-    return message
+    with session_scope(db) as db:
+        # The update, the preview refresh and reading the row back are one statement
+        message = db.scalars(
+            edit_message_statement(message_id=message_id, content=new_content)
+        ).one_or_none()
+
+        if not message:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="message not found"
+            )
+        record_recent_message(db=db, message=message)
+        commit_returning(db, message)
+
+        return message
 
 def delete_message_service(
     message_id: UUID,
-    user_id: UUID
+    user_id: UUID,
+    db: Optional[Session] = None
 ) -> None:
     """Delete a message if the requesting user has sufficient privileges.
 
-    The function checks the user's role in the conversation that contains the
-    message. Only users with an admin role may delete messages.
+    Only users with an admin role in the message's conversation may delete
+    messages. The lookup, the role check and the ``DELETE`` run as one
+    statement.
 
     Args:
         message_id: UUID of the message to delete.
         user_id: UUID of the requesting user.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
 
     Raises:
-        fastapi.HTTPException: If the user is not a participant
-            (HTTP 403) or is not an admin (HTTP 403).
+        fastapi.HTTPException: If the message does not exist (HTTP 404),
+            the user is not a participant (HTTP 403) or is not an admin
+            (HTTP 403).
     """
-    db = SessionLocal()
-
-    conversation_id = get_conversation_by_message(
-        message_id=message_id,
-        db=db
-    )
-
-    user_role = get_user_role(
-        conversation_id=conversation_id,
-        user_id=user_id,
-        db=db
-    )
-    
-    if not user_role:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="User is not part of this conversation."
+    with session_scope(db) as db:
+        # Look up the message with the user's role and delete it only when
+        # the role is admin, all in one statement
+        target = (
+            select(Message.id, Message.created_at, Message.conversation_id, Message.sender_id, Participant.role)
+            .outerjoin(Participant, and_(
+                Participant.conversation_id == Message.conversation_id,
+                Participant.user_id == user_id
+            ))
+            .where(Message.id == message_id)
+            .cte(name="target")
         )
-
-    if user_role != "admin":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only admins can edit conversations."
+        deleted = (
+            delete(Message)
+            .where(
+                Message.id == target.c.id,
+                Message.created_at == target.c.created_at,
+                target.c.role == "admin",
+            )
+            .returning(Message.id, Message.conversation_id)
+            .cte(name="deleted")
+        )
+        logged = change_log_insert(
+            kind="message_deleted", conversation_id=deleted.c.conversation_id, entity_id=deleted.c.id, source=deleted
+        ).cte(name="logged")
+        row = db.execute(
+            select(target, select(func.count()).select_from(deleted).scalar_subquery()).add_cte(logged)
+        ).first()
+
+        if not row:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="message not found"
+            )
+
+        if not row.role:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="User is not part of this conversation."
+            )
+
+        if row.role != "admin":
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Only admins can edit conversations."
+            )
+
+        record_deleted_message(
+            db=db,
+            conversation_id=row.conversation_id,
+            message_id=message_id,
+            created_at=row.created_at,
+            sender_id=row.sender_id
         )
-    
-    message = db.query(Message).filter(Message.id == message_id).first()
-    
-    db.delete(instance=message)
-    db.commit()
+        forget_recent_message(db=db, conversation_id=row.conversation_id, message_id=message_id)
+        db.commit()
 
-    return
+        return
@@ -0,0 +1,117 @@
+"""Cross-worker cache invalidation over Postgres ``LISTEN``/``NOTIFY``.
+
+Services keeping per-process caches :pyfunc:`subscribe` a handler to a
+channel at import time. A change is published with :pyfunc:`notify` from
+the transaction that makes it, so other workers only hear about committed
+changes, and the local cache is updated through :pyfunc:`call_after_commit`.
+:pyfunc:`run_notification_listener` runs in every worker and dispatches
+incoming notifications; notifications sent while a worker wasn't
+listening are lost, so subscribers reset their caches on every (re)connect.
+"""
+from sqlalchemy import event, text
+from sqlalchemy.engine import create_engine
+from sqlalchemy.orm.session import Session
+from sqlalchemy.pool import NullPool
+from typing import Any, Callable, Optional
+import asyncio
+import logging
+
+from ..config import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+# Postgres rejects payloads of 8000 bytes or more
+MAX_PAYLOAD_BYTES = 7999
+# Session.info key holding callbacks to run once the transaction commits
+_AFTER_COMMIT_KEY = "after_commit_callbacks"
+
+# channel -> (handler for each payload, reset called on every (re)connect)
+_subscriptions: dict[str, tuple[Callable[[str], None], Optional[Callable[[], None]]]] = {}
+
+# Listening connections are held for their whole lifetime, so they don't come from the pool
+_listen_engine = create_engine(url=DATABASE_URL, poolclass=NullPool)
+
+def subscribe(channel: str, handler: Callable[[str], None], reset: Optional[Callable[[], None]] = None) -> None:
+    """Call ``handler`` with the payload of every notification on ``channel``.
+
+    ``reset`` is called whenever the listener (re)connects, since anything
+    may have changed while nobody was listening.
+    """
+    _subscriptions[channel] = (handler, reset)
+
+def notify(db: Session, channel: str, payload: str) -> None:
+    """Queue a notification that is delivered when ``db``'s transaction commits.
+
+    Does nothing on databases other than Postgres.
+    """
+    if len(payload.encode()) > MAX_PAYLOAD_BYTES:
+        raise ValueError(f"Notification payload for {channel} is too large")
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": channel, "payload": payload})
+
+def call_after_commit(db: Session, callback: Callable[[], None]) -> None:
+    """Run ``callback`` once ``db``'s current transaction commits; drop it on rollback."""
+    db.info.setdefault(_AFTER_COMMIT_KEY, []).append(callback)
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit_callbacks(session: Session) -> None:
+    for callback in session.info.pop(_AFTER_COMMIT_KEY, []):
+        try:
+            callback()
+        except Exception:
+            logger.exception("After-commit callback failed")
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_commit_callbacks(session: Session) -> None:
+    session.info.pop(_AFTER_COMMIT_KEY, None)
+
+def dispatch(channel: str, payload: str) -> None:
+    subscription = _subscriptions.get(channel)
+    if subscription is None:
+        return
+    try:
+        subscription[0](payload)
+    except Exception:
+        logger.exception("Handling a notification on %s failed", channel)
+
+def _open_listener() -> Any:
+    connection = _listen_engine.raw_connection()
+    connection.dbapi_connection.autocommit = True
+    with connection.dbapi_connection.cursor() as cursor:
+        for channel in _subscriptions:
+            cursor.execute(f"LISTEN {channel}")
+    return connection
+
+async def run_notification_listener(reconnect_delay: float = 5.0) -> None:
+    """Background task dispatching notifications to the subscribed handlers."""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            connection = await asyncio.to_thread(_open_listener)
+        except Exception:
+            logger.exception("Opening the notification listener failed")
+            await asyncio.sleep(reconnect_delay)
+            continue
+
+        for _, reset in _subscriptions.values():
+            if reset is not None:
+                reset()
+        dbapi_connection = connection.dbapi_connection
+        readable = asyncio.Event()
+        fd = dbapi_connection.fileno()
+        loop.add_reader(fd, readable.set)
+        try:
+            while True:
+                await readable.wait()
+                readable.clear()
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    received = dbapi_connection.notifies.pop(0)
+                    dispatch(channel=received.channel, payload=received.payload)
+        except Exception:
+            logger.exception("Notification listener failed; reconnecting")
+        finally:
+            loop.remove_reader(fd)
+            connection.close()
+        await asyncio.sleep(reconnect_delay)
@@ -1,8 +1,115 @@
-from ..models.conversations import Participant
-from sqlalchemy import and_
+"""Participant lookups and the per-process membership cache.
+
+Membership almost never changes compared to how often it is checked, so
+roles are cached per process as ``(conversation_id, user_id) -> role``,
+including ``None`` for users that are not participants. Code that adds or
+removes participants calls :pyfunc:`invalidate_memberships` in its
+transaction. The cached entries are dropped once the transaction commits,
+and a notification tells the other workers to drop theirs (see
+``notifications_service``). Entries also expire after a TTL, so a
+lost notification can't keep a stale role around for long.
+"""
+from collections import OrderedDict
+from sqlalchemy import select
 from sqlalchemy.orm.session import Session
+from typing import Iterable, Optional
 from uuid import UUID
-from typing import Optional
+import json
+import logging
+import threading
+import time
+
+from ..config import (
+    MEMBERSHIP_CACHE_NEGATIVE_TTL_SECONDS,
+    MEMBERSHIP_CACHE_SIZE,
+    MEMBERSHIP_CACHE_TTL_SECONDS,
+)
+from ..models.conversations import Participant
+from .notifications_service import call_after_commit, notify, subscribe
+
+logger = logging.getLogger(__name__)
+
+MEMBERSHIP_CHANNEL = "membership_changed"
+# Above this many users a notification invalidates the whole conversation,
+# keeping the payload well below Postgres' 8000 byte limit
+MAX_NOTIFIED_USERS = 100
+
+class MembershipCache:
+    """Bounded LRU cache of conversation roles with a TTL.
+
+    ``None`` is cached for users that are not participants. Those entries
+    get the shorter ``negative_ttl`` so a user who was just added isn't
+    refused for long when a lagging replica answered the lookup.
+    """
+    def __init__(self, max_size: int, ttl: float, negative_ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[tuple[UUID, UUID], tuple[Optional[str], float]] = OrderedDict()
+        self.by_conversation: dict[UUID, set[UUID]] = {}
+        # Bumped on every invalidation; a lookup that raced one isn't stored
+        self.generation = 0
+
+    def get(self, conversation_id: UUID, user_id: UUID) -> tuple[bool, Optional[str]]:
+        """Return ``(hit, role)``; ``role`` is ``None`` for cached non-members."""
+        key = (conversation_id, user_id)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False, None
+            role, expires_at = entry
+            if time.monotonic() >= expires_at:
+                self._remove(key=key)
+                return False, None
+            self.entries.move_to_end(key=key)
+            return True, role
+
+    def set(self, conversation_id: UUID, user_id: UUID, role: Optional[str], generation: int) -> None:
+        """Cache ``role`` unless an invalidation happened since ``generation`` was read."""
+        key = (conversation_id, user_id)
+        ttl = self.ttl if role is not None else self.negative_ttl
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.entries[key] = (role, time.monotonic() + ttl)
+            self.entries.move_to_end(key=key)
+            self.by_conversation.setdefault(conversation_id, set()).add(user_id)
+            while len(self.entries) > self.max_size:
+                oldest, _ = self.entries.popitem(last=False)
+                self._unindex(key=oldest)
+
+    def invalidate(self, conversation_id: UUID, user_ids: Optional[Iterable[UUID]] = None) -> None:
+        """Drop the given users' entries, or every entry of the conversation."""
+        with self.lock:
+            self.generation += 1
+            cached = self.by_conversation.get(conversation_id, set())
+            targets = list(cached) if user_ids is None else [u for u in user_ids if u in cached]
+            for user_id in targets:
+                self._remove(key=(conversation_id, user_id))
+
+    def clear(self) -> None:
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+            self.by_conversation.clear()
+
+    def _remove(self, key: tuple[UUID, UUID]) -> None:
+        self.entries.pop(key, None)
+        self._unindex(key=key)
+
+    def _unindex(self, key: tuple[UUID, UUID]) -> None:
+        users = self.by_conversation.get(key[0])
+        if users is not None:
+            users.discard(key[1])
+            if not users:
+                del self.by_conversation[key[0]]
+
+membership_cache = MembershipCache(
+    max_size=MEMBERSHIP_CACHE_SIZE,
+    ttl=MEMBERSHIP_CACHE_TTL_SECONDS,
+    negative_ttl=MEMBERSHIP_CACHE_NEGATIVE_TTL_SECONDS,
+)
 
 def get_user_role(
     conversation_id: UUID,
@@ -11,6 +118,9 @@ def get_user_role(
 ) -> Optional[str]:
     """Return the role of a user within a conversation, if any.
 
+    Roles are served from ``membership_cache``; only a miss queries the
+    database, and only for the role column.
+
     Args:
         conversation_id: UUID of the conversation to query.
         user_id: UUID of the user whose role is requested.
@@ -20,14 +130,20 @@ def get_user_role(
         The participant role as a string (for example "admin" or "member"),
         or ``None`` if the user is not a participant.
     """
-    participant: Participant = db.query(Participant).filter(and_(
-        Participant.conversation_id == conversation_id,
-        Participant.user_id == user_id)
-    ).first()
+    hit, role = membership_cache.get(conversation_id=conversation_id, user_id=user_id)
+    if hit:
+        return role
 
-    if participant:
-        return str(object=participant.role)
-    return None
+    generation = membership_cache.generation
+    role = db.scalar(
+        select(Participant.role).where(
+            Participant.conversation_id == conversation_id,
+            Participant.user_id == user_id
+        )
+    )
+    role = str(object=role) if role is not None else None
+    membership_cache.set(conversation_id=conversation_id, user_id=user_id, role=role, generation=generation)
+    return role
 
 def check_user_in_conversation(
     conversation_id: UUID,
@@ -44,12 +160,41 @@ def check_user_in_conversation(
     Returns:
         True if the user is a participant, otherwise False.
     """
-    participant: Participant = db.query(Participant).filter(and_(
-            Participant.conversation_id == conversation_id,
-            Participant.user_id == user_id
-        )
-    ).first()
-    
-    if participant:
-        return True
-    return False
\ No newline at end of file
+    return get_user_role(conversation_id=conversation_id, user_id=user_id, db=db) is not None
+
+def invalidate_memberships(
+    db: Session,
+    conversation_id: UUID,
+    user_ids: Optional[Iterable[UUID]] = None
+) -> None:
+    """Invalidate cached roles affected by the current transaction.
+
+    Call this from the transaction that adds, removes or changes
+    participants. The local cache is invalidated when ``db`` commits, and
+    the other workers are notified only if it commits.
+
+    Args:
+        db: Session whose transaction changes the participants.
+        conversation_id: UUID of the affected conversation.
+        user_ids: Affected users; omit to invalidate every participant of
+            the conversation.
+    """
+    users = list(user_ids) if user_ids is not None else None
+    call_after_commit(db=db, callback=lambda: membership_cache.invalidate(conversation_id=conversation_id, user_ids=users))
+    notify(db=db, channel=MEMBERSHIP_CHANNEL, payload=json.dumps({
+        "conversation_id": str(conversation_id),
+        "user_ids": [str(u) for u in users] if users is not None and len(users) <= MAX_NOTIFIED_USERS else None,
+    }))
+
+def apply_membership_notification(payload: str) -> None:
+    """Invalidate the cache entries named by a ``membership_changed`` payload."""
+    try:
+        data = json.loads(payload)
+        conversation_id = UUID(data["conversation_id"])
+        user_ids = [UUID(u) for u in data["user_ids"]] if data.get("user_ids") is not None else None
+    except (ValueError, KeyError, TypeError):
+        logger.warning("Ignoring malformed membership notification: %r", payload)
+        return
+    membership_cache.invalidate(conversation_id=conversation_id, user_ids=user_ids)
+
+subscribe(channel=MEMBERSHIP_CHANNEL, handler=apply_membership_notification, reset=membership_cache.clear)
@@ -0,0 +1,244 @@
+"""Monthly range partitions of the ``messages`` table.
+
+``messages`` is partitioned on ``created_at`` with one partition per calendar
+month (UTC) named ``messages_pYYYY_MM``, plus ``messages_default`` catching
+rows outside every range. Maintenance keeps partitions a few months ahead of
+time and moves old partitions to an archive tablespace, for example one on a
+compressed volume. Partitions are moved while attached, so old history stays
+queryable through ``messages`` throughout; history queries bound
+``created_at`` so the planner prunes them (see ``messages_service``).
+
+All functions take a connection in autocommit mode; statements that have
+to be atomic are wrapped in explicit transactions.
+"""
+from datetime import date, datetime, timezone
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+import asyncio
+import logging
+import re
+
+from ..config import (
+    MESSAGE_ARCHIVE_AFTER_MONTHS,
+    MESSAGE_ARCHIVE_TABLESPACE,
+    MESSAGE_PARTITION_MONTHS_AHEAD,
+    PARTITION_MAINTENANCE_INTERVAL_SECONDS,
+)
+from ..database import engine
+from ..schema.internal.partitions import PartitionObject
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "messages"
+DEFAULT_PARTITION = "messages_default"
+# Arbitrary constant used as the advisory lock key so only one worker runs maintenance at a time
+MAINTENANCE_LOCK_KEY = 482_611_033
+# Don't queue behind long running queries when locking the parent table or a partition
+LOCK_TIMEOUT = "5s"
+
+_BOUND_PATTERN = re.compile(pattern=r"FROM \((.+)\) TO \((.+)\)")
+
+def month_start(value: date) -> date:
+    return value.replace(day=1)
+
+def add_months(value: date, months: int) -> date:
+    month_index = value.year * 12 + value.month - 1 + months
+    return date(year=month_index // 12, month=month_index % 12 + 1, day=1)
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_p{month:%Y_%m}"
+
+def _timestamp_literal(month: date) -> str:
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+def _parse_bound(value: str) -> Optional[datetime]:
+    if value in ("MINVALUE", "MAXVALUE"):
+        return None
+    literal = value.strip("'")
+    # Postgres prints whole-hour offsets as "+00"; older Pythons only parse "+00:00"
+    if re.search(pattern=r"[+-]\d\d$", string=literal):
+        literal += ":00"
+    return datetime.fromisoformat(literal)
+
+def is_partitioned(conn: Connection) -> bool:
+    """Return whether ``messages`` is a partitioned table."""
+    row = conn.execute(text("""
+        SELECT 1 FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = :table AND c.relnamespace = current_schema()::regnamespace
+    """), {"table": PARENT_TABLE}).first()
+    return row is not None
+
+def list_partitions(conn: Connection) -> list[PartitionObject]:
+    """Return the attached partitions of ``messages``."""
+    rows = conn.execute(text("""
+        SELECT c.relname AS name, pg_get_expr(c.relpartbound, c.oid) AS bound, t.spcname AS tablespace
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        LEFT JOIN pg_tablespace t ON t.oid = c.reltablespace
+        WHERE p.relname = :table AND p.relnamespace = current_schema()::regnamespace
+        ORDER BY c.relname
+    """), {"table": PARENT_TABLE}).all()
+
+    partitions: list[PartitionObject] = []
+    for row in rows:
+        match = _BOUND_PATTERN.search(string=row.bound)
+        partitions.append(PartitionObject(
+            name=row.name,
+            bound=row.bound,
+            lower=_parse_bound(value=match.group(1)) if match else None,
+            upper=_parse_bound(value=match.group(2)) if match else None,
+            is_default=row.bound == "DEFAULT",
+            tablespace=row.tablespace,
+        ))
+    return partitions
+
+def _overlaps(partition: PartitionObject, lower: datetime, upper: datetime) -> bool:
+    if partition["is_default"]:
+        return False
+    starts_before_upper = partition["lower"] is None or partition["lower"] < upper
+    ends_after_lower = partition["upper"] is None or partition["upper"] > lower
+    return starts_before_upper and ends_after_lower
+
+def _create_month_partition(conn: Connection, month: date, has_default: bool) -> None:
+    name = partition_name(month=month)
+    lower, upper = _timestamp_literal(month=month), _timestamp_literal(month=add_months(value=month, months=1))
+    create_sql = f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT_TABLE} FOR VALUES FROM ({lower}) TO ({upper})"
+
+    stray = has_default and conn.execute(text(
+        f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= {lower} AND created_at < {upper} LIMIT 1"
+    )).first()
+    if not stray:
+        conn.execute(text(create_sql))
+        return
+
+    # Rows for this month already landed in the default partition; a new
+    # partition can't be created over them, so move them in one transaction.
+    conn.execute(text("BEGIN"))
+    try:
+        conn.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}"))
+        conn.execute(text(create_sql))
+        conn.execute(text(f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION}
+                WHERE created_at >= {lower} AND created_at < {upper}
+                RETURNING *
+            )
+            INSERT INTO {PARENT_TABLE} SELECT * FROM moved
+        """))
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+        conn.execute(text("COMMIT"))
+    except Exception:
+        conn.execute(text("ROLLBACK"))
+        raise
+
+def ensure_message_partitions(
+    conn: Connection,
+    months_ahead: int = MESSAGE_PARTITION_MONTHS_AHEAD,
+    today: Optional[date] = None
+) -> list[str]:
+    """Create the monthly partitions from the current month ``months_ahead`` months ahead.
+
+    Months already covered by an existing partition (such as the partition
+    holding the history from before partitioning) are skipped. The default
+    partition is created as well.
+
+    Returns:
+        Names of the partitions created.
+    """
+    if not is_partitioned(conn=conn):
+        return []
+
+    existing = list_partitions(conn=conn)
+    has_default = any(p["is_default"] for p in existing)
+    current = month_start(value=today or datetime.now(tz=timezone.utc).date())
+
+    created: list[str] = []
+    for offset in range(months_ahead + 1):
+        month = add_months(value=current, months=offset)
+        lower = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+        next_month = add_months(value=month, months=1)
+        upper = datetime(next_month.year, next_month.month, 1, tzinfo=timezone.utc)
+        if any(_overlaps(partition=p, lower=lower, upper=upper) for p in existing):
+            continue
+        _create_month_partition(conn=conn, month=month, has_default=has_default)
+        created.append(partition_name(month=month))
+
+    if not has_default:
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT"))
+        created.append(DEFAULT_PARTITION)
+    return created
+
+def archive_message_partitions(
+    conn: Connection,
+    tablespace: str = MESSAGE_ARCHIVE_TABLESPACE,
+    older_than_months: int = MESSAGE_ARCHIVE_AFTER_MONTHS,
+    today: Optional[date] = None
+) -> list[str]:
+    """Move partitions that ended more than ``older_than_months`` ago to ``tablespace``.
+
+    Each partition is moved in place, together with its indexes. Moving
+    holds an exclusive lock on the partition while its files are copied, so
+    queries reaching it wait instead of missing its rows; it is never
+    detached, so an interrupted move leaves it where it was.
+
+    Returns:
+        Names of the partitions archived. Nothing is archived when
+        ``tablespace`` is empty.
+    """
+    if not tablespace or not is_partitioned(conn=conn):
+        return []
+
+    current = month_start(value=today or datetime.now(tz=timezone.utc).date())
+    cutoff_month = add_months(value=current, months=-older_than_months)
+    cutoff = datetime(cutoff_month.year, cutoff_month.month, 1, tzinfo=timezone.utc)
+
+    archived: list[str] = []
+    for partition in list_partitions(conn=conn):
+        if partition["is_default"] or partition["tablespace"] == tablespace:
+            continue
+        if partition["upper"] is None or partition["upper"] > cutoff:
+            continue
+        _archive_partition(conn=conn, partition=partition, tablespace=tablespace)
+        archived.append(partition["name"])
+    return archived
+
+def _archive_partition(conn: Connection, partition: PartitionObject, tablespace: str) -> None:
+    name = partition["name"]
+    conn.execute(text(f"SET lock_timeout = '{LOCK_TIMEOUT}'"))
+    try:
+        conn.execute(text(f"ALTER TABLE {name} SET TABLESPACE {tablespace}"))
+        indexes = conn.execute(text("SELECT indexname FROM pg_indexes WHERE tablename = :name"), {"name": name}).scalars().all()
+        for index in indexes:
+            conn.execute(text(f"ALTER INDEX {index} SET TABLESPACE {tablespace}"))
+    finally:
+        conn.execute(text("RESET lock_timeout"))
+
+def run_partition_maintenance() -> dict[str, list[str]]:
+    """Create upcoming partitions and archive old ones, once across all workers."""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        locked = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY}).scalar()
+        if not locked:
+            return {"created": [], "archived": []}
+        try:
+            return {
+                "created": ensure_message_partitions(conn=conn),
+                "archived": archive_message_partitions(conn=conn),
+            }
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+
+async def run_partition_maintainer(interval: float = PARTITION_MAINTENANCE_INTERVAL_SECONDS) -> None:
+    """Background loop running :pyfunc:`run_partition_maintenance` every ``interval`` seconds."""
+    while True:
+        try:
+            result = await run_in_threadpool(run_partition_maintenance)
+            if result["created"] or result["archived"]:
+                logger.info("Partition maintenance: %s", result)
+        except Exception:
+            logger.exception("Partition maintenance failed")
+        await asyncio.sleep(interval)
@@ -0,0 +1,240 @@
+"""Background removal of deleted conversations and accounts.
+
+Deleting a conversation or an account only marks it (``deleted_at``) and
+takes away access, which is instant regardless of how much history there
+is. A row in ``purge_jobs`` then tells the purge worker what to remove. The
+worker deletes at most ``PURGE_BATCH_SIZE`` rows per transaction, so no
+statement holds locks for long or cascades through millions of rows, and
+records its progress with every batch: a job interrupted by a restart
+resumes at the phase it was in. Every worker runs :pyfunc:`run_purge_worker`;
+jobs are claimed with ``FOR UPDATE SKIP LOCKED`` so they never work on the
+same batch.
+
+Each kind of job runs through its phases in order; a phase is finished once
+a batch deletes fewer rows than the batch size. The target row itself goes
+last, when nothing large is left for ``ON DELETE CASCADE`` to remove.
+"""
+from datetime import datetime, timezone
+from fastapi import HTTPException, status
+from sqlalchemy import delete, select, tuple_, update
+from sqlalchemy.orm.session import Session
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+from uuid import UUID
+import asyncio
+import logging
+
+from ..config import ADMIN_USER_IDS, PURGE_BATCH_PAUSE_SECONDS, PURGE_BATCH_SIZE, PURGE_INTERVAL_SECONDS
+from ..database import session_scope
+from ..models.auth import User, Tokens
+from ..models.conversations import Conversation, Participant
+from ..models.messages import Message
+from ..models.purge_jobs import PurgeJob
+from ..schema.internal.purge import PurgeJobObject
+from .change_log_service import PRUNE_BATCH_SIZE, log_changes, prune_change_log
+from .participants_service import invalidate_memberships
+from .recent_messages_service import invalidate_recent_messages
+
+logger = logging.getLogger(__name__)
+
+# Phases of each kind of job, in the order they run
+PURGE_PHASES: dict[str, list[str]] = {
+    # participants are removed when the conversation is deleted
+    "conversation": ["messages", "conversation"],
+    # tokens are revoked when the account is deleted; the phase catches any issued since
+    "user": ["messages", "participants", "tokens", "user"],
+}
+DONE = "done"
+
+def _to_purge_job_object(job: PurgeJob) -> PurgeJobObject:
+    return PurgeJobObject(
+        id=job.id,
+        kind=job.kind,
+        target_id=job.target_id,
+        status=job.status,
+        phase=job.phase,
+        rows_deleted=job.rows_deleted,
+        last_error=job.last_error,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+        finished_at=job.finished_at,
+    )
+
+def enqueue_purge(db: Session, kind: str, target_id: UUID, requested_by: Optional[UUID] = None) -> PurgeJobObject:
+    """Queue the purge of a soft-deleted conversation or user.
+
+    Call this from the transaction that marks the target deleted, so the job
+    only exists if the deletion commits.
+
+    Args:
+        db: Session whose transaction deletes the target.
+        kind: ``"conversation"`` or ``"user"``.
+        target_id: UUID of the conversation or user.
+        requested_by: UUID of the user who asked for the deletion.
+
+    Returns:
+        The new job.
+    """
+    job = PurgeJob(kind=kind, target_id=target_id, requested_by=requested_by, status="pending", phase=PURGE_PHASES[kind][0])
+    db.add(instance=job)
+    db.flush()
+    db.refresh(instance=job)
+    return _to_purge_job_object(job=job)
+
+def _delete_batch(db: Session, kind: str, phase: str, target_id: UUID, batch_size: int) -> int:
+    """Delete up to ``batch_size`` rows of ``phase`` and return how many went."""
+    if phase == "messages":
+        owner = Message.conversation_id if kind == "conversation" else Message.sender_id
+        keys = select(Message.id, Message.created_at).where(owner == target_id).limit(batch_size)
+        deleted = db.execute(
+            delete(Message)
+            .where(tuple_(Message.id, Message.created_at).in_(keys))
+            .returning(Message.conversation_id, Message.id, Message.created_at, Message.sender_id),
+            execution_options={"synchronize_session": False},
+        ).all()
+        if kind == "user":
+            # The account's messages may be any conversation's latest or
+            # unread by its other members
+            from .conversations_service import record_deleted_messages  # conversations_service imports this module
+            record_deleted_messages(db=db, messages=[tuple(row) for row in deleted])
+            # Other members' clients drop them on their next sync
+            log_changes(db=db, kind="message_deleted", changes=[(row.conversation_id, row.id) for row in deleted])
+            invalidate_recent_messages(db=db, conversation_ids={row.conversation_id for row in deleted})
+        return len(deleted)
+
+    if phase == "participants":
+        ids = select(Participant.id).where(Participant.user_id == target_id).limit(batch_size)
+        conversation_ids = db.scalars(
+            delete(Participant).where(Participant.id.in_(ids)).returning(Participant.conversation_id),
+            execution_options={"synchronize_session": False},
+        ).all()
+        if conversation_ids:
+            # A user is in each conversation at most once
+            db.execute(
+                update(Conversation)
+                .where(Conversation.id.in_(conversation_ids))
+                .values(participant_count=Conversation.participant_count - 1),
+                execution_options={"synchronize_session": False},
+            )
+        log_changes(db=db, kind="participant_removed", changes=[(conversation_id, target_id) for conversation_id in conversation_ids])
+        for conversation_id in conversation_ids:
+            invalidate_memberships(db=db, conversation_id=conversation_id, user_ids=[target_id])
+        return len(conversation_ids)
+
+    if phase == "tokens":
+        ids = select(Tokens.id).where(Tokens.user_id == target_id).limit(batch_size)
+        result = db.execute(delete(Tokens).where(Tokens.id.in_(ids)), execution_options={"synchronize_session": False})
+        return result.rowcount
+
+    # The target row; what is left for its foreign keys to cascade to is small
+    model = Conversation if phase == "conversation" else User
+    result = db.execute(delete(model).where(model.id == target_id), execution_options={"synchronize_session": False})
+    return result.rowcount
+
+def run_purge_batch(batch_size: int = PURGE_BATCH_SIZE, db: Optional[Session] = None) -> Optional[PurgeJobObject]:
+    """Run one batch of the oldest unfinished purge job.
+
+    The batch and the job's progress are committed together. A failed
+    batch is rolled back and its error recorded on the job, which is then
+    retried after the other jobs.
+
+    Args:
+        batch_size: Maximum number of rows to delete.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
+
+    Returns:
+        The job's progress after the batch, or ``None`` if there was no job
+        to work on.
+    """
+    with session_scope(db) as db:
+        job = db.scalars(
+            select(PurgeJob)
+            .where(PurgeJob.status != DONE)
+            # A job that keeps failing doesn't hold up the others
+            .order_by(PurgeJob.last_error.isnot(None), PurgeJob.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).first()
+        if job is None:
+            return None
+
+        job_id = job.id
+        try:
+            deleted = _delete_batch(db=db, kind=job.kind, phase=job.phase, target_id=job.target_id, batch_size=batch_size)
+        except Exception as exc:
+            db.rollback()
+            db.execute(update(PurgeJob).where(PurgeJob.id == job_id).values(last_error=str(exc)[:1000]))
+            db.commit()
+            raise
+
+        job.rows_deleted += deleted
+        job.status = "running"
+        job.last_error = None
+        if deleted < batch_size:
+            phases = PURGE_PHASES[job.kind]
+            position = phases.index(job.phase) + 1
+            if position < len(phases):
+                job.phase = phases[position]
+            else:
+                job.status = DONE
+                job.finished_at = datetime.now(tz=timezone.utc)
+        db.commit()
+        db.refresh(instance=job)
+        return _to_purge_job_object(job=job)
+
+def get_purge_job(job_id: UUID, user_id: UUID, db: Optional[Session] = None) -> PurgeJobObject:
+    """Return the progress of a purge job.
+
+    Args:
+        job_id: UUID of the job.
+        user_id: UUID of the requesting user; only the user who requested
+            the deletion and administrators can see the job.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
+
+    Returns:
+        The job's current progress.
+
+    Raises:
+        fastapi.HTTPException: If the job doesn't exist or belongs to
+            someone else (HTTP 404).
+    """
+    with session_scope(db) as db:
+        job = db.get(PurgeJob, job_id)
+        if job is None or (job.requested_by != user_id and str(user_id) not in ADMIN_USER_IDS):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Purge job not found"
+            )
+        return _to_purge_job_object(job=job)
+
+async def run_purge_worker(
+    interval: float = PURGE_INTERVAL_SECONDS,
+    pause: float = PURGE_BATCH_PAUSE_SECONDS,
+) -> None:
+    """Background loop working through purge jobs batch by batch.
+
+    Sleeps ``pause`` seconds between batches so purging doesn't crowd out
+    request traffic, and ``interval`` seconds when there is nothing to do or
+    a batch failed. While there are no jobs it prunes expired changes from
+    the sync change log.
+    """
+    while True:
+        try:
+            job = await run_in_threadpool(run_purge_batch)
+        except Exception:
+            logger.exception("Purge batch failed")
+            job = None
+        if job is None:
+            # Nothing to purge: trim expired sync changes instead, a batch at a time
+            try:
+                pruned = await run_in_threadpool(prune_change_log)
+            except Exception:
+                logger.exception("Pruning the change log failed")
+                pruned = 0
+            await asyncio.sleep(pause if pruned == PRUNE_BATCH_SIZE else interval)
+            continue
+        if job["status"] == DONE:
+            logger.info("Purged %s %s (%d rows)", job["kind"], job["target_id"], job["rows_deleted"])
+        await asyncio.sleep(pause)
@@ -0,0 +1,222 @@
+from fastapi import HTTPException, status
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+from sqlalchemy.orm.session import Session
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+from uuid import UUID
+import asyncio
+import logging
+import threading
+
+from ..config import READ_RECEIPT_FLUSH_SECONDS
+from ..database import session_scope
+from ..models.conversations import Participant
+from ..schema.internal.conversations import UnreadCountObject
+from .participants_service import check_user_in_conversation
+
+logger = logging.getLogger(__name__)
+
+# Advances read cursors for many (conversation, user, message) triples in one
+# statement. When a user submitted several positions for the same
+# conversation, the newest message wins, and a cursor never moves backwards.
+# The unread count is recomputed only over the messages after the new
+# position, which is the (small) gap the user hasn't read yet. The rows are
+# locked by _LOCK_PARTICIPANTS_SQL first, so this statement's snapshot sees
+# every message whose send already incremented them (see advance_read_cursors).
+_ADVANCE_READ_CURSORS_SQL = text("""
+    WITH incoming AS (
+        SELECT * FROM unnest(:conversation_ids, :user_ids, :message_ids)
+            AS i(conversation_id, user_id, message_id)
+    ),
+    target AS (
+        SELECT DISTINCT ON (i.conversation_id, i.user_id)
+            i.conversation_id, i.user_id, m.id, m.created_at
+        FROM incoming i
+        JOIN messages m ON m.id = i.message_id AND m.conversation_id = i.conversation_id
+        ORDER BY i.conversation_id, i.user_id, m.created_at DESC, m.id DESC
+    )
+    UPDATE participants p SET
+        last_read_message_id = t.id,
+        last_read_at = t.created_at,
+        unread_count = (
+            SELECT count(*) FROM messages x
+            WHERE x.conversation_id = t.conversation_id
+              AND (x.created_at, x.id) > (t.created_at, t.id)
+              AND x.sender_id <> p.user_id
+        )
+    FROM target t
+    WHERE p.conversation_id = t.conversation_id
+      AND p.user_id = t.user_id
+      AND (p.last_read_at IS NULL OR (p.last_read_at, p.last_read_message_id) < (t.created_at, t.id))
+    RETURNING p.conversation_id, p.user_id, p.unread_count
+""").bindparams(
+    bindparam("conversation_ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+    bindparam("user_ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+    bindparam("message_ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+)
+
+# Locks the participant rows of the entries in a fixed order, so batches
+# with overlapping entries don't deadlock
+_LOCK_PARTICIPANTS_SQL = text("""
+    SELECT 1 FROM participants p
+    JOIN unnest(:conversation_ids, :user_ids) AS i(conversation_id, user_id)
+        ON p.conversation_id = i.conversation_id AND p.user_id = i.user_id
+    ORDER BY p.conversation_id, p.user_id
+    FOR UPDATE OF p
+""").bindparams(
+    bindparam("conversation_ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+    bindparam("user_ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+)
+
+class ReadReceiptBuffer:
+    """Coalesces read receipts in memory until the next batched flush.
+
+    Clients report read positions far more often than they need to be
+    persisted. Receipts for the same (conversation, user) pair are merged;
+    only a handful of candidate message ids are kept per pair and the flush
+    picks the newest of them.
+    """
+    MAX_CANDIDATES = 8
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.pending: dict[tuple[UUID, UUID], list[UUID]] = {}
+
+    def add(self, conversation_id: UUID, user_id: UUID, message_id: UUID) -> None:
+        with self.lock:
+            candidates = self.pending.setdefault((conversation_id, user_id), [])
+            if message_id in candidates:
+                return
+            candidates.append(message_id)
+            if len(candidates) > self.MAX_CANDIDATES:
+                # Clients report positions in increasing order; the oldest is the least useful
+                del candidates[0]
+
+    def drain(self) -> list[tuple[UUID, UUID, UUID]]:
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        return [
+            (conversation_id, user_id, message_id)
+            for (conversation_id, user_id), candidates in pending.items()
+            for message_id in candidates
+        ]
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.pending)
+
+read_receipt_buffer = ReadReceiptBuffer()
+
+def advance_read_cursors(db: Session, entries: list[tuple[UUID, UUID, UUID]]) -> dict[tuple[UUID, UUID], int]:
+    """Advance read cursors for ``(conversation_id, user_id, message_id)`` entries.
+
+    Args:
+        db: Active SQLAlchemy session; the caller commits.
+        entries: Read positions to apply. Unknown messages, non-members and
+            positions older than the stored cursor are ignored.
+
+    Returns:
+        The new unread count for each ``(conversation_id, user_id)`` that
+        moved.
+    """
+    if not entries:
+        return {}
+    conversation_ids, user_ids, message_ids = (list(column) for column in zip(*entries))
+    # Counting in the UPDATE alone could miss a message sent concurrently:
+    # its send increments unread_count, and the recount overwrites that from
+    # a snapshot taken before the send committed. With the rows locked
+    # first, a send either committed before the (later) snapshot or
+    # increments them after this transaction.
+    db.execute(_LOCK_PARTICIPANTS_SQL, {"conversation_ids": conversation_ids, "user_ids": user_ids})
+    rows = db.execute(_ADVANCE_READ_CURSORS_SQL, {
+        "conversation_ids": conversation_ids,
+        "user_ids": user_ids,
+        "message_ids": message_ids,
+    }).all()
+    return {(row.conversation_id, row.user_id): row.unread_count for row in rows}
+
+def mark_read_service(
+    conversation_id: UUID,
+    user_id: UUID,
+    message_id: UUID,
+    db: Optional[Session] = None
+) -> Optional[int]:
+    """Immediately advance a user's read cursor to ``message_id``.
+
+    Args:
+        conversation_id: UUID of the conversation being read.
+        user_id: UUID of the reading user.
+        message_id: UUID of the newest message the user has seen.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
+
+    Returns:
+        The new unread count, or ``None`` if the cursor was already at or
+        past ``message_id``.
+
+    Raises:
+        fastapi.HTTPException: If the user is not a participant (HTTP 403).
+    """
+    with session_scope(db) as db:
+        if not check_user_in_conversation(conversation_id=conversation_id, user_id=user_id, db=db):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="User is not part of this conversation."
+            )
+        moved = advance_read_cursors(db=db, entries=[(conversation_id, user_id, message_id)])
+        db.commit()
+    return moved.get((conversation_id, user_id))
+
+def queue_read_receipt(conversation_id: UUID, user_id: UUID, message_id: UUID) -> None:
+    """Buffer a read receipt; it is persisted by the next :pyfunc:`flush_read_receipts`."""
+    read_receipt_buffer.add(conversation_id=conversation_id, user_id=user_id, message_id=message_id)
+
+def flush_read_receipts(db: Optional[Session] = None) -> int:
+    """Persist all buffered read receipts in one batched ``UPDATE``.
+
+    Returns:
+        The number of read cursors that moved.
+    """
+    entries = read_receipt_buffer.drain()
+    if not entries:
+        return 0
+    try:
+        with session_scope(db) as db:
+            moved = advance_read_cursors(db=db, entries=entries)
+            db.commit()
+    except Exception:
+        # Put the receipts back so the next flush retries them
+        for conversation_id, user_id, message_id in entries:
+            read_receipt_buffer.add(conversation_id=conversation_id, user_id=user_id, message_id=message_id)
+        raise
+    return len(moved)
+
+async def run_read_receipt_flusher(interval: float = READ_RECEIPT_FLUSH_SECONDS) -> None:
+    """Background loop flushing buffered read receipts every ``interval`` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(flush_read_receipts)
+        except Exception:
+            logger.exception("Flushing read receipts failed")
+
+def get_unread_counts_service(user_id: UUID, db: Optional[Session] = None) -> list[UnreadCountObject]:
+    """Return the unread badge count for every conversation of ``user_id``.
+
+    Reads one participant row per conversation; no messages are counted.
+    """
+    with session_scope(db) as db:
+        rows = (
+            db.query(Participant.conversation_id, Participant.unread_count, Participant.last_read_message_id)
+            .filter(Participant.user_id == user_id)
+            .all()
+        )
+    return [
+        UnreadCountObject(
+            conversation_id=row.conversation_id,
+            unread_count=row.unread_count,
+            last_read_message_id=row.last_read_message_id,
+        )
+        for row in rows
+    ]
@@ -0,0 +1,282 @@
+"""Per-process cache of the newest messages of active conversations.
+
+Most history requests ask for the newest page of a conversation people are
+chatting in, and every one of them would run the same ``ORDER BY created_at
+DESC LIMIT n``. ``recent_messages_cache`` keeps the newest
+``RECENT_MESSAGES_PER_CONVERSATION`` messages of recently read conversations
+so that page is served from memory. Conversations are evicted least recently
+read first once their messages take more than ``RECENT_MESSAGES_CACHE_BYTES``.
+
+A conversation is filled by the first read that misses. Sends and edits are
+written through with :pyfunc:`record_recent_message` and deletes with
+:pyfunc:`forget_recent_message`, in the writing transaction: the local cache
+is patched once it commits and a notification lets the other workers patch
+theirs (see ``notifications_service``). Every change stamps the
+conversation's entry, and a fill that raced a change is discarded instead of
+caching a page that misses it.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from sqlalchemy.orm.session import Session
+from typing import Iterable, Optional
+from uuid import UUID
+import itertools
+import json
+import logging
+import threading
+import time
+
+from ..config import RECENT_MESSAGES_CACHE_BYTES, RECENT_MESSAGES_CACHE_TTL_SECONDS, RECENT_MESSAGES_PER_CONVERSATION
+from ..models.messages import Message
+from .notifications_service import MAX_PAYLOAD_BYTES, call_after_commit, notify, subscribe
+
+logger = logging.getLogger(__name__)
+
+RECENT_MESSAGES_CHANNEL = "recent_messages_changed"
+# Above this many conversations a notification clears the whole cache
+MAX_NOTIFIED_CONVERSATIONS = 100
+# Rough size of a cached message besides its content, for the memory budget
+MESSAGE_OVERHEAD_BYTES = 400
+# Fills in flight for conversations that aren't cached yet; the oldest are
+# forgotten (and their fills discarded) beyond this many
+MAX_PENDING_FILLS = 1024
+
+@dataclass
+class _Entry:
+    # stamp of the last change; a fill only stores its page if it is unchanged
+    version: int
+    # newest first
+    messages: list[Message]
+    # the messages are the conversation's whole history
+    complete: bool
+    size: int
+    expires_at: float
+
+def _copy(message: Message) -> Message:
+    """Return a transient copy of ``message`` that outlives its session."""
+    return Message(
+        id=message.id,
+        conversation_id=message.conversation_id,
+        sender_id=message.sender_id,
+        content=message.content,
+        created_at=message.created_at,
+        seq=message.seq,
+    )
+
+def _size(messages: list[Message]) -> int:
+    return sum(len(message.content) + MESSAGE_OVERHEAD_BYTES for message in messages)
+
+class RecentMessagesCache:
+    """Bounded LRU cache of each conversation's newest messages, with a TTL.
+
+    Holds ``per_conversation + 1`` messages per conversation so a full page
+    also knows whether there is an older one. The cached messages are
+    shared; callers must not change them.
+    """
+    def __init__(self, per_conversation: int, max_bytes: int, ttl: float) -> None:
+        self.capacity = per_conversation + 1
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[UUID, _Entry] = OrderedDict()
+        # stamps of fills begun for conversations without an entry
+        self.pending: OrderedDict[UUID, int] = OrderedDict()
+        self.size = 0
+        self._versions = itertools.count(start=1)
+
+    def get(self, conversation_id: UUID, count: int) -> Optional[list[Message]]:
+        """Return the newest ``count`` messages, newest first, or ``None`` on a miss.
+
+        Fewer are returned when that is the conversation's whole history.
+        """
+        with self.lock:
+            entry = self.entries.get(conversation_id)
+            if entry is None:
+                return None
+            if time.monotonic() >= entry.expires_at:
+                self._remove(conversation_id=conversation_id)
+                return None
+            if len(entry.messages) < count and not entry.complete:
+                return None
+            self.entries.move_to_end(key=conversation_id)
+            return entry.messages[:count]
+
+    def begin_fill(self, conversation_id: UUID) -> int:
+        """Return the stamp to pass to :pyfunc:`fill` after reading the newest messages."""
+        with self.lock:
+            entry = self.entries.get(conversation_id)
+            if entry is not None:
+                return entry.version
+            version = self.pending.get(conversation_id)
+            if version is None:
+                version = next(self._versions)
+                self.pending[conversation_id] = version
+                if len(self.pending) > MAX_PENDING_FILLS:
+                    self.pending.popitem(last=False)
+            return version
+
+    def fill(self, conversation_id: UUID, version: int, messages: list[Message]) -> list[Message]:
+        """Cache the newest messages read since :pyfunc:`begin_fill`, newest first.
+
+        Nothing is stored when the conversation changed or was evicted in
+        the meantime. Returns session-independent copies of the messages.
+        """
+        copies = [_copy(message=message) for message in messages[:self.capacity]]
+        size = _size(messages=copies)
+        with self.lock:
+            entry = self.entries.get(conversation_id)
+            if entry is None:
+                if self.pending.get(conversation_id) != version:
+                    return copies
+                del self.pending[conversation_id]
+                entry = _Entry(version=version, messages=copies, complete=False, size=0, expires_at=0.0)
+                self.entries[conversation_id] = entry
+            elif entry.version != version:
+                return copies
+            self.size += size - entry.size
+            entry.messages = copies
+            entry.complete = len(messages) < self.capacity
+            entry.size = size
+            entry.expires_at = time.monotonic() + self.ttl
+            self.entries.move_to_end(key=conversation_id)
+            self._evict()
+        return copies
+
+    def upsert(self, message: Message) -> None:
+        """Add a new message or replace an edited one."""
+        with self.lock:
+            entry = self._change(conversation_id=message.conversation_id)
+            if entry is None:
+                return
+            position = (message.created_at, message.id)
+            kept = [cached for cached in entry.messages if cached.id != message.id]
+            oldest = entry.messages[-1] if entry.messages else None
+            # Only the newest messages are kept, without gaps; an older one
+            # that wasn't cached stays out
+            if len(kept) == len(entry.messages) and not entry.complete and oldest is not None \
+                    and position < (oldest.created_at, oldest.id):
+                return
+            kept.append(_copy(message=message))
+            kept.sort(key=lambda cached: (cached.created_at, cached.id), reverse=True)
+            if len(kept) > self.capacity:
+                kept = kept[:self.capacity]
+                entry.complete = False
+            self._resize(entry=entry, messages=kept)
+
+    def remove(self, conversation_id: UUID, message_id: UUID) -> None:
+        with self.lock:
+            entry = self._change(conversation_id=conversation_id)
+            if entry is None:
+                return
+            self._resize(entry=entry, messages=[cached for cached in entry.messages if cached.id != message_id])
+
+    def invalidate(self, conversation_ids: Iterable[UUID]) -> None:
+        with self.lock:
+            for conversation_id in conversation_ids:
+                self._remove(conversation_id=conversation_id)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.pending.clear()
+            self.size = 0
+
+    def _change(self, conversation_id: UUID) -> Optional[_Entry]:
+        # A fill that began before the change must not store its page
+        self.pending.pop(conversation_id, None)
+        entry = self.entries.get(conversation_id)
+        if entry is not None:
+            entry.version = next(self._versions)
+        return entry
+
+    def _resize(self, entry: _Entry, messages: list[Message]) -> None:
+        size = _size(messages=messages)
+        self.size += size - entry.size
+        entry.messages = messages
+        entry.size = size
+        self._evict()
+
+    def _remove(self, conversation_id: UUID) -> None:
+        self.pending.pop(conversation_id, None)
+        entry = self.entries.pop(conversation_id, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def _evict(self) -> None:
+        while self.size > self.max_bytes and self.entries:
+            _, oldest = self.entries.popitem(last=False)
+            self.size -= oldest.size
+
+recent_messages_cache = RecentMessagesCache(
+    per_conversation=RECENT_MESSAGES_PER_CONVERSATION,
+    max_bytes=RECENT_MESSAGES_CACHE_BYTES,
+    ttl=RECENT_MESSAGES_CACHE_TTL_SECONDS,
+)
+
+def record_recent_message(db: Session, message: Message) -> None:
+    """Write a sent or edited message through to the caches once ``db`` commits."""
+    copy = _copy(message=message)
+    call_after_commit(db=db, callback=lambda: recent_messages_cache.upsert(message=copy))
+    payload = json.dumps({
+        "op": "upsert",
+        "message": {
+            "id": str(copy.id),
+            "conversation_id": str(copy.conversation_id),
+            "sender_id": str(copy.sender_id),
+            "content": copy.content,
+            "created_at": copy.created_at.isoformat(),
+            "seq": copy.seq,
+        },
+    })
+    if len(payload.encode()) > MAX_PAYLOAD_BYTES:
+        # Too long to send along; the other workers read it back instead
+        payload = json.dumps({"op": "invalidate", "conversation_ids": [str(copy.conversation_id)]})
+    notify(db=db, channel=RECENT_MESSAGES_CHANNEL, payload=payload)
+
+def forget_recent_message(db: Session, conversation_id: UUID, message_id: UUID) -> None:
+    """Remove a deleted message from the caches once ``db`` commits."""
+    call_after_commit(db=db, callback=lambda: recent_messages_cache.remove(conversation_id=conversation_id, message_id=message_id))
+    notify(db=db, channel=RECENT_MESSAGES_CHANNEL, payload=json.dumps({
+        "op": "remove",
+        "conversation_id": str(conversation_id),
+        "message_id": str(message_id),
+    }))
+
+def invalidate_recent_messages(db: Session, conversation_ids: Iterable[UUID]) -> None:
+    """Drop the cached messages of conversations changed in bulk once ``db`` commits."""
+    targets = list(conversation_ids)
+    if not targets:
+        return
+    call_after_commit(db=db, callback=lambda: recent_messages_cache.invalidate(conversation_ids=targets))
+    notify(db=db, channel=RECENT_MESSAGES_CHANNEL, payload=json.dumps(
+        {"op": "invalidate", "conversation_ids": [str(c) for c in targets]}
+        if len(targets) <= MAX_NOTIFIED_CONVERSATIONS else {"op": "clear"}
+    ))
+
+def apply_recent_messages_notification(payload: str) -> None:
+    """Patch the cache as described by a ``recent_messages_changed`` payload."""
+    try:
+        data = json.loads(payload)
+        op = data["op"]
+        if op == "upsert":
+            fields = data["message"]
+            recent_messages_cache.upsert(message=Message(
+                id=UUID(fields["id"]),
+                conversation_id=UUID(fields["conversation_id"]),
+                sender_id=UUID(fields["sender_id"]),
+                content=fields["content"],
+                created_at=datetime.fromisoformat(fields["created_at"]),
+                seq=fields["seq"],
+            ))
+        elif op == "remove":
+            recent_messages_cache.remove(conversation_id=UUID(data["conversation_id"]), message_id=UUID(data["message_id"]))
+        elif op == "invalidate":
+            recent_messages_cache.invalidate(conversation_ids=[UUID(c) for c in data["conversation_ids"]])
+        else:
+            recent_messages_cache.clear()
+    except (ValueError, KeyError, TypeError):
+        logger.warning("Ignoring malformed recent messages notification: %r", payload)
+        recent_messages_cache.clear()
+
+subscribe(channel=RECENT_MESSAGES_CHANNEL, handler=apply_recent_messages_notification, reset=recent_messages_cache.clear)
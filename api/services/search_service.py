@@ -0,0 +1,206 @@
+"""Full-text search over the messages a user can see.
+
+Postgres searches the trigger-maintained ``messages.search_vector`` column
+through its GIN index. SQLite, used as a lightweight stand-in for local
+development and tests, searches an FTS5 table created by
+:pyfunc:`create_sqlite_search_index`. Both backends return the same result
+shape, ranked best first and paged with a keyset cursor on ``(rank, id)``.
+"""
+from fastapi import HTTPException, status
+from sqlalchemy import REAL, Text, and_, cast, column, func, literal, literal_column, select, table, text, tuple_
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm.session import Session
+from sqlalchemy.sql.elements import ColumnElement
+from typing import Any, Optional
+from uuid import UUID
+
+from ..database import session_scope
+from ..models.conversations import Participant
+from ..models.messages import Message
+from ..schema.internal.messages import SearchPage, SearchResultObject
+from .cursor_service import encode_cursor, decode_cursor
+
+SEARCH_CURSOR_KIND = "search"
+MAX_PAGE_SIZE = 100
+MAX_QUERY_LENGTH = 256
+# Must match the configuration used by the messages_search_vector trigger (migration 0005)
+TEXT_SEARCH_CONFIG = "simple"
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_STOP = "</mark>"
+_HEADLINE_OPTIONS = f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, MaxWords=24, MinWords=8, MaxFragments=2"
+
+# FTS5 mirror of messages(content, id, conversation_id), SQLite only
+_sqlite_fts = table(
+    "messages_fts",
+    column("content", Text()),
+    column("message_id", Message.id.type),
+    column("conversation_id", Message.conversation_id.type),
+)
+
+_SQLITE_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(content, message_id UNINDEXED, conversation_id UNINDEXED)",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts (content, message_id, conversation_id) VALUES (new.content, new.id, new.conversation_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+        UPDATE messages_fts SET content = new.content WHERE message_id = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+        DELETE FROM messages_fts WHERE message_id = old.id;
+    END""",
+)
+
+def create_sqlite_search_index(conn: Connection) -> None:
+    """Create the SQLite FTS5 table and the triggers keeping it in sync.
+
+    Messages that already exist are indexed as well. Postgres databases get
+    their search index from migration 0005 instead.
+    """
+    for statement in _SQLITE_FTS_DDL:
+        conn.execute(text(statement))
+    conn.execute(text("""
+        INSERT INTO messages_fts (content, message_id, conversation_id)
+        SELECT content, id, conversation_id FROM messages
+        WHERE id NOT IN (SELECT message_id FROM messages_fts)
+    """))
+
+def _fts5_query(query: str) -> str:
+    # Quote every term so user input can't hit FTS5 query syntax errors
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+def _decode_search_cursor(cursor: str) -> tuple[float, UUID]:
+    values = decode_cursor(kind=SEARCH_CURSOR_KIND, cursor=cursor)
+    try:
+        rank, message_id = values
+        return float(rank), UUID(message_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def _search_postgres(
+    db: Session,
+    user_id: UUID,
+    query: str,
+    conversation_id: Optional[UUID],
+    after: Optional[tuple[float, UUID]],
+    limit: int,
+) -> list[Any]:
+    tsquery = func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, query)
+    rank = func.ts_rank_cd(Message.search_vector, tsquery)
+
+    hits = (
+        select(Message.id, rank.label("rank"))
+        .join(Participant, and_(Participant.conversation_id == Message.conversation_id, Participant.user_id == user_id))
+        .where(Message.search_vector.op("@@")(tsquery))
+    )
+    if conversation_id:
+        hits = hits.where(Message.conversation_id == conversation_id)
+    if after:
+        # ts_rank_cd returns a real; compare in real so a rank doesn't lose equality in the round trip
+        hits = hits.where(tuple_(rank, Message.id) < tuple_(cast(literal(after[0]), REAL), after[1]))
+    hits_subquery = hits.order_by(rank.desc(), Message.id.desc()).limit(limit).subquery()
+
+    # Headlines are expensive, so only build them for the rows on this page
+    snippet = func.ts_headline(TEXT_SEARCH_CONFIG, Message.content, tsquery, _HEADLINE_OPTIONS)
+    return db.execute(
+        select(Message, hits_subquery.c.rank, snippet.label("snippet"))
+        .join(hits_subquery, hits_subquery.c.id == Message.id)
+        .order_by(hits_subquery.c.rank.desc(), Message.id.desc())
+    ).all()
+
+def _search_sqlite(
+    db: Session,
+    user_id: UUID,
+    query: str,
+    conversation_id: Optional[UUID],
+    after: Optional[tuple[float, UUID]],
+    limit: int,
+) -> list[Any]:
+    fts = literal_column("messages_fts")
+    # bm25() is lower for better matches; negate it so both backends sort by rank descending
+    rank: ColumnElement[float] = -func.bm25(fts)
+    snippet = func.snippet(fts, 0, HIGHLIGHT_START, HIGHLIGHT_STOP, "…", 24)
+
+    statement = (
+        select(Message, rank.label("rank"), snippet.label("snippet"))
+        .select_from(_sqlite_fts)
+        .join(Message, Message.id == _sqlite_fts.c.message_id)
+        .join(Participant, and_(Participant.conversation_id == Message.conversation_id, Participant.user_id == user_id))
+        .where(fts.op("MATCH")(_fts5_query(query=query)))
+    )
+    if conversation_id:
+        statement = statement.where(Message.conversation_id == conversation_id)
+    if after:
+        statement = statement.where(tuple_(rank, Message.id) < tuple_(literal(after[0]), after[1]))
+    return db.execute(statement.order_by(rank.desc(), Message.id.desc()).limit(limit)).all()
+
+def search_messages_service(
+    user_id: UUID,
+    query: str,
+    conversation_id: Optional[UUID] = None,
+    limit: Optional[int] = 20,
+    cursor: Optional[str] = None,
+    db: Optional[Session] = None
+) -> SearchPage:
+    """Search the messages of every conversation ``user_id`` participates in.
+
+    Args:
+        user_id: UUID of the searching user; only conversations they
+            participate in are searched.
+        query: Search terms, truncated to ``MAX_QUERY_LENGTH`` characters.
+            Postgres accepts web search syntax (quoted phrases, ``or``,
+            ``-term``).
+        conversation_id: Optional UUID to restrict the search to one
+            conversation.
+        limit: Maximum number of results to return, capped at
+            ``MAX_PAGE_SIZE``.
+        cursor: Cursor from a previous page's ``next_cursor``.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
+
+    Returns:
+        A ``SearchPage`` with results ordered by relevance (best first).
+        Each result has a ``snippet`` of the message with the matching terms
+        wrapped in ``<mark>`` tags; the message text itself is not escaped.
+
+    Raises:
+        fastapi.HTTPException: If the cursor is invalid (HTTP 400).
+    """
+    page_size = min(limit or 20, MAX_PAGE_SIZE)
+    after = _decode_search_cursor(cursor=cursor) if cursor else None
+    query = query[:MAX_QUERY_LENGTH]
+    if not query.strip():
+        return SearchPage(results=[], next_cursor=None)
+
+    with session_scope(db) as db:
+        search = _search_postgres if db.get_bind().dialect.name == "postgresql" else _search_sqlite
+        # Fetch one extra row to learn whether another page exists
+        rows = search(
+            db=db,
+            user_id=user_id,
+            query=query,
+            conversation_id=conversation_id,
+            after=after,
+            limit=page_size + 1,
+        )
+
+        results = [
+            SearchResultObject(
+                id=message.id,
+                conversation_id=message.conversation_id,
+                sender_id=message.sender_id,
+                content=message.content,
+                created_at=message.created_at,
+                rank=float(rank),
+                snippet=snippet,
+            )
+            for message, rank, snippet in rows[:page_size]
+        ]
+
+    next_cursor: Optional[str] = None
+    if len(rows) > page_size and results:
+        last = results[-1]
+        next_cursor = encode_cursor(kind=SEARCH_CURSOR_KIND, values=[last["rank"], last["id"]])
+    return SearchPage(results=results, next_cursor=next_cursor)
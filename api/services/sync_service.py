@@ -0,0 +1,181 @@
+"""Delta sync: what changed for a user since their last sync.
+
+``GET /sync`` returns the messages, conversations and removals a client
+missed, read from ``change_log`` (see change_log_service), and a cursor to
+pass as ``since`` next time.
+
+The cursor is a Postgres snapshot rather than a time or an id: ids and
+timestamps are assigned when a row is written, but a transaction that wrote
+a lower id can commit after a sync already saw a higher one, and its change
+would be skipped. A change is new when its transaction was not visible in
+the ``since`` snapshot and is visible in the ``until`` snapshot taken for
+this sync, so every committed change is returned exactly once.
+``pg_snapshot_xmin(since)`` bounds the index scan: every transaction before
+it was already visible. Within one sync the changes are paged by id, which
+is stable because the set between the two snapshots doesn't change.
+"""
+from datetime import datetime, timezone
+from sqlalchemy import BigInteger, String, bindparam, column, text
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.orm.session import Session
+from typing import Any, Optional
+from uuid import UUID
+from fastapi import HTTPException, status
+
+from ..database import session_scope
+from ..models.messages import Message
+from ..schema.internal import SyncPage
+from .change_log_service import RETENTION
+from .conversations_service import get_conversations_by_ids
+from .cursor_service import encode_cursor, decode_cursor
+
+SYNC_PAGE_SIZE = 500
+
+_CURRENT_SNAPSHOT = text("SELECT pg_current_snapshot()::text")
+
+# Changes in the caller's conversations, and the caller's own removals from
+# conversations they no longer see. UNION drops the removal rows matched by
+# both branches when the caller was added back.
+_CHANGES = text("""
+    SELECT id, conversation_id, kind, entity_id FROM (
+        SELECT c.id, c.txid, c.conversation_id, c.kind, c.entity_id
+        FROM change_log c
+        JOIN participants p ON p.conversation_id = c.conversation_id AND p.user_id = :user_id
+        WHERE c.txid >= pg_snapshot_xmin(CAST(:since AS pg_snapshot))::text::bigint AND c.id > :after_id
+        UNION
+        SELECT c.id, c.txid, c.conversation_id, c.kind, c.entity_id
+        FROM change_log c
+        WHERE c.kind = 'participant_removed' AND c.entity_id = :user_id
+            AND c.txid >= pg_snapshot_xmin(CAST(:since AS pg_snapshot))::text::bigint AND c.id > :after_id
+    ) changes
+    WHERE NOT pg_visible_in_snapshot(changes.txid::text::xid8, CAST(:since AS pg_snapshot))
+        AND pg_visible_in_snapshot(changes.txid::text::xid8, CAST(:until AS pg_snapshot))
+    ORDER BY id
+    LIMIT :limit
+""").bindparams(
+    bindparam("user_id", type_=PG_UUID(as_uuid=True)),
+).columns(
+    column("id", BigInteger),
+    column("conversation_id", PG_UUID(as_uuid=True)),
+    column("kind", String),
+    column("entity_id", PG_UUID(as_uuid=True)),
+)
+
+def _decode_sync_cursor(cursor: str) -> tuple[str, Optional[str], int, datetime]:
+    values = decode_cursor(kind="sync", cursor=cursor)
+    try:
+        since, until, after_id, issued_at = values
+        return str(since), (str(until) if until is not None else None), int(after_id), datetime.fromisoformat(issued_at)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def _sync_cursor(since: str, until: Optional[str], after_id: int, issued_at: datetime) -> str:
+    return encode_cursor(kind="sync", values=[since, until, after_id, issued_at])
+
+def get_changes_service(
+    user_id: UUID,
+    since: Optional[str] = None,
+    limit: Optional[int] = SYNC_PAGE_SIZE,
+    db: Optional[Session] = None,
+) -> SyncPage:
+    """Return the changes visible to ``user_id`` since the ``since`` cursor.
+
+    Messages created or edited are returned in ``messages`` and messages
+    deleted in ``deleted_message_ids``; a message created and deleted in the
+    same window is only reported as deleted. Every conversation with a
+    change is returned in ``conversations`` with its current summary, and
+    conversations the user was removed from in ``removed_conversation_ids``.
+    A conversation the user was added to is returned without its earlier
+    messages; clients load its history as usual.
+
+    Args:
+        user_id: UUID of the requesting user.
+        since: ``cursor`` of the previous sync. Without it nothing is
+            returned, only a cursor to start syncing from.
+        limit: Maximum number of changes per page, at most
+            ``SYNC_PAGE_SIZE``. While ``has_more`` is set, call again with
+            the returned cursor.
+        db: Optional SQLAlchemy session; a private session is used when omitted.
+
+    Returns:
+        A ``SyncPage`` with the changes and the cursor to pass next.
+
+    Raises:
+        fastapi.HTTPException: If the cursor is invalid (HTTP 400) or older
+            than the change log retention, so changes may have been pruned
+            and the client has to reload (HTTP 410).
+    """
+    page_size = min(limit or SYNC_PAGE_SIZE, SYNC_PAGE_SIZE)
+    now = datetime.now(tz=timezone.utc)
+    with session_scope(db) as db:
+        if not since:
+            snapshot = db.execute(_CURRENT_SNAPSHOT).scalar_one()
+            return {
+                "messages": [],
+                "deleted_message_ids": [],
+                "conversations": [],
+                "removed_conversation_ids": [],
+                "cursor": _sync_cursor(since=snapshot, until=None, after_id=0, issued_at=now),
+                "has_more": False,
+            }
+
+        since_snapshot, until_snapshot, after_id, issued_at = _decode_sync_cursor(cursor=since)
+        if issued_at < now - RETENTION:
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="Sync cursor has expired, reload the conversations"
+            )
+        if until_snapshot is None:
+            until_snapshot = db.execute(_CURRENT_SNAPSHOT).scalar_one()
+
+        rows = db.execute(_CHANGES, {
+            "user_id": user_id,
+            "since": since_snapshot,
+            "until": until_snapshot,
+            "after_id": after_id,
+            "limit": page_size + 1,
+        }).all()
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        upserted: set[UUID] = set()
+        deleted: set[UUID] = set()
+        touched: set[UUID] = set()
+        removed: set[UUID] = set()
+        for row in rows:
+            touched.add(row.conversation_id)
+            if row.kind in ("message_created", "message_edited"):
+                upserted.add(row.entity_id)
+            elif row.kind == "message_deleted":
+                deleted.add(row.entity_id)
+            elif row.kind == "participant_removed" and row.entity_id == user_id:
+                removed.add(row.conversation_id)
+        upserted -= deleted
+
+        conversations = get_conversations_by_ids(user_id=user_id, conversation_ids=touched, db=db)
+        visible = {conversation["id"] for conversation in conversations}
+        messages: list[Any] = []
+        if upserted and visible:
+            messages = (
+                db.query(Message)
+                .filter(Message.id.in_(upserted), Message.conversation_id.in_(visible))
+                .order_by(Message.created_at, Message.id)
+                .all()
+            )
+
+        if has_more:
+            cursor = _sync_cursor(since=since_snapshot, until=until_snapshot, after_id=rows[-1].id, issued_at=issued_at)
+        else:
+            cursor = _sync_cursor(since=until_snapshot, until=None, after_id=0, issued_at=now)
+        return {
+            "messages": messages,
+            "deleted_message_ids": sorted(deleted),
+            "conversations": conversations,
+            # a later re-add makes the conversation visible again
+            "removed_conversation_ids": sorted(removed - visible),
+            "cursor": cursor,
+            "has_more": has_more,
+        }
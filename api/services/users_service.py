@@ -1,18 +1,155 @@
+"""User profile lookups backed by a per-process profile cache.
+
+Profiles are read far more often than they change: every message list
+needs its senders' names. They are cached per process for
+``PROFILE_CACHE_TTL_SECONDS`` and :pyfunc:`get_user_profiles` resolves the
+misses of a whole batch with one ``IN`` query. Updates go through
+:pyfunc:`update_user_profile_service`, which invalidates the cached profile
+in every worker once it commits.
+"""
 from ..models.users import UserProfile
-from ..models.auth import User
-from ..database import SessionLocal
-from ..schema.internal.user_service import UserProfileObj
+from ..models.auth import User, Tokens
+from ..config import PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL_SECONDS
+from ..database import session_scope
+from ..models.users import profile_search_name
+from ..schema.internal.purge import PurgeJobObject
+from ..schema.internal.user_service import DirectoryEntryObject, UserDirectoryPage, UserProfileObj, UserProfileUpdate
+from .cursor_service import encode_cursor, decode_cursor
+from .notifications_service import call_after_commit, notify, subscribe
+from .purge_service import enqueue_purge
 
+from collections import OrderedDict
 from fastapi import HTTPException, status
+from sqlalchemy import Select, delete, func, or_, select, tuple_, update
 from sqlalchemy.orm import joinedload
-from typing import Optional
+from sqlalchemy.orm.session import Session
+from typing import Any, Iterable, Iterator, Optional
 from uuid import UUID
+import hashlib
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PROFILE_CHANNEL = "profile_changed"
+MAX_PROFILE_BATCH = 100
+DIRECTORY_CURSOR_KIND = "users"
+MAX_DIRECTORY_PAGE_SIZE = 100
+MAX_DIRECTORY_QUERY_LENGTH = 100
+# Rows fetched per round trip by the streaming export
+EXPORT_BATCH_SIZE = 1000
+
+class ProfileCache:
+    """Bounded LRU cache of ``UserProfileObj`` by user id with a TTL."""
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[UUID, tuple[UserProfileObj, float]] = OrderedDict()
+        # Bumped on every invalidation; a lookup that raced one isn't stored
+        self.generation = 0
+
+    def get_many(self, user_ids: Iterable[UUID]) -> dict[UUID, UserProfileObj]:
+        now = time.monotonic()
+        found: dict[UUID, UserProfileObj] = {}
+        with self.lock:
+            for user_id in user_ids:
+                entry = self.entries.get(user_id)
+                if entry is None:
+                    continue
+                if now >= entry[1]:
+                    del self.entries[user_id]
+                    continue
+                self.entries.move_to_end(key=user_id)
+                found[user_id] = entry[0]
+        return found
+
+    def set_many(self, profiles: Iterable[UserProfileObj], generation: int) -> None:
+        """Cache ``profiles`` unless an invalidation happened since ``generation`` was read."""
+        expires_at = time.monotonic() + self.ttl
+        with self.lock:
+            if generation != self.generation:
+                return
+            for profile in profiles:
+                self.entries[profile["user_id"]] = (profile, expires_at)
+                self.entries.move_to_end(key=profile["user_id"])
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, user_ids: Iterable[UUID]) -> None:
+        with self.lock:
+            self.generation += 1
+            for user_id in user_ids:
+                self.entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+profile_cache = ProfileCache(max_size=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL_SECONDS)
+
+def _to_profile_object(profile: UserProfile) -> UserProfileObj:
+    return UserProfileObj(
+        id=profile.id,
+        user_id=profile.user_id,
+        first_name=profile.first_name,
+        last_name=profile.last_name,
+        email=profile.user.email,
+        phone=profile.phone,
+        avatar_url=profile.avatar_url,
+        bio=profile.bio,
+        date_of_birth=profile.date_of_birth,
+        location=profile.location,
+        website=profile.website,
+        created_at=profile.created_at,
+        updated_at=profile.updated_at
+    )
+
+def get_user_profiles(user_ids: Iterable[UUID], db: Optional[Session] = None) -> dict[UUID, UserProfileObj]:
+    """Retrieve the profiles of many users at once.
 
-def get_user_profile(user_id: UUID) -> UserProfileObj:
+    Cached profiles are served from ``profile_cache``; the rest are loaded
+    with a single query and cached.
+
+    Args:
+        user_ids: UUIDs of the users whose profiles should be returned.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
+
+    Returns:
+        A mapping from user id to ``UserProfileObj`` in the order the ids
+        were given. Users without a profile are left out.
+    """
+    requested = list(dict.fromkeys(user_ids))
+    found = profile_cache.get_many(user_ids=requested)
+    missing = [user_id for user_id in requested if user_id not in found]
+
+    if missing:
+        generation = profile_cache.generation
+        with session_scope(db) as db:
+            profiles: list[UserProfile] = (
+                db.query(UserProfile)
+                    .options(joinedload(UserProfile.user))
+                    .filter(UserProfile.user_id.in_(missing))
+                    .all()
+            )
+            loaded = [_to_profile_object(profile=profile) for profile in profiles if profile.user.email]
+        profile_cache.set_many(profiles=loaded, generation=generation)
+        found.update({profile["user_id"]: profile for profile in loaded})
+
+    # Hand out copies so callers can't change the cached profiles
+    return {user_id: UserProfileObj(**found[user_id]) for user_id in requested if user_id in found}
+
+def get_user_profile(user_id: UUID, db: Optional[Session] = None) -> UserProfileObj:
     """Retrieve a user's profile data.
 
     Args:
         user_id: UUID of the user whose profile should be returned.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
 
     Returns:
         A mapping matching ``UserProfileObj`` containing profile fields.
@@ -21,8 +158,38 @@ def get_user_profile(user_id: UUID) -> UserProfileObj:
         fastapi.HTTPException: If no profile exists for ``user_id``
             (HTTP 404).
     """
-    db = SessionLocal()
-    try:
+    profile = get_user_profiles(user_ids=[user_id], db=db).get(user_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"user profile with id {user_id} not found"
+        )
+    return profile
+
+def update_user_profile_service(
+    user_id: UUID,
+    changes: UserProfileUpdate,
+    db: Optional[Session] = None
+) -> UserProfileObj:
+    """Update fields of a user's profile.
+
+    The cached profile is invalidated in every worker once the update
+    commits.
+
+    Args:
+        user_id: UUID of the user whose profile is updated.
+        changes: The fields to change; fields left out keep their value.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
+
+    Returns:
+        The updated ``UserProfileObj``.
+
+    Raises:
+        fastapi.HTTPException: If no profile exists for ``user_id``
+            (HTTP 404).
+    """
+    with session_scope(db) as db:
         profile: Optional[UserProfile] = (
             db.query(UserProfile)
                 .options(joinedload(UserProfile.user))
@@ -30,29 +197,97 @@ def get_user_profile(user_id: UUID) -> UserProfileObj:
                 .first()
         )
 
-        if not profile or not profile.user.email:
+        if not profile:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"user profile with id {user_id} not found"
             )
-        # TODO: use UserProfile class instead of UserProfileObj class for return type without triggering type errors
-        return {
-            "id": profile.id,
-            "user_id": profile.user_id,
-            "first_name": profile.first_name,
-            "last_name": profile.last_name,
-            "email": profile.user.email,
-            "phone": profile.phone,
-            "avatar_url": profile.avatar_url,
-            "bio": profile.bio,
-            "date_of_birth": profile.date_of_birth,
-            "location": profile.location,
-            "website": profile.website,
-            "created_at": profile.created_at,
-            "updated_at": profile.updated_at
-        }
-    finally:
-        db.close()
+
+        for field, value in changes.items():
+            setattr(profile, field, value)
+        invalidate_profiles(db=db, user_ids=[user_id])
+        db.commit()
+        db.refresh(profile)
+        return _to_profile_object(profile=profile)
+
+def delete_account_service(
+    user_id: UUID,
+    db: Optional[Session] = None
+) -> PurgeJobObject:
+    """Delete a user's account.
+
+    The account is marked deleted and its refresh tokens are revoked right
+    away, so it can't log in or refresh any more and leaves the directory.
+    Access tokens already issued stay valid until they expire. Messages,
+    memberships and the account itself are removed afterwards in batches by
+    the purge worker (see ``purge_service``).
+
+    Args:
+        user_id: UUID of the user deleting their account.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
+
+    Returns:
+        The purge job removing the account's data.
+
+    Raises:
+        fastapi.HTTPException: If the user doesn't exist or is already
+            deleted (HTTP 404).
+    """
+    with session_scope(db) as db:
+        deleted = db.scalar(
+            update(User)
+            .where(User.id == user_id, User.deleted_at.is_(None))
+            .values(deleted_at=func.now())
+            .returning(User.id),
+            execution_options={"synchronize_session": False},
+        )
+        if deleted is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"user with id {user_id} not found"
+            )
+
+        db.execute(delete(Tokens).where(Tokens.user_id == user_id), execution_options={"synchronize_session": False})
+        invalidate_profiles(db=db, user_ids=[user_id])
+        job = enqueue_purge(db=db, kind="user", target_id=user_id, requested_by=user_id)
+        db.commit()
+    return job
+
+def invalidate_profiles(db: Session, user_ids: Iterable[UUID]) -> None:
+    """Invalidate cached profiles changed by the current transaction, in every worker."""
+    users = list(user_ids)
+    call_after_commit(db=db, callback=lambda: profile_cache.invalidate(user_ids=users))
+    # Notify in chunks that stay below the payload limit
+    for start in range(0, len(users), MAX_PROFILE_BATCH):
+        notify(db=db, channel=PROFILE_CHANNEL, payload=json.dumps([str(u) for u in users[start:start + MAX_PROFILE_BATCH]]))
+
+def apply_profile_notification(payload: str) -> None:
+    """Invalidate the cached profiles named by a ``profile_changed`` payload."""
+    try:
+        user_ids = [UUID(u) for u in json.loads(payload)]
+    except (ValueError, TypeError):
+        logger.warning("Ignoring malformed profile notification: %r", payload)
+        return
+    profile_cache.invalidate(user_ids=user_ids)
+
+subscribe(channel=PROFILE_CHANNEL, handler=apply_profile_notification, reset=profile_cache.clear)
+
+def profiles_etag(profiles: Iterable[object]) -> str:
+    """Return a weak ETag identifying the given serialized profiles."""
+    body = json.dumps(list(profiles), default=str, sort_keys=True)
+    return f'W/"{hashlib.sha1(body.encode()).hexdigest()}"'
+
+def _opaque_tag(etag: str) -> str:
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    return etag[2:] if etag.startswith("W/") else etag
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Return whether an ``If-None-Match`` header value matches ``etag``."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or _opaque_tag(etag=etag) in {_opaque_tag(etag=candidate) for candidate in candidates}
 
 def ensure_user_profiles() -> None:
     """Create missing UserProfile records for any User without a profile.
@@ -60,8 +295,7 @@ def ensure_user_profiles() -> None:
     This is a maintenance function to handle users that may have been created
     before profile creation was mandatory, or without a profile for any reason.
     """
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         # Find users without profiles
         users_without_profiles = (
             db.query(User)
@@ -79,33 +313,121 @@ def ensure_user_profiles() -> None:
             db.add(profile)
         
         db.commit()
-    finally:
-        db.close()
 
-def get_all_users() -> list[UserProfileObj]:
-    db = SessionLocal()
+def get_all_users(db: Optional[Session] = None) -> list[UserProfileObj]:
     user_list: list[UserProfileObj] = []
-    profiles: list[UserProfile] = (
-        db.query(UserProfile)
-        .options(joinedload(UserProfile.user))
-        .all()
-    )
-    for profile in profiles:
-        user_list.append(
-            UserProfileObj(
-                id=profile.id,
-                user_id=profile.user_id,
-                first_name=profile.first_name,
-                last_name=profile.last_name,
-                email=profile.user.email,
-                phone=profile.phone,
-                avatar_url=profile.avatar_url,
-                bio=profile.bio,
-                date_of_birth=profile.date_of_birth,
-                location=profile.location,
-                website=profile.website,
-                created_at=profile.created_at,
-                updated_at=profile.updated_at
-            )
+    with session_scope(db) as db:
+        profiles: list[UserProfile] = (
+            db.query(UserProfile)
+            .options(joinedload(UserProfile.user))
+            .all()
         )
+    for profile in profiles:
+        user_list.append(_to_profile_object(profile=profile))
     return user_list
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _directory_statement() -> Select[Any]:
+    email = func.lower(User.email)
+    return (
+        select(User.id, User.email, UserProfile.first_name, UserProfile.last_name, UserProfile.avatar_url, email.label("email_lower"))
+        .outerjoin(UserProfile, UserProfile.user_id == User.id)
+        .where(User.deleted_at.is_(None))
+        .order_by(email, User.id)
+    )
+
+def _to_directory_entry(row: Any) -> DirectoryEntryObject:
+    return DirectoryEntryObject(
+        user_id=row.id,
+        email=row.email,
+        first_name=row.first_name,
+        last_name=row.last_name,
+        avatar_url=row.avatar_url,
+    )
+
+def _decode_directory_cursor(cursor: str) -> tuple[str, UUID]:
+    values = decode_cursor(kind=DIRECTORY_CURSOR_KIND, cursor=cursor)
+    try:
+        email, user_id = values
+        return str(email), UUID(user_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def search_users_service(
+    query: Optional[str] = None,
+    limit: Optional[int] = 20,
+    cursor: Optional[str] = None,
+    db: Optional[Session] = None
+) -> UserDirectoryPage:
+    """Return one page of the user directory, optionally filtered by a search.
+
+    Users match when their email starts with ``query`` or a word of their
+    name does (case insensitive). Both conditions are served by the pg_trgm
+    indexes from migration 0007. Pages are ordered by email and use a keyset
+    cursor on ``(lower(email), id)``, so every page costs the same.
+
+    Args:
+        query: Optional search text, truncated to
+            ``MAX_DIRECTORY_QUERY_LENGTH`` characters. Omit to list everyone.
+        limit: Maximum number of users to return, capped at
+            ``MAX_DIRECTORY_PAGE_SIZE``.
+        cursor: Cursor from a previous page's ``next_cursor``.
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted.
+
+    Returns:
+        A ``UserDirectoryPage`` with the users and the cursor of the next
+        page, which is ``None`` on the last page.
+
+    Raises:
+        fastapi.HTTPException: If the cursor is invalid (HTTP 400).
+    """
+    page_size = min(limit or 20, MAX_DIRECTORY_PAGE_SIZE)
+    statement = _directory_statement()
+
+    term = (query or "").strip().lower()[:MAX_DIRECTORY_QUERY_LENGTH]
+    if term:
+        escaped = _escape_like(value=term)
+        statement = statement.where(or_(
+            func.lower(User.email).like(f"{escaped}%", escape="\\"),
+            profile_search_name.like(f"{escaped}%", escape="\\"),
+            profile_search_name.like(f"% {escaped}%", escape="\\"),
+        ))
+    if cursor:
+        email, user_id = _decode_directory_cursor(cursor=cursor)
+        statement = statement.where(tuple_(func.lower(User.email), User.id) > tuple_(email, user_id))
+
+    with session_scope(db) as db:
+        # Fetch one extra row to learn whether another page exists
+        rows = db.execute(statement.limit(page_size + 1)).all()
+
+    next_cursor: Optional[str] = None
+    if len(rows) > page_size:
+        last = rows[page_size - 1]
+        next_cursor = encode_cursor(kind=DIRECTORY_CURSOR_KIND, values=[last.email_lower, last.id])
+    return UserDirectoryPage(
+        users=[_to_directory_entry(row=row) for row in rows[:page_size]],
+        next_cursor=next_cursor
+    )
+
+def iter_user_directory(db: Optional[Session] = None, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[DirectoryEntryObject]:
+    """Yield every user of the directory, ordered by email, in constant memory.
+
+    Rows come from a server-side cursor ``batch_size`` at a time instead of
+    being loaded all at once.
+
+    Args:
+        db: Optional SQLAlchemy session; a private session is used when
+            omitted. It stays busy until the iterator is exhausted or
+            closed.
+        batch_size: Rows fetched per round trip.
+    """
+    with session_scope(db) as db:
+        result = db.execute(_directory_statement().execution_options(yield_per=batch_size))
+        for row in result:
+            yield _to_directory_entry(row=row)
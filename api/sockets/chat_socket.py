@@ -1,11 +1,32 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, status
+from typing import Any
+from uuid import UUID
+import json
 
 from .connection_manager import ConnectionManager
 from ..services.auth_service import get_ws_user_id
+from ..services.read_receipts_service import queue_read_receipt
 
 router = APIRouter()
 manager = ConnectionManager()
 
+def parse_read_event(data: str) -> tuple[UUID, UUID] | None:
+    """Return ``(conversation_id, message_id)`` if ``data`` is a read event.
+
+    Read events look like ``{"type": "read", "conversation_id": ..., "message_id": ...}``;
+    anything else is treated as a chat message.
+    """
+    try:
+        event: Any = json.loads(data)
+    except ValueError:
+        return None
+    if not isinstance(event, dict) or event.get("type") != "read":
+        return None
+    try:
+        return UUID(str(event["conversation_id"])), UUID(str(event["message_id"]))
+    except (KeyError, ValueError):
+        return None
+
 @router.websocket(path="/ws/chat")
 async def websocket_endpoint(websocket: WebSocket) -> None:
     try:
@@ -20,6 +41,11 @@ async def websocket_endpoint(websocket: WebSocket) -> None:
     try:
         while True:
             data = await websocket.receive_text()
+            read_event = parse_read_event(data=data)
+            if read_event:
+                conversation_id, message_id = read_event
+                queue_read_receipt(conversation_id=conversation_id, user_id=user_id, message_id=message_id)
+                continue
             await manager.broadcast(message=f"[{user_id}] said {data}")
     except WebSocketDisconnect:
         await manager.disconnect(user_id=user_id, connection_id=connection_id)
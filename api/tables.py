@@ -10,16 +10,19 @@ try:
 	if __package__:
 		models_pkg = importlib.import_module(f"{__package__}.models")
 		from api.database import Base, engine
+		from api.migrations import upgrade
 	else:
 		# When executed as a script (module has no package), use absolute import after ensuring cwd is on sys.path
 		sys.path.insert(0, '.')
 		models_pkg = importlib.import_module('api.models')
 		from api.database import Base, engine
+		from api.migrations import upgrade
 except Exception:
 	# Final fallback when imports fail
 	sys.path.insert(0, '.')
 	models_pkg = importlib.import_module(name='api.models')
 	from api.database import Base, engine
+	from api.migrations import upgrade
 
 def import_all_models(package: ModuleType) -> None:
 	# Iterate over all modules in the package and import them so SQLAlchemy's Base
@@ -34,4 +37,7 @@ if __name__ == "__main__":
 	import_all_models(package=models_pkg)
 	print("Creating tables...")
 	Base.metadata.create_all(bind=engine)
+	print("Applying migrations...")
+	applied = upgrade(engine=engine)
+	print(f"Applied migrations: {applied}" if applied else "Database is up to date")
 	print("Done!")
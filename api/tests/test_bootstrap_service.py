@@ -0,0 +1,46 @@
+from typing import Optional
+
+from api.database import SessionLocal
+from api.models.auth import User
+from api.models.change_log import ChangeLog
+from api.models.users import UserProfile
+from api.models.conversations import Conversation, Participant
+from api.models.messages import Message
+from api.services import messages_service
+from api.services import bootstrap_service as svc
+from api.tests.test_messages_service import create_user_and_conv
+
+def test_get_bootstrap_service_returns_newest_messages_per_conversation() -> None:
+    db = SessionLocal()
+    user: Optional[User] = None
+    conv: Optional[Conversation] = None
+    try:
+        user, conv = create_user_and_conv(db=db)
+        db.add(instance=UserProfile(user_id=user.id, first_name="A"))
+        db.commit()
+        sent = [
+            messages_service.send_message_service(sender_id=user.id, conversation_id=conv.id, content=f"m{i}")
+            for i in range(3)
+        ]
+
+        state = svc.get_bootstrap_service(user_id=user.id, conversations=10, messages=2)
+        assert state["profile"]["user_id"] == user.id
+        assert state["next_cursor"] is None
+        [entry] = state["conversations"]
+        assert entry["conversation"]["id"] == conv.id
+        assert [m["id"] for m in entry["messages"]] == [sent[2].id, sent[1].id]
+        assert entry["next_cursor"] is not None
+
+        older = messages_service.get_messages_page_service(conversation_id=conv.id, user_id=user.id, cursor=entry["next_cursor"])
+        assert [m.id for m in older["messages"]] == [sent[0].id]
+    finally:
+        if conv is not None:
+            db.query(ChangeLog).filter(ChangeLog.conversation_id == conv.id).delete(synchronize_session=False)
+            db.query(Message).filter(Message.conversation_id == conv.id).delete(synchronize_session=False)
+            db.query(Participant).filter(Participant.conversation_id == conv.id).delete(synchronize_session=False)
+            db.query(Conversation).filter(Conversation.id == conv.id).delete(synchronize_session=False)
+        if user is not None:
+            db.query(UserProfile).filter(UserProfile.user_id == user.id).delete(synchronize_session=False)
+            db.query(User).filter(User.id == user.id).delete(synchronize_session=False)
+        db.commit()
+        db.close()
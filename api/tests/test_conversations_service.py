@@ -1,10 +1,16 @@
+import pytest
+from fastapi import HTTPException
 from sqlalchemy.orm.session import Session
 from typing import Optional
 
 from api.database import SessionLocal
 from api.models.auth import User
 from api.models.conversations import Conversation, Participant
+from api.models.messages import Message
+from api.models.purge_jobs import PurgeJob
 from api.services import conversations_service as svc
+from api.services import messages_service as msg_svc
+from api.services import purge_service as purge_svc
 from api.tests.conftest import random_email
 
 def create_test_user(db: Session, email: Optional[str] = None) -> User:
@@ -84,6 +90,31 @@ def test_get_single_conversation_service_returns_expected_fields() -> None:
         db.commit()
         db.close()
 
+def test_private_conversation_is_reused_for_the_same_pair() -> None:
+    db = SessionLocal()
+    user: Optional[User] = None
+    other: Optional[User] = None
+    try:
+        user = create_test_user(db=db)
+        other = create_test_user(db=db)
+
+        first = svc.create_conversation_service(name="dm", conversation_type="private", created_by=user.id, participant_ids=[other.id])
+        # Opening it again from either side returns the same conversation
+        again = svc.create_conversation_service(name="dm", conversation_type="private", created_by=other.id, participant_ids=[user.id])
+        assert again.id == first.id
+        assert first.private_pair_key == svc.private_pair_key(user_ids=[other.id, user.id])
+        assert db.query(Participant).filter(Participant.conversation_id == first.id).count() == 2
+
+        with pytest.raises(expected_exception=HTTPException):
+            svc.create_conversation_service(name="dm", conversation_type="private", created_by=user.id, participant_ids=[])
+    finally:
+        if user is not None and other is not None:
+            db.query(Participant).filter(Participant.user_id.in_(other=[user.id, other.id])).delete(synchronize_session=False)
+            db.query(Conversation).filter(Conversation.created_by.in_(other=[user.id, other.id])).delete(synchronize_session=False)
+            db.query(User).filter(User.id.in_(other=[user.id, other.id])).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
 def test_edit_conversation_as_admin_updates_name() -> None:
     db = SessionLocal()
     user: Optional[User] = None
@@ -115,15 +146,123 @@ def test_delete_conversation_as_admin_removes_it() -> None:
         other = create_test_user(db=db)
         conv = svc.create_conversation_service(name="todel", conversation_type="group", created_by=user.id, participant_ids=[user.id, other.id])
 
-        svc.delete_conversation_service(conversation_id=conv.id, user_id=user.id)
+        msg_svc.send_message_service(conversation_id=conv.id, sender_id=other.id, content="bye")
+        job = svc.delete_conversation_service(conversation_id=conv.id, user_id=user.id)
+
+        # Gone for its members right away, history purged in the background
+        remaining = db.query(Conversation).filter(Conversation.id == conv.id).one()
+        assert remaining.deleted_at is not None
+        assert db.query(Participant).filter(Participant.conversation_id == conv.id).count() == 0
+        assert svc.get_all_conversations_service(user_id=other.id) == []
+        # Nothing more can be posted while it waits for the purge
+        with pytest.raises(expected_exception=HTTPException) as late:
+            msg_svc.send_message_service(conversation_id=conv.id, sender_id=other.id, content="late")
+        assert late.value.status_code == 404
+        [rejected] = msg_svc.send_messages_bulk_service(sender_id=other.id, messages=[{"conversation_id": conv.id, "content": "late"}])
+        assert rejected["status"] == "rejected"
 
-        remaining = db.query(Conversation).filter(Conversation.id == conv.id).first()
-        assert remaining is None
+        while purge_svc.run_purge_batch() is not None:
+            pass
+        assert db.query(Message).filter(Message.conversation_id == conv.id).count() == 0
+        assert db.query(Conversation).filter(Conversation.id == conv.id).first() is None
+        done = db.get(PurgeJob, job["id"])
+        assert done is not None and done.status == "done" and done.rows_deleted == 2
     finally:
         # cleanup users
+        if conv is not None:
+            db.query(PurgeJob).filter(PurgeJob.target_id == conv.id).delete(synchronize_session=False)
         if user is not None and other is not None:
             db.query(Participant).filter(Participant.user_id.in_(other=[user.id, other.id])).delete(synchronize_session=False)
             db.query(Conversation).filter(Conversation.created_by.in_(other=[user.id, other.id])).delete(synchronize_session=False)
             db.query(User).filter(User.id.in_(other=[user.id, other.id])).delete(synchronize_session=False)
         db.commit()
         db.close()
+
+def test_conversation_summary_tracks_latest_message_and_activity_order() -> None:
+    db = SessionLocal()
+    user: Optional[User] = None
+    other: Optional[User] = None
+    convs: list[Conversation] = []
+    try:
+        user = create_test_user(db=db)
+        other = create_test_user(db=db)
+        convs = [
+            svc.create_conversation_service(name=f"c{i}", conversation_type="group", created_by=user.id, participant_ids=[other.id])
+            for i in range(3)
+        ]
+        # Activity in the oldest conversation moves it to the top of the list
+        msg = msg_svc.send_message_service(sender_id=other.id, conversation_id=convs[0].id, content="hello there")
+
+        page = svc.get_conversations_page_service(user_id=user.id, limit=2)
+        assert [c["id"] for c in page["conversations"]] == [convs[0].id, convs[2].id]
+        top = page["conversations"][0]
+        assert top["participant_count"] == 2
+        assert top["last_message_id"] == msg.id
+        assert top["last_message_preview"] == "hello there"
+        assert top["last_message_sender_id"] == other.id
+
+        assert page["next_cursor"] is not None
+        rest = svc.get_conversations_page_service(user_id=user.id, limit=2, cursor=page["next_cursor"])
+        assert [c["id"] for c in rest["conversations"]] == [convs[1].id]
+        assert rest["next_cursor"] is None
+
+        # Deleting the latest message repoints the summary
+        msg_svc.delete_message_service(message_id=msg.id, user_id=user.id)
+        single = svc.get_single_conversation_service(user_id=user.id, conversation_id=convs[0].id)
+        assert single[0]["last_message_id"] is None
+    finally:
+        for conv in convs:
+            db.query(Message).filter(Message.conversation_id == conv.id).delete(synchronize_session=False)
+            db.query(Participant).filter(Participant.conversation_id == conv.id).delete(synchronize_session=False)
+            db.query(Conversation).filter(Conversation.id == conv.id).delete(synchronize_session=False)
+        if user is not None and other is not None:
+            db.query(User).filter(User.id.in_(other=[user.id, other.id])).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+def test_bulk_participant_changes_keep_the_count() -> None:
+    db = SessionLocal()
+    conv: Optional[Conversation] = None
+    users: list[User] = []
+    try:
+        users = [create_test_user(db=db) for _ in range(4)]
+        admin, others = users[0], users[1:]
+        conv = svc.create_conversation_service(
+            name="Members", conversation_type="group", created_by=admin.id, participant_ids=[]
+        )
+
+        added = svc.add_participants_service(conversation_id=conv.id, user_id=admin.id, participant_ids=[u.id for u in others])
+        assert set(added["user_ids"]) == {u.id for u in others}
+        assert added["participant_count"] == 4
+        # Members are skipped, so a retry changes nothing
+        again = svc.add_participants_service(conversation_id=conv.id, user_id=admin.id, participant_ids=[others[0].id])
+        assert again["user_ids"] == [] and again["participant_count"] == 4
+
+        with pytest.raises(HTTPException) as exc:
+            svc.add_participants_service(conversation_id=conv.id, user_id=others[0].id, participant_ids=[admin.id])
+        assert exc.value.status_code == 403
+
+        promoted = svc.set_participant_roles_service(conversation_id=conv.id, user_id=admin.id, participant_ids=[others[0].id], role="admin")
+        assert promoted["user_ids"] == [others[0].id]
+
+        first = svc.get_participants_page_service(conversation_id=conv.id, user_id=others[1].id, limit=3)
+        rest = svc.get_participants_page_service(conversation_id=conv.id, user_id=others[1].id, limit=3, cursor=first["next_cursor"])
+        listed = [p["user_id"] for p in first["participants"] + rest["participants"]]
+        assert listed == sorted(u.id for u in users)
+        assert rest["next_cursor"] is None
+
+        left = svc.remove_participants_service(conversation_id=conv.id, user_id=others[2].id, participant_ids=[others[2].id])
+        assert left["participant_count"] == 3
+        removed = svc.remove_participants_service(conversation_id=conv.id, user_id=admin.id, participant_ids=[others[1].id, others[2].id])
+        assert removed["user_ids"] == [others[1].id]
+        assert removed["participant_count"] == 2
+        db.expire_all()
+        assert db.query(Participant).filter(Participant.conversation_id == conv.id).count() == 2
+    finally:
+        if conv is not None:
+            db.query(Participant).filter(Participant.conversation_id == conv.id).delete(synchronize_session=False)
+            db.query(Conversation).filter(Conversation.id == conv.id).delete(synchronize_session=False)
+        if users:
+            db.query(User).filter(User.id.in_(other=[u.id for u in users])).delete(synchronize_session=False)
+        db.commit()
+        db.close()
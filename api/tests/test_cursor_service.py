@@ -0,0 +1,29 @@
+from datetime import datetime, timezone
+from uuid import uuid4
+import pytest
+from fastapi import HTTPException, status
+
+from api.services import cursor_service as svc
+
+def test_cursor_round_trip() -> None:
+    ts = datetime(2024, 5, 1, 12, 30, 0, 123456, tzinfo=timezone.utc)
+    message_id = uuid4()
+    cursor = svc.encode_cursor(kind="messages", values=["older", ts, message_id])
+
+    direction, created_at, decoded_id = svc.decode_cursor(kind="messages", cursor=cursor)
+    assert direction == "older"
+    assert datetime.fromisoformat(created_at) == ts
+    assert decoded_id == str(message_id)
+
+def test_cursor_rejects_tampering_and_wrong_kind() -> None:
+    cursor = svc.encode_cursor(kind="messages", values=["older", 1])
+    payload, _, signature = cursor.partition(".")
+    forged = svc.encode_cursor(kind="messages", values=["older", 2]).partition(".")[0] + "." + signature
+
+    for bad in (forged, payload, "garbage", cursor + "x"):
+        with pytest.raises(expected_exception=HTTPException) as exc_info:
+            svc.decode_cursor(kind="messages", cursor=bad)
+        assert exc_info.value.status_code == status.HTTP_400_BAD_REQUEST
+
+    with pytest.raises(expected_exception=HTTPException):
+        svc.decode_cursor(kind="conversations", cursor=cursor)
@@ -0,0 +1,80 @@
+import pytest
+from sqlalchemy import text
+from starlette.requests import Request
+from uuid import uuid4
+
+from api import database
+from api.database import SessionLocal, session_scope, get_db, get_pool_status, open_read_session, write_lsn_tracker
+
+def test_session_scope_reuses_supplied_session() -> None:
+    db = SessionLocal()
+    try:
+        with session_scope(db=db) as scoped:
+            assert scoped is db
+    finally:
+        db.close()
+
+def test_session_scope_closes_owned_session(monkeypatch: pytest.MonkeyPatch) -> None:
+    closed: list[bool] = []
+    real_factory = database.SessionLocal
+
+    def factory() -> database.Session:
+        session = real_factory()
+        original_close = session.close
+
+        def close() -> None:
+            closed.append(True)
+            original_close()
+
+        session.close = close  # type: ignore[method-assign]
+        return session
+
+    monkeypatch.setattr(database, "SessionLocal", factory)
+
+    with pytest.raises(expected_exception=RuntimeError):
+        with session_scope():
+            raise RuntimeError("boom")
+    assert closed == [True]
+
+def test_get_db_rolls_back_and_closes_on_error() -> None:
+    gen = get_db(request=Request(scope={"type": "http"}))
+    db = next(gen)
+    with pytest.raises(expected_exception=ValueError):
+        gen.throw(ValueError("handler failed"))
+    assert not db.in_transaction()
+
+def test_get_pool_status_reports_usage() -> None:
+    database.pool_metrics.record_wait(seconds=0.5)
+    status = get_pool_status()
+    for key in ("pool_size", "checked_out", "overflow", "wait_seconds_max", "wait_seconds_avg"):
+        assert key in status
+    assert status["wait_seconds_max"] >= 0.5
+    database.pool_metrics.reset()
+
+def test_write_lsn_tracker_keeps_latest_position_until_expiry() -> None:
+    tracker = database.WriteLsnTracker(ttl=60)
+    user_id = uuid4()
+    assert tracker.get(user_id=user_id) is None
+    tracker.record(user_id=user_id, lsn="1/A0")
+    # An older position never replaces a newer one
+    tracker.record(user_id=user_id, lsn="0/FFFFFFFF")
+    assert tracker.get(user_id=user_id) == "1/A0"
+    assert database.parse_lsn(lsn="1/A0") == (1 << 32) + 0xA0
+
+    tracker.ttl = 0
+    assert tracker.get(user_id=user_id) is None
+
+@pytest.mark.skipif(not database.replica_engines, reason="DB_REPLICA_URLS is not configured")
+def test_read_session_sees_the_users_own_writes() -> None:
+    user_id = uuid4()
+    with database.engine.connect() as conn:
+        lsn = conn.execute(text("SELECT pg_current_wal_lsn()::text")).scalar_one()
+    write_lsn_tracker.record(user_id=user_id, lsn=lsn)
+
+    db = open_read_session(user_id=user_id)
+    try:
+        replayed = db.execute(text("SELECT pg_last_wal_replay_lsn()::text")).scalar()
+        # Either the primary (no replay position) or a replica that has caught up
+        assert replayed is None or database.parse_lsn(lsn=replayed) >= database.parse_lsn(lsn=lsn)
+    finally:
+        db.close()
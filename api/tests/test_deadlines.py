@@ -0,0 +1,78 @@
+from fastapi import Depends, FastAPI, Request, status
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from typing import Iterator
+import pytest
+
+from api import deadlines
+
+@pytest.fixture
+def app() -> Iterator[FastAPI]:
+    engine = create_engine(url="sqlite://", poolclass=StaticPool)
+    app = FastAPI(exception_handlers=deadlines.EXCEPTION_HANDLERS)
+    app.add_middleware(middleware_class=deadlines.DeadlineMiddleware, budget=30)
+
+    def get_session(request: Request) -> Iterator[Session]:
+        db = Session(bind=engine)
+        try:
+            deadlines.apply_deadline(db=db, deadline=request.state.deadline)
+            yield db
+        finally:
+            db.close()
+
+    @app.get(path="/default")
+    def default_budget(request: Request) -> dict[str, float]:
+        return {"remaining": request.state.deadline.remaining()}
+
+    @app.get(path="/short", dependencies=[Depends(dependency=deadlines.request_budget(seconds=2))])
+    def short_budget(request: Request) -> dict[str, float]:
+        return {"remaining": request.state.deadline.remaining()}
+
+    @app.get(path="/spent", dependencies=[Depends(dependency=deadlines.request_budget(seconds=0))])
+    def spent_budget(db: Session = Depends(dependency=get_session)) -> dict[str, int]:
+        return {"value": db.execute(text("SELECT 1")).scalar_one()}
+
+    yield app
+    engine.dispose()
+
+def test_routes_shorten_the_request_deadline(app: FastAPI) -> None:
+    client = TestClient(app=app)
+    assert 29 < client.get(url="/default").json()["remaining"] <= 30
+    assert 1 < client.get(url="/short").json()["remaining"] <= 2
+
+def test_no_transaction_starts_after_the_deadline(app: FastAPI) -> None:
+    response = TestClient(app=app).get(url="/spent")
+    assert response.status_code == status.HTTP_504_GATEWAY_TIMEOUT
+
+def test_cancel_only_reaches_connections_of_the_request() -> None:
+    class FakeConnection:
+        cancelled = 0
+
+        def cancel(self) -> None:
+            self.cancelled += 1
+
+    mine, theirs, returned = FakeConnection(), FakeConnection(), FakeConnection()
+    deadline, other = deadlines.RequestDeadline(budget=5), deadlines.RequestDeadline(budget=5)
+    deadlines._attach(dbapi_connection=mine, deadline=deadline)
+    deadlines._attach(dbapi_connection=theirs, deadline=other)
+    deadlines._attach(dbapi_connection=returned, deadline=deadline)
+    # Back in the pool, so possibly already serving someone else
+    deadlines._detach(dbapi_connection=returned, connection_record=None)
+
+    assert deadlines.cancel_queries(deadline=deadline) == 1
+    assert (mine.cancelled, theirs.cancelled, returned.cancelled) == (1, 0, 0)
+    deadlines._detach(dbapi_connection=mine, connection_record=None)
+    deadlines._detach(dbapi_connection=theirs, connection_record=None)
+
+def test_timeout_is_sent_with_the_first_statement_of_a_transaction() -> None:
+    class FakeConnection:
+        def __init__(self) -> None:
+            self.info = {deadlines._PENDING_TIMEOUT: 1500}
+
+    conn, cursor = FakeConnection(), object()
+    first = deadlines._send_pending_timeout(conn=conn, cursor=cursor, statement="SELECT 1", parameters={}, context=None, executemany=False)  # type: ignore[arg-type]
+    later = deadlines._send_pending_timeout(conn=conn, cursor=cursor, statement="SELECT 2", parameters={}, context=None, executemany=False)  # type: ignore[arg-type]
+    assert first == ("SET LOCAL statement_timeout = 1500; SELECT 1", {})
+    assert later == ("SELECT 2", {})
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from api.ids import uuid7, uuid7_time
+from api.models.messages import Message
+from api.services import messages_service as svc
+
+def test_uuid7_is_time_ordered_and_monotonic() -> None:
+    before = datetime.now(tz=timezone.utc) - timedelta(milliseconds=1)
+    ids = [uuid7() for _ in range(10000)]
+    after = datetime.now(tz=timezone.utc) + timedelta(milliseconds=1)
+
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    assert all(i.version == 7 and i.variant == "specified in RFC 4122" for i in ids)
+    created_at = uuid7_time(value=ids[0])
+    assert created_at is not None and before <= created_at <= after
+    assert uuid7_time(value=uuid4()) is None
+
+def test_message_cursor_is_the_id_alone_for_uuid7_messages() -> None:
+    message_id = uuid7()
+    created_at = uuid7_time(value=message_id)
+    assert created_at is not None
+    message = Message(id=message_id, created_at=created_at)
+    cursor = svc.encode_message_cursor(message=message, direction="older")
+    assert svc.decode_message_cursor(cursor=cursor) == ("older", created_at, message_id)
+
+    # Messages whose created_at doesn't come from their id keep the longer form
+    legacy = Message(id=uuid4(), created_at=datetime(2024, 5, 1, 12, 30, 0, 123456, tzinfo=timezone.utc))
+    cursor = svc.encode_message_cursor(message=legacy, direction="newer")
+    assert svc.decode_message_cursor(cursor=cursor) == ("newer", legacy.created_at, legacy.id)
+    assert len(cursor) > len(svc.encode_message_cursor(message=message, direction="newer"))
@@ -1,11 +1,15 @@
 import pytest
+from fastapi import HTTPException, status
 from typing import Optional
+from uuid import uuid4
 from sqlalchemy.orm.session import Session
 
 from api.database import SessionLocal
 from api.models.auth import User
 from api.models.conversations import Conversation, Participant
 from api.models.messages import Message
+from api.routes.messages import send_message
+from api.schema.http.messages import SendMessageRequest
 from api.services import messages_service as svc
 from api.tests.conftest import random_email
 
@@ -35,6 +39,11 @@ def test_send_message_service_inserts_message() -> None:
         msg = svc.send_message_service(sender_id=user.id, conversation_id=conv.id, content="hello")
         assert msg is not None
         assert msg.content == "hello"
+        assert msg.seq == 1
+
+        # The route hands the sender the new message's seq
+        response = send_message(data=SendMessageRequest(conversation_id=conv.id, content="again"), user_id=user.id, db=db)
+        assert response.seq == 2
     finally:
         if conv is not None:
             db.query(Message).filter(Message.conversation_id == conv.id).delete(synchronize_session=False)
@@ -73,6 +82,14 @@ def test_edit_message_updates_content() -> None:
         msg = svc.send_message_service(sender_id=user.id, conversation_id=conv.id, content="hello")
         edited = svc.edit_message_service(message_id=msg.id, new_content="edited")
         assert edited.content == "edited"
+        # Returned loaded, and the preview of the latest message follows the edit
+        assert edited.seq == msg.seq and edited.created_at == msg.created_at
+        db.refresh(instance=conv)
+        assert conv.last_message_id == msg.id and conv.last_message_preview == "edited"
+
+        with pytest.raises(expected_exception=HTTPException) as exc_info:
+            svc.send_message_service(sender_id=user.id, conversation_id=uuid4(), content="nowhere")
+        assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
     finally:
         if conv is not None:
             db.query(Message).filter(Message.conversation_id == conv.id).delete(synchronize_session=False)
@@ -102,6 +119,112 @@ def test_get_all_messages_service_returns_messages() -> None:
         db.commit()
         db.close()
 
+def test_get_messages_page_service_walks_history_with_cursors() -> None:
+    db = SessionLocal()
+    user: Optional[User] = None
+    conv: Optional[Conversation] = None
+    try:
+        user, conv = create_user_and_conv(db=db)
+        sent = [svc.send_message_service(sender_id=user.id, conversation_id=conv.id, content=f"m{i}") for i in range(5)]
+        expected = [m.id for m in sorted(sent, key=lambda m: (m.created_at, m.id), reverse=True)]
+
+        seen: list = []
+        page = svc.get_messages_page_service(conversation_id=conv.id, user_id=user.id, limit=2)
+        seen.extend(m.id for m in page["messages"])
+        while page["next_cursor"]:
+            page = svc.get_messages_page_service(conversation_id=conv.id, user_id=user.id, limit=2, cursor=page["next_cursor"])
+            seen.extend(m.id for m in page["messages"])
+        assert seen == expected
+
+        # Walking back towards the newest messages from the last page
+        assert page["prev_cursor"] is not None
+        newer = svc.get_messages_page_service(conversation_id=conv.id, user_id=user.id, limit=2, cursor=page["prev_cursor"])
+        assert [m.id for m in newer["messages"]] == expected[2:4]
+
+        # Ids are time ordered, so the id alone says where a message is
+        assert [m.id for m in sent] == sorted(m.id for m in sent)
+        after = svc.get_messages_page_service(conversation_id=conv.id, user_id=user.id, limit=2, after=sent[1].id)
+        assert [m.id for m in after["messages"]] == [sent[3].id, sent[2].id]
+    finally:
+        if conv is not None:
+            db.query(Message).filter(Message.conversation_id == conv.id).delete(synchronize_session=False)
+            db.query(Participant).filter(Participant.conversation_id == conv.id).delete(synchronize_session=False)
+            db.query(Conversation).filter(Conversation.id == conv.id).delete(synchronize_session=False)
+        if user is not None:
+            db.query(User).filter(User.id == user.id).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+def test_messages_are_numbered_per_conversation() -> None:
+    db = SessionLocal()
+    user: Optional[User] = None
+    conv: Optional[Conversation] = None
+    try:
+        user, conv = create_user_and_conv(db=db)
+        sent = [svc.send_message_service(sender_id=user.id, conversation_id=conv.id, content=f"m{i}") for i in range(4)]
+        bulk = svc.send_messages_bulk_service(sender_id=user.id, messages=[
+            {"conversation_id": conv.id, "content": "b0"},
+            {"conversation_id": conv.id, "content": "b1"},
+        ])
+        assert [m.seq for m in sent] + [r["seq"] for r in bulk] == [1, 2, 3, 4, 5, 6]
+
+        # A deleted message leaves a gap the client can see
+        svc.delete_message_service(message_id=sent[2].id, user_id=user.id)
+        in_range = svc.get_messages_by_seq_service(conversation_id=conv.id, user_id=user.id, from_seq=2, to_seq=5)
+        assert [m.seq for m in in_range] == [2, 4, 5]
+
+        with pytest.raises(expected_exception=HTTPException) as exc_info:
+            svc.get_messages_by_seq_service(conversation_id=conv.id, user_id=user.id, from_seq=5, to_seq=2)
+        assert exc_info.value.status_code == status.HTTP_400_BAD_REQUEST
+    finally:
+        if conv is not None:
+            db.query(Message).filter(Message.conversation_id == conv.id).delete(synchronize_session=False)
+            db.query(Participant).filter(Participant.conversation_id == conv.id).delete(synchronize_session=False)
+            db.query(Conversation).filter(Conversation.id == conv.id).delete(synchronize_session=False)
+        if user is not None:
+            db.query(User).filter(User.id == user.id).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+def test_get_message_window_service_centers_on_anchor() -> None:
+    db = SessionLocal()
+    user: Optional[User] = None
+    conv: Optional[Conversation] = None
+    try:
+        user, conv = create_user_and_conv(db=db)
+        sent = [svc.send_message_service(sender_id=user.id, conversation_id=conv.id, content=f"m{i}") for i in range(7)]
+
+        window = svc.get_message_window_service(conversation_id=conv.id, user_id=user.id, around=sent[3].id, limit=2)
+        assert [m.id for m in window["messages"]] == [m.id for m in reversed(sent[1:6])]
+        assert window["next_cursor"] is not None and window["prev_cursor"] is not None
+
+        # The cursors continue past either end of the window
+        older = svc.get_messages_page_service(conversation_id=conv.id, user_id=user.id, cursor=window["next_cursor"])
+        assert [m.id for m in older["messages"]] == [sent[0].id]
+        newer = svc.get_messages_page_service(conversation_id=conv.id, user_id=user.id, cursor=window["prev_cursor"])
+        assert [m.id for m in newer["messages"]] == [sent[6].id]
+
+        at_start = svc.get_message_window_service(conversation_id=conv.id, user_id=user.id, around=sent[0].id, limit=2)
+        assert [m.id for m in at_start["messages"]] == [sent[2].id, sent[1].id, sent[0].id]
+        assert at_start["next_cursor"] is None
+
+        by_date = svc.get_message_window_service(conversation_id=conv.id, user_id=user.id, around_at=sent[6].created_at, limit=3)
+        assert [m.id for m in by_date["messages"]] == [m.id for m in reversed(sent[4:])]
+        assert by_date["prev_cursor"] is None
+
+        with pytest.raises(expected_exception=HTTPException) as exc_info:
+            svc.get_message_window_service(conversation_id=conv.id, user_id=user.id, around=uuid4())
+        assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
+    finally:
+        if conv is not None:
+            db.query(Message).filter(Message.conversation_id == conv.id).delete(synchronize_session=False)
+            db.query(Participant).filter(Participant.conversation_id == conv.id).delete(synchronize_session=False)
+            db.query(Conversation).filter(Conversation.id == conv.id).delete(synchronize_session=False)
+        if user is not None:
+            db.query(User).filter(User.id == user.id).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
 def test_delete_message_service_removes_message() -> None:
     db = SessionLocal()
     user: Optional[User] = None
@@ -122,6 +245,47 @@ def test_delete_message_service_removes_message() -> None:
         db.commit()
         db.close()
 
+def test_authorization_is_distinguished_from_missing_messages() -> None:
+    db = SessionLocal()
+    user: Optional[User] = None
+    stranger: Optional[User] = None
+    conv: Optional[Conversation] = None
+    try:
+        user, conv = create_user_and_conv(db=db)
+        stranger = User(email=random_email(), password="x")
+        db.add(instance=stranger)
+        db.commit()
+        msg = svc.send_message_service(sender_id=user.id, conversation_id=conv.id, content="hello")
+
+        with pytest.raises(expected_exception=HTTPException) as exc_info:
+            svc.get_single_message_service(message_id=msg.id, user_id=stranger.id)
+        assert exc_info.value.status_code == 401
+        with pytest.raises(expected_exception=HTTPException) as exc_info:
+            svc.get_single_message_service(message_id=uuid4(), user_id=user.id)
+        assert exc_info.value.status_code == 404
+        with pytest.raises(expected_exception=HTTPException) as exc_info:
+            svc.get_messages_page_service(conversation_id=conv.id, user_id=stranger.id)
+        assert exc_info.value.status_code == 401
+
+        with pytest.raises(expected_exception=HTTPException) as exc_info:
+            svc.delete_message_service(message_id=msg.id, user_id=stranger.id)
+        assert exc_info.value.status_code == status.HTTP_403_FORBIDDEN
+        with pytest.raises(expected_exception=HTTPException) as exc_info:
+            svc.delete_message_service(message_id=uuid4(), user_id=user.id)
+        assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
+        # A refused delete leaves the message in place
+        assert db.query(Message).filter(Message.id == msg.id).first() is not None
+    finally:
+        if conv is not None:
+            db.query(Message).filter(Message.conversation_id == conv.id).delete(synchronize_session=False)
+            db.query(Participant).filter(Participant.conversation_id == conv.id).delete(synchronize_session=False)
+            db.query(Conversation).filter(Conversation.id == conv.id).delete(synchronize_session=False)
+        for u in (user, stranger):
+            if u is not None:
+                db.query(User).filter(User.id == u.id).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
 @pytest.mark.parametrize(argnames="content", argvalues=["hi", "", "a" * 500])
 def test_send_various_message_contents(content: str) -> None:
     db = SessionLocal()
@@ -140,3 +304,41 @@ def test_send_various_message_contents(content: str) -> None:
             db.query(User).filter(User.id == user.id).delete(synchronize_session=False)
         db.commit()
         db.close()
+
+def test_send_messages_bulk_service_reports_per_item_results() -> None:
+    db = SessionLocal()
+    user: Optional[User] = None
+    conv: Optional[Conversation] = None
+    other_conv: Optional[Conversation] = None
+    other: Optional[User] = None
+    try:
+        user, conv = create_user_and_conv(db=db)
+        other, other_conv = create_user_and_conv(db=db)
+        results = svc.send_messages_bulk_service(sender_id=user.id, messages=[
+            {"conversation_id": conv.id, "content": "one"},
+            {"conversation_id": other_conv.id, "content": "not mine"},
+            {"conversation_id": conv.id, "content": "  "},
+            {"conversation_id": conv.id, "content": "two"},
+        ])
+
+        assert [r["status"] for r in results] == ["created", "rejected", "rejected", "created"]
+        assert results[1]["error"] == "User is not part of this conversation."
+        assert results[0]["created_at"] <= results[3]["created_at"] and results[0]["id"] < results[3]["id"]  # type: ignore[operator]
+        assert results[3]["seq"] == results[0]["seq"] + 1  # type: ignore[operator]
+
+        # Submission order is kept and the summary points at the newest message
+        page = svc.get_messages_page_service(conversation_id=conv.id, user_id=user.id)
+        assert [m.content for m in page["messages"]] == ["two", "one"]
+        db.expire_all()
+        assert db.get(Conversation, conv.id).last_message_id == results[3]["id"]  # type: ignore[union-attr]
+    finally:
+        for c in (conv, other_conv):
+            if c is not None:
+                db.query(Message).filter(Message.conversation_id == c.id).delete(synchronize_session=False)
+                db.query(Participant).filter(Participant.conversation_id == c.id).delete(synchronize_session=False)
+                db.query(Conversation).filter(Conversation.id == c.id).delete(synchronize_session=False)
+        for u in (user, other):
+            if u is not None:
+                db.query(User).filter(User.id == u.id).delete(synchronize_session=False)
+        db.commit()
+        db.close()
@@ -0,0 +1,39 @@
+from fastapi import Depends, FastAPI, status
+from fastapi.testclient import TestClient
+import pytest
+
+from api import overload
+from api.database import DecayingAverage
+
+def test_decaying_average_fades_without_samples(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = [100.0]
+    monkeypatch.setattr(target="api.database.time.monotonic", name=lambda: now[0])
+    average = DecayingAverage(half_life=1.0, weight=0.5)
+    average.observe(sample=1.0)
+    average.observe(sample=1.0)
+    assert average.value() == pytest.approx(0.75)
+    now[0] += 2
+    assert average.value() == pytest.approx(0.75 / 4)
+
+def test_low_priority_routes_are_shed_while_overloaded(monkeypatch: pytest.MonkeyPatch) -> None:
+    controller = overload.OverloadController(pool_wait_limit=0.1, threadpool_queue_limit=10, loop_lag_limit=0.05)
+    monkeypatch.setattr(target=overload, name="overload_controller", value=controller)
+    app = FastAPI()
+
+    @app.get(path="/history", dependencies=[Depends(dependency=overload.low_priority)])
+    def history() -> dict[str, bool]:
+        return {"ok": True}
+
+    @app.post(path="/send")
+    def send() -> dict[str, bool]:
+        return {"ok": True}
+
+    client = TestClient(app=app)
+    assert client.get(url="/history").status_code == status.HTTP_200_OK
+
+    controller.loop_lag.observe(sample=5.0)
+    shed = client.get(url="/history")
+    assert shed.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert shed.headers["Retry-After"] == str(overload.OVERLOAD_RETRY_AFTER_SECONDS)
+    assert client.post(url="/send").status_code == status.HTTP_200_OK
+    assert controller.shed == 1
@@ -0,0 +1,33 @@
+from datetime import date, datetime, timezone
+
+from api.database import engine
+from api.services import partitions_service as svc
+
+def test_month_arithmetic_and_names() -> None:
+    assert svc.add_months(value=date(2025, 11, 1), months=3) == date(2026, 2, 1)
+    assert svc.add_months(value=date(2025, 1, 1), months=-1) == date(2024, 12, 1)
+    assert svc.month_start(value=date(2025, 5, 17)) == date(2025, 5, 1)
+    assert svc.partition_name(month=date(2025, 5, 1)) == "messages_p2025_05"
+
+def test_parse_bound_handles_postgres_offsets() -> None:
+    assert svc._parse_bound(value="MINVALUE") is None
+    assert svc._parse_bound(value="'2025-05-01 00:00:00+00'") == datetime(2025, 5, 1, tzinfo=timezone.utc)
+
+def test_ensure_message_partitions_covers_upcoming_months() -> None:
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        svc.ensure_message_partitions(conn=conn, months_ahead=2)
+        # Running it again is a no-op
+        assert svc.ensure_message_partitions(conn=conn, months_ahead=2) == []
+
+        partitions = svc.list_partitions(conn=conn)
+        assert any(p["is_default"] for p in partitions)
+        current = svc.month_start(value=datetime.now(tz=timezone.utc).date())
+        for offset in range(3):
+            month = svc.add_months(value=current, months=offset)
+            point = datetime(month.year, month.month, 15, tzinfo=timezone.utc)
+            assert any(
+                not p["is_default"]
+                and (p["lower"] is None or p["lower"] <= point)
+                and p["upper"] is not None and point < p["upper"]
+                for p in partitions
+            )
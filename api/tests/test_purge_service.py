@@ -0,0 +1,101 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.session import Session
+from sqlalchemy.pool import StaticPool
+from typing import Iterator
+
+from api.database import Base
+from api.models.auth import User, Tokens
+from api.models.change_log import ChangeLog
+from api.models.conversations import Conversation, Participant
+from api.models.messages import Message
+from api.models.purge_jobs import PurgeJob
+from api.services import purge_service as svc
+from api.services.auth_service import authenticate_user, hash_password
+from api.services.users_service import delete_account_service
+from api.tests.conftest import random_email
+import api.models  # noqa: F401  # register every model on Base.metadata
+
+@pytest.fixture
+def sqlite_db() -> Iterator[Session]:
+    engine = create_engine(url="sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        yield db
+    finally:
+        db.close()
+        engine.dispose()
+
+def test_account_purge_runs_in_batches_and_resumes(sqlite_db: Session) -> None:
+    db = sqlite_db
+    leaving = User(email=random_email(), password=hash_password(password="secret"))
+    staying = User(email=random_email(), password="x")
+    db.add_all(instances=[leaving, staying])
+    db.flush()
+    conversations = [
+        Conversation(name=f"c{i}", conversation_type="group", created_by=staying.id, participant_count=2)
+        for i in range(3)
+    ]
+    db.add_all(instances=conversations)
+    db.flush()
+    for i, conv in enumerate(conversations):
+        db.add_all(instances=[
+            Participant(conversation_id=conv.id, user_id=leaving.id, role="member"),
+            # the leaving user's messages in the conversation are unread
+            Participant(conversation_id=conv.id, user_id=staying.id, role="admin", unread_count=2 if i < 2 else 1),
+        ])
+    # SQLite's CURRENT_TIMESTAMP has a different text format than bound datetimes,
+    # so pass created_at (part of the primary key) explicitly
+    now = datetime.now(tz=timezone.utc)
+    sent = [
+        Message(conversation_id=conversations[i % 3].id, sender_id=leaving.id, content=str(i), created_at=now + timedelta(seconds=i))
+        for i in range(5)
+    ]
+    kept = Message(conversation_id=conversations[0].id, sender_id=staying.id, content="kept", created_at=now)
+    db.add_all(instances=[*sent, kept])
+    db.flush()
+    conversations[0].last_message_id, conversations[0].last_message_preview = sent[3].id, "3"
+    conversations[1].last_message_id, conversations[1].last_message_preview = sent[4].id, "4"
+    db.add(instance=Tokens(user_id=leaving.id, token="t", expires_at=now + timedelta(days=1)))
+    db.commit()
+    leaving_id, email = leaving.id, leaving.email
+    sent_ids = sorted(message.id for message in sent)
+
+    job = delete_account_service(user_id=leaving_id, db=db)
+    assert job["kind"] == "user" and job["phase"] == "messages"
+    # Logged out and unable to log in right away, before anything is purged
+    assert db.query(Tokens).filter(Tokens.user_id == leaving_id).count() == 0
+    with pytest.raises(expected_exception=HTTPException):
+        authenticate_user(email=email, password="secret", db=db)
+    with pytest.raises(expected_exception=HTTPException):
+        delete_account_service(user_id=leaving_id, db=db)
+
+    # Each batch commits its progress, so stopping after any of them loses nothing
+    progress = [svc.run_purge_batch(batch_size=2, db=db) for _ in range(3)]
+    assert [p["rows_deleted"] for p in progress if p] == [2, 4, 5]
+    assert progress[-1] is not None and progress[-1]["phase"] == "participants"
+
+    while svc.run_purge_batch(batch_size=2, db=db) is not None:
+        pass
+    db.expire_all()
+    assert db.query(Message).filter(Message.sender_id == leaving_id).count() == 0
+    assert [m.content for m in db.query(Message).all()] == ["kept"]
+    assert db.query(Participant).filter(Participant.user_id == leaving_id).count() == 0
+    assert {c.participant_count for c in db.query(Conversation).all()} == {1}
+    # Summaries moved off the purged messages and their unread counts were taken back
+    assert db.query(Participant.unread_count).distinct().all() == [(0,)]
+    first, second = db.get(Conversation, conversations[0].id), db.get(Conversation, conversations[1].id)
+    assert first is not None and (first.last_message_id, first.last_message_preview) == (kept.id, "kept")
+    assert second is not None and (second.last_message_id, second.last_message_preview) == (None, None)
+    deletions = db.query(ChangeLog.entity_id).filter(ChangeLog.kind == "message_deleted").all()
+    assert sorted(entity_id for entity_id, in deletions) == sent_ids
+    assert db.get(User, leaving_id) is None
+
+    done = db.get(PurgeJob, job["id"])
+    assert done is not None and done.status == "done" and done.finished_at is not None
+    # 5 messages, 3 memberships and the account
+    assert done.rows_deleted == 9
@@ -0,0 +1,87 @@
+from sqlalchemy.orm.session import Session
+from typing import Optional
+from uuid import uuid4
+
+from api.database import SessionLocal
+from api.models.auth import User
+from api.models.conversations import Conversation, Participant
+from api.models.messages import Message
+from api.services import conversations_service as conv_svc
+from api.services import messages_service as msg_svc
+from api.services import read_receipts_service as svc
+from api.sockets.chat_socket import parse_read_event
+from api.tests.conftest import random_email
+
+def create_test_user(db: Session) -> User:
+    u = User(email=random_email(), password="x")
+    db.add(instance=u)
+    db.commit()
+    db.refresh(instance=u)
+    return u
+
+def unread_for(db: Session, conversation_id: object, user_id: object) -> int:
+    db.expire_all()
+    participant = db.query(Participant).filter(
+        Participant.conversation_id == conversation_id,
+        Participant.user_id == user_id,
+    ).one()
+    return participant.unread_count
+
+def test_buffer_coalesces_receipts_per_participant() -> None:
+    buffer = svc.ReadReceiptBuffer()
+    conversation_id, user_id = uuid4(), uuid4()
+    message_ids = [uuid4() for _ in range(buffer.MAX_CANDIDATES + 2)]
+    for message_id in message_ids:
+        buffer.add(conversation_id=conversation_id, user_id=user_id, message_id=message_id)
+    buffer.add(conversation_id=conversation_id, user_id=user_id, message_id=message_ids[-1])
+
+    assert len(buffer) == 1
+    drained = buffer.drain()
+    # Only the newest candidates are kept and duplicates are dropped
+    assert [entry[2] for entry in drained] == message_ids[-buffer.MAX_CANDIDATES:]
+    assert len(buffer) == 0
+
+def test_parse_read_event() -> None:
+    conversation_id, message_id = uuid4(), uuid4()
+    event = f'{{"type": "read", "conversation_id": "{conversation_id}", "message_id": "{message_id}"}}'
+    assert parse_read_event(data=event) == (conversation_id, message_id)
+    assert parse_read_event(data="hello") is None
+    assert parse_read_event(data='{"type": "read", "conversation_id": "nope"}') is None
+
+def test_unread_counts_follow_messages_and_read_receipts() -> None:
+    db = SessionLocal()
+    user: Optional[User] = None
+    other: Optional[User] = None
+    conv: Optional[Conversation] = None
+    try:
+        user = create_test_user(db=db)
+        other = create_test_user(db=db)
+        conv = conv_svc.create_conversation_service(name="c", conversation_type="group", created_by=user.id, participant_ids=[other.id])
+
+        sent = [msg_svc.send_message_service(sender_id=other.id, conversation_id=conv.id, content=f"m{i}") for i in range(3)]
+        assert unread_for(db=db, conversation_id=conv.id, user_id=user.id) == 3
+        # The sender has read their own messages
+        assert unread_for(db=db, conversation_id=conv.id, user_id=other.id) == 0
+
+        # Several receipts for the same participant end up as one cursor move
+        for message in sent[:2]:
+            svc.queue_read_receipt(conversation_id=conv.id, user_id=user.id, message_id=message.id)
+        assert svc.flush_read_receipts() == 1
+        assert unread_for(db=db, conversation_id=conv.id, user_id=user.id) == 1
+
+        # Cursors never move backwards
+        assert svc.mark_read_service(conversation_id=conv.id, user_id=user.id, message_id=sent[0].id) is None
+
+        # Deleting an unread message decrements the counter
+        msg_svc.delete_message_service(message_id=sent[2].id, user_id=user.id)
+        counts = svc.get_unread_counts_service(user_id=user.id)
+        assert [c["unread_count"] for c in counts if c["conversation_id"] == conv.id] == [0]
+    finally:
+        if conv is not None:
+            db.query(Message).filter(Message.conversation_id == conv.id).delete(synchronize_session=False)
+            db.query(Participant).filter(Participant.conversation_id == conv.id).delete(synchronize_session=False)
+            db.query(Conversation).filter(Conversation.id == conv.id).delete(synchronize_session=False)
+        if user is not None and other is not None:
+            db.query(User).filter(User.id.in_(other=[user.id, other.id])).delete(synchronize_session=False)
+        db.commit()
+        db.close()
@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta, timezone
+from uuid import UUID, uuid4
+import json
+
+import pytest
+
+from api.models.messages import Message
+from api.services import recent_messages_service as svc
+from api.services.recent_messages_service import RecentMessagesCache
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+def make_messages(conversation_id: UUID, n: int, content: str = "x") -> list[Message]:
+    """Return ``n`` messages, newest first."""
+    messages = [
+        Message(id=uuid4(), conversation_id=conversation_id, sender_id=uuid4(), content=content, created_at=START + timedelta(seconds=i), seq=i + 1)
+        for i in range(n)
+    ]
+    return messages[::-1]
+
+def test_fill_serves_pages_and_upserts_keep_the_newest() -> None:
+    cache = RecentMessagesCache(per_conversation=3, max_bytes=1_000_000, ttl=60)
+    conversation_id = uuid4()
+    assert cache.get(conversation_id=conversation_id, count=2) is None
+
+    history = make_messages(conversation_id=conversation_id, n=2)
+    version = cache.begin_fill(conversation_id=conversation_id)
+    cache.fill(conversation_id=conversation_id, version=version, messages=history)
+    # The whole history is cached, so a larger page is still a hit
+    cached = cache.get(conversation_id=conversation_id, count=4)
+    assert cached is not None and [m.id for m in cached] == [m.id for m in history]
+
+    newer = make_messages(conversation_id=conversation_id, n=5)[:3]
+    for message in reversed(newer):
+        message.created_at += timedelta(minutes=1)
+        cache.upsert(message=message)
+    cached = cache.get(conversation_id=conversation_id, count=4)
+    assert cached is not None and [m.id for m in cached] == [m.id for m in newer] + [history[0].id]
+    # Only capacity (per_conversation + 1) messages are kept now
+    assert cache.get(conversation_id=conversation_id, count=5) is None
+
+    edited = Message(**{**{k: getattr(newer[1], k) for k in ("id", "conversation_id", "sender_id", "created_at", "seq")}, "content": "edited"})
+    cache.upsert(message=edited)
+    cache.remove(conversation_id=conversation_id, message_id=newer[0].id)
+    cached = cache.get(conversation_id=conversation_id, count=2)
+    assert cached is not None and [m.content for m in cached] == ["edited", "x"]
+
+def test_fill_that_raced_a_change_is_discarded() -> None:
+    cache = RecentMessagesCache(per_conversation=3, max_bytes=1_000_000, ttl=60)
+    conversation_id = uuid4()
+    stale = make_messages(conversation_id=conversation_id, n=2)
+    version = cache.begin_fill(conversation_id=conversation_id)
+    cache.remove(conversation_id=conversation_id, message_id=stale[0].id)
+    cache.fill(conversation_id=conversation_id, version=version, messages=stale)
+    assert cache.get(conversation_id=conversation_id, count=1) is None
+
+def test_misses_that_are_never_filled_dont_accumulate() -> None:
+    cache = RecentMessagesCache(per_conversation=3, max_bytes=1_000_000, ttl=60)
+    for _ in range(svc.MAX_PENDING_FILLS + 10):
+        cache.begin_fill(conversation_id=uuid4())
+    assert not cache.entries and len(cache.pending) == svc.MAX_PENDING_FILLS
+
+    conversation_id = uuid4()
+    version = cache.begin_fill(conversation_id=conversation_id)
+    cache.fill(conversation_id=conversation_id, version=version, messages=make_messages(conversation_id=conversation_id, n=1))
+    assert list(cache.entries) == [conversation_id] and conversation_id not in cache.pending
+
+def test_least_recently_read_conversations_are_evicted_over_budget() -> None:
+    per_message = svc.MESSAGE_OVERHEAD_BYTES + 1
+    cache = RecentMessagesCache(per_conversation=3, max_bytes=5 * per_message, ttl=60)
+    first, second, third = uuid4(), uuid4(), uuid4()
+    for conversation_id in (first, second):
+        cache.fill(conversation_id=conversation_id, version=cache.begin_fill(conversation_id=conversation_id), messages=make_messages(conversation_id=conversation_id, n=2))
+    assert cache.get(conversation_id=first, count=1) is not None
+    cache.fill(conversation_id=third, version=cache.begin_fill(conversation_id=third), messages=make_messages(conversation_id=third, n=2))
+
+    assert cache.get(conversation_id=second, count=1) is None
+    assert cache.get(conversation_id=first, count=1) is not None
+    assert cache.size <= cache.max_bytes
+
+def test_notifications_patch_the_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    cache = RecentMessagesCache(per_conversation=3, max_bytes=1_000_000, ttl=60)
+    monkeypatch.setattr(target=svc, name="recent_messages_cache", value=cache)
+    conversation_id = uuid4()
+    history = make_messages(conversation_id=conversation_id, n=1)
+    cache.fill(conversation_id=conversation_id, version=cache.begin_fill(conversation_id=conversation_id), messages=history)
+
+    sent = make_messages(conversation_id=conversation_id, n=2)[0]
+    svc.apply_recent_messages_notification(payload=json.dumps({"op": "upsert", "message": {
+        "id": str(sent.id),
+        "conversation_id": str(conversation_id),
+        "sender_id": str(sent.sender_id),
+        "content": "hi",
+        "created_at": sent.created_at.isoformat(),
+        "seq": sent.seq,
+    }}))
+    cached = cache.get(conversation_id=conversation_id, count=2)
+    assert cached is not None and [m.content for m in cached] == ["hi", "x"]
+
+    svc.apply_recent_messages_notification(payload=json.dumps({"op": "invalidate", "conversation_ids": [str(conversation_id)]}))
+    assert cache.get(conversation_id=conversation_id, count=1) is None
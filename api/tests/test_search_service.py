@@ -0,0 +1,74 @@
+import pytest
+from datetime import datetime, timezone
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.session import Session
+from sqlalchemy.pool import StaticPool
+from typing import Iterator
+
+from api.database import Base
+from api.models.auth import User
+from api.models.conversations import Conversation, Participant
+from api.models.messages import Message
+from api.services import search_service as svc
+from api.tests.conftest import random_email
+import api.models  # noqa: F401  # register every model on Base.metadata
+
+@pytest.fixture
+def sqlite_db() -> Iterator[Session]:
+    # The SQLite FTS5 backend stands in for Postgres full-text search
+    engine = create_engine(url="sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        svc.create_sqlite_search_index(conn=conn)
+    db = sessionmaker(bind=engine)()
+    try:
+        yield db
+    finally:
+        db.close()
+        engine.dispose()
+
+def add_conversation(db: Session, creator: User, members: list[User]) -> Conversation:
+    conv = Conversation(name="c", conversation_type="group", created_by=creator.id)
+    db.add(instance=conv)
+    db.flush()
+    db.add_all(instances=[Participant(conversation_id=conv.id, user_id=m.id, role="member") for m in members])
+    return conv
+
+def test_search_is_ranked_paged_and_scoped(sqlite_db: Session) -> None:
+    db = sqlite_db
+    user = User(email=random_email(), password="x")
+    stranger = User(email=random_email(), password="x")
+    db.add_all(instances=[user, stranger])
+    db.flush()
+    mine = add_conversation(db=db, creator=user, members=[user])
+    theirs = add_conversation(db=db, creator=stranger, members=[stranger])
+    # SQLite's CURRENT_TIMESTAMP has a different text format than bound datetimes,
+    # so pass created_at (part of the primary key) explicitly
+    now = datetime.now(tz=timezone.utc)
+    db.add_all(instances=[
+        Message(conversation_id=mine.id, sender_id=user.id, content="deploy the release tonight", created_at=now),
+        Message(conversation_id=mine.id, sender_id=user.id, content="release release release notes", created_at=now),
+        Message(conversation_id=mine.id, sender_id=user.id, content="lunch?", created_at=now),
+        Message(conversation_id=theirs.id, sender_id=stranger.id, content="secret release plan", created_at=now),
+    ])
+    db.commit()
+
+    first = svc.search_messages_service(user_id=user.id, query="release", limit=1, db=db)
+    assert [r["content"] for r in first["results"]] == ["release release release notes"]
+    assert "<mark>release</mark>" in first["results"][0]["snippet"]
+    assert first["next_cursor"] is not None
+
+    rest = svc.search_messages_service(user_id=user.id, query="release", limit=1, cursor=first["next_cursor"], db=db)
+    # Messages in conversations the user isn't part of are never returned
+    assert [r["content"] for r in rest["results"]] == ["deploy the release tonight"]
+    assert rest["next_cursor"] is None
+
+    # Edits are reindexed and odd input doesn't break the query syntax
+    lunch = db.query(Message).filter(Message.content == "lunch?").one()
+    lunch.content = "release lunch"
+    db.commit()
+    found = svc.search_messages_service(user_id=user.id, query='lunch" OR', db=db)
+    assert found["results"] == []
+    found = svc.search_messages_service(user_id=user.id, query="lunch", conversation_id=mine.id, db=db)
+    assert [r["id"] for r in found["results"]] == [lunch.id]
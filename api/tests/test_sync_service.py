@@ -0,0 +1,49 @@
+from typing import Optional
+
+from api.database import SessionLocal
+from api.models.auth import User
+from api.models.change_log import ChangeLog
+from api.models.conversations import Conversation, Participant
+from api.models.messages import Message
+from api.services import messages_service
+from api.services import sync_service as svc
+from api.tests.test_messages_service import create_user_and_conv
+
+def test_get_changes_service_returns_each_change_once() -> None:
+    db = SessionLocal()
+    user: Optional[User] = None
+    conv: Optional[Conversation] = None
+    try:
+        user, conv = create_user_and_conv(db=db)
+        start = svc.get_changes_service(user_id=user.id)
+        assert start["messages"] == [] and not start["has_more"]
+
+        kept = messages_service.send_message_service(sender_id=user.id, conversation_id=conv.id, content="kept")
+        gone = messages_service.send_message_service(sender_id=user.id, conversation_id=conv.id, content="gone")
+        messages_service.edit_message_service(message_id=kept.id, new_content="edited")
+        messages_service.delete_message_service(message_id=gone.id, user_id=user.id)
+
+        first = svc.get_changes_service(user_id=user.id, since=start["cursor"], limit=2)
+        assert first["has_more"]
+        rest = svc.get_changes_service(user_id=user.id, since=first["cursor"], limit=2)
+        assert not rest["has_more"]
+
+        pages = [first, rest]
+        assert {m.id for page in pages for m in page["messages"]} == {kept.id}
+        assert [m.content for page in pages for m in page["messages"] if m.id == kept.id][-1] == "edited"
+        assert gone.id in rest["deleted_message_ids"]
+        assert conv.id in {c["id"] for c in rest["conversations"]}
+
+        # Nothing new since the last cursor
+        again = svc.get_changes_service(user_id=user.id, since=rest["cursor"])
+        assert again["messages"] == [] and again["deleted_message_ids"] == []
+    finally:
+        if conv is not None:
+            db.query(ChangeLog).filter(ChangeLog.conversation_id == conv.id).delete(synchronize_session=False)
+            db.query(Message).filter(Message.conversation_id == conv.id).delete(synchronize_session=False)
+            db.query(Participant).filter(Participant.conversation_id == conv.id).delete(synchronize_session=False)
+            db.query(Conversation).filter(Conversation.id == conv.id).delete(synchronize_session=False)
+        if user is not None:
+            db.query(User).filter(User.id == user.id).delete(synchronize_session=False)
+        db.commit()
+        db.close()
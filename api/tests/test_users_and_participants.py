@@ -1,12 +1,17 @@
 from typing import Optional
+from uuid import uuid4
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
-from api.database import SessionLocal
+from api.database import Base, SessionLocal
 from api.models.auth import User
 from api.models.users import UserProfile
 from api.models.conversations import Conversation, Participant
 from api.services import users_service as users_svc
 from api.services import participants_service as parts_svc
 from api.tests.conftest import random_email
+import api.models  # noqa: F401  # register every model on Base.metadata
 
 def test_user_profile_and_participant_role() -> None:
     db = SessionLocal()
@@ -49,3 +54,91 @@ def test_user_profile_and_participant_role() -> None:
             db.query(User).filter(User.id == user.id).delete(synchronize_session=False)
         db.commit()
         db.close()
+
+def test_membership_cache_expires_evicts_and_invalidates() -> None:
+    cache = parts_svc.MembershipCache(max_size=2, ttl=60, negative_ttl=0)
+    conv, other_conv, user, other = uuid4(), uuid4(), uuid4(), uuid4()
+
+    cache.set(conversation_id=conv, user_id=user, role="admin", generation=cache.generation)
+    assert cache.get(conversation_id=conv, user_id=user) == (True, "admin")
+    # Negative entries use their own (here zero) TTL
+    cache.set(conversation_id=conv, user_id=other, role=None, generation=cache.generation)
+    assert cache.get(conversation_id=conv, user_id=other) == (False, None)
+
+    # Least recently used entries are evicted beyond max_size
+    cache.set(conversation_id=other_conv, user_id=user, role="member", generation=cache.generation)
+    cache.set(conversation_id=other_conv, user_id=other, role="member", generation=cache.generation)
+    assert cache.get(conversation_id=conv, user_id=user) == (False, None)
+
+    # A lookup that raced an invalidation isn't stored
+    generation = cache.generation
+    cache.invalidate(conversation_id=other_conv)
+    assert cache.get(conversation_id=other_conv, user_id=other) == (False, None)
+    cache.set(conversation_id=other_conv, user_id=user, role="member", generation=generation)
+    assert cache.get(conversation_id=other_conv, user_id=user) == (False, None)
+
+def test_get_user_profiles_batches_and_sees_updates() -> None:
+    db = SessionLocal()
+    users: list[User] = []
+    try:
+        users = [User(email=random_email(), password="x") for _ in range(3)]
+        db.add_all(instances=users)
+        db.flush()
+        db.add_all(instances=[UserProfile(user_id=u.id, first_name=f"u{i}") for i, u in enumerate(users)])
+        db.commit()
+
+        ids = [users[2].id, uuid4(), users[0].id]
+        profiles = users_svc.get_user_profiles(user_ids=ids)
+        # Unknown ids are left out and the requested order is kept
+        assert list(profiles) == [users[2].id, users[0].id]
+        assert profiles[users[0].id]["first_name"] == "u0"
+
+        users_svc.update_user_profile_service(user_id=users[0].id, changes={"first_name": "renamed"})
+        assert users_svc.get_user_profile(user_id=users[0].id)["first_name"] == "renamed"
+    finally:
+        ids = [u.id for u in users]
+        db.query(UserProfile).filter(UserProfile.user_id.in_(ids)).delete(synchronize_session=False)
+        db.query(User).filter(User.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+def test_etag_matching() -> None:
+    etag = users_svc.profiles_etag(profiles=[{"user_id": "a", "first_name": "A"}])
+    assert etag == users_svc.profiles_etag(profiles=[{"first_name": "A", "user_id": "a"}])
+    assert etag != users_svc.profiles_etag(profiles=[{"user_id": "a", "first_name": "B"}])
+    assert users_svc.etag_matches(if_none_match=f'"x", {etag}', etag=etag)
+    assert users_svc.etag_matches(if_none_match=etag.removeprefix("W/"), etag=etag)
+    assert users_svc.etag_matches(if_none_match="*", etag=etag)
+    assert not users_svc.etag_matches(if_none_match=None, etag=etag)
+
+def test_search_users_matches_prefixes_and_pages() -> None:
+    # Runs on SQLite; the LIKE conditions are the same ones the Postgres trigram indexes serve
+    engine = create_engine(url="sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        people = [("ann.smith@x.io", "Ann", "Smith"), ("bob@x.io", "Bob", "Annerson"), ("carl@x.io", "Carl", "Jones"), ("dan_1@x.io", None, None)]
+        for email, first, last in people:
+            user = User(email=email, password="x")
+            db.add(instance=user)
+            db.flush()
+            db.add(instance=UserProfile(user_id=user.id, first_name=first, last_name=last))
+        db.commit()
+
+        found = users_svc.search_users_service(query="ANN", db=db)
+        # Email prefix or the start of a name word; "Joanne" style infixes don't match
+        assert [u["email"] for u in found["users"]] == ["ann.smith@x.io", "bob@x.io"]
+        # LIKE wildcards in the query are literal
+        assert [u["email"] for u in users_svc.search_users_service(query="dan_", db=db)["users"]] == ["dan_1@x.io"]
+        assert users_svc.search_users_service(query="%", db=db)["users"] == []
+
+        first = users_svc.search_users_service(limit=3, db=db)
+        assert first["next_cursor"] is not None
+        rest = users_svc.search_users_service(limit=3, cursor=first["next_cursor"], db=db)
+        assert [u["email"] for u in first["users"] + rest["users"]] == sorted(email for email, _, _ in people)
+        assert rest["next_cursor"] is None
+
+        assert [u["email"] for u in users_svc.iter_user_directory(db=db, batch_size=2)] == sorted(email for email, _, _ in people)
+    finally:
+        db.close()
+        engine.dispose()